@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+"""
+Time of audit_pw_reuse_and_cmp_all() vs number of records
+
+* A quarter of the passwords are distinct, so every record is part of a
+  reuse cluster of 4
+
+* 'pairwise' is the comparison of every password with every other one
+  (with list membership tests), the way reuse was detected before passwords
+  were grouped by digest. It is run on passwords that were already decrypted,
+  so it only counts the comparisons. It's O(n^2) or worse, so it is only run
+  up to --pairwise-limit records, same for --against.
+
+* The audit also decrypts every password & rates its complexity
+
+Usage: python3 benchmarks/bench_audit_reuse.py [--sizes 1000,10000,50000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table
+
+
+def pairwise_reuse(pw_list=[]):
+
+    reuse_pw_indexes_l = []
+
+    for i in range(len(pw_list)):
+
+        if (i in reuse_pw_indexes_l):
+            continue
+
+        match = False
+
+        for j in range(len(pw_list)):
+
+            if (j == i or j in reuse_pw_indexes_l):
+                continue
+
+            if (pw_list[i] == pw_list[j]):
+                match = True
+                reuse_pw_indexes_l.append(j)
+
+        if (match):
+            reuse_pw_indexes_l.append(i)
+
+    return set(reuse_pw_indexes_l)
+
+
+def main():
+
+    args    = parse_args('Time of audit_pw_reuse_and_cmp_all() vs number of records', \
+                         [1000, 10000, 50000], \
+                         [('--pairwise-limit', 2000, 'Largest record count for pairwise comparison')])
+    modules = get_modules(args)
+
+    rows = []
+
+    for n in args.sizes:
+
+        row = [n]
+
+        for label, module in modules:
+
+            handler = make_handler(module, n, reused=max(1, n // 4))
+
+            if (label == 'current'):
+
+                if (n <= args.pairwise_limit):
+                    pw_list = handler.decrypt_passwords()
+                    row.append(format_time(best_of(lambda : pairwise_reuse(pw_list), 1), 's'))
+                else:
+                    row.append(format_time(None))
+
+                row.append(format_time(best_of(handler.audit_pw_reuse_and_cmp_all, 1), 's'))
+                row.append(len(handler.get_pw_reuse_clusters()))
+
+            elif (n <= args.pairwise_limit):
+                row.append(format_time(best_of(handler.audit_pw_reuse_and_cmp_all, 1), 's'))
+
+            else:
+                row.append(format_time(None))
+
+        rows.append(row)
+
+    header = ['records', 'pairwise', 'audit', 'clusters']
+
+    if (len(modules) > 1):
+        header.append('against audit')
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+"""
+Decrypt latency per password
+
+* 'new handle' builds a Fernet of key 2 for every password, the way
+  get_pw_of_index() worked before ManageRecord kept its Fernet handles,
+  it's run on the records of this checkout
+
+Usage: python3 benchmarks/bench_decrypt.py [--sizes 2000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table
+from cryptography.fernet import Fernet
+
+
+def decrypt_with_new_handles(handler=None):
+
+    key_2 = bytes(handler.get_key_2(), 'utf-8')
+
+    for i in range(handler.get_number_of_records()):
+        token = handler.get_record_at_index_with_enc_pw(i).get_password_encrypted()
+        Fernet(key_2).decrypt(bytes(token, 'utf-8')).decode('utf-8')
+
+
+def main():
+
+    args    = parse_args('Decrypt latency per password', [2000])
+    modules = get_modules(args)
+
+    rows = []
+
+    for n in args.sizes:
+
+        row = [n]
+
+        for label, module in modules:
+
+            handler = make_handler(module, n)
+
+            if (label == 'current'):
+                t = best_of(lambda : decrypt_with_new_handles(handler), args.repeat)
+                row.append(format_time(t / n, 'us'))
+
+            t = best_of(lambda : [handler.get_pw_of_index(i) for i in range(n)], args.repeat)
+            row.append(format_time(t / n, 'us'))
+
+        rows.append(row)
+
+    header = ['records', 'new handle', 'get_pw_of_index()']
+
+    if (len(modules) > 1):
+        header.append('against')
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
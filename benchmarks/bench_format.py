@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+"""
+File size, save & load of the file format written by this checkout
+
+* Meant to be run with --against a checkout that writes an older format
+  (e.g format '01', a csv of fernet password tokens encrypted again as
+  a single fernet token), the format of each file is shown
+
+* Databases are loaded with the key from keyring, so the kdf of the
+  password isn't timed. Legacy formats ('00' / '01') derive key 2 from 
+  that key on every load, the time of one derivation is subtracted for them.
+
+Usage: python3 benchmarks/bench_format.py [--sizes 10000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table, BENCHMARK_PASSWORD
+import os, shutil, tempfile, time
+
+
+def get_format(path=''):
+
+    with open(path, 'rb') as fh:
+        header = fh.read(7)
+
+    if (header[:5] != b'PWMGR'):
+        return '00'
+
+    return header[5:7].decode('utf-8')
+
+
+def main():
+
+    args    = parse_args('File size, save & load of the file format', [10000])
+    modules = get_modules(args)
+
+    tmp_dir = tempfile.mkdtemp()
+
+    rows = []
+
+    try:
+
+        for n in args.sizes:
+
+            for label, module in modules:
+
+                handler = make_handler(module, n)
+                path    = os.path.join(tmp_dir, 'db.enc')
+                key     = handler.get_key()
+
+                if (type(key) == str):
+                    key = bytes(key, 'utf-8')
+
+                def save():
+                    for name in os.listdir(tmp_dir):
+                        os.remove(os.path.join(tmp_dir, name))
+
+                    handler.write_encrypted_database(path)
+
+                def load():
+                    module.ManageRecord().load_database(path, load_key_from_keyring=True, enc_key=key)
+
+                save_time = best_of(save, args.repeat)
+                load_time = best_of(load, args.repeat)
+                version   = get_format(path)
+
+                if (version in ['00', '01']):
+                    t = time.perf_counter()
+                    module.ManageRecord().generate_new_key(BENCHMARK_PASSWORD, True, False)
+                    load_time -= time.perf_counter() - t
+
+                rows.append([n, label, "'%s'" % version, '%.1f B' % (os.path.getsize(path) / n), \
+                             format_time(save_time, 's'), format_time(load_time, 's')])
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print_table(['records', 'checkout', 'format', 'size / record', 'save', 'load'], rows)
+
+
+if __name__ == '__main__':
+    main()
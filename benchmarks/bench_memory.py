@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+"""
+Memory held by records vs number of records (tracemalloc)
+
+* 'generated' is the memory of the records built by make_records(),
+  'csv import' is the memory of records built by convert_list_to_record()
+  from parsed csv rows, the way records of an imported vault are built.
+  Rows are parsed & dropped one at a time, only what the records keep
+  is counted.
+
+* Memory is what's still allocated once the records are built,
+  the peak isn't shown
+
+Usage: python3 benchmarks/bench_memory.py [--sizes 10000,50000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_records, print_table
+import csv, gc, io, tracemalloc
+
+
+def traced_memory(fn=None):
+
+    """
+    Returns: Bytes allocated by fn that are still held by the value it returns
+    """
+
+    gc.collect()
+    tracemalloc.start()
+
+    value = fn()
+
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    del value
+
+    return current
+
+
+def import_records(module=None, text=''):
+
+    return [module.convert_list_to_record(fields) for fields in csv.reader(io.StringIO(text))]
+
+
+def format_size(n=0, records=1):
+
+    return '%.2f MB (%d B)' % (n / 1000000, n / records)
+
+
+def main():
+
+    args    = parse_args('Memory held by records vs number of records', [10000, 50000])
+    modules = get_modules(args)
+
+    rows = []
+
+    for n in args.sizes:
+
+        row = [n]
+
+        fh = io.StringIO()
+        writer = csv.writer(fh, quoting=csv.QUOTE_ALL)
+
+        for r in make_records(modules[0][1], n):
+            writer.writerow(r.format_list())
+
+        text = fh.getvalue()
+
+        for label, module in modules:
+            row.append(format_size(traced_memory(lambda : make_records(module, n)), n))
+            row.append(format_size(traced_memory(lambda : import_records(module, text)), n))
+
+        rows.append(row)
+
+    header = ['records', 'generated', 'csv import']
+
+    if (len(modules) > 1):
+        header += ['against generated', 'against csv import']
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+"""
+Load & save of the binary payload vs quoted csv
+
+* Parse / encode columns time every record of the database in memory, as a
+  quoted csv line (csv.reader & convert_list_to_record(), the way csv segments
+  are still loaded) & as the binary payload (decode_record() / encode_record())
+
+* 'save' writes every record to a new file, 'load' includes key derivation
+  (pbkdf2, 100000 iterations where the checkout supports it)
+
+* With --against a checkout from before the binary payload, its save / load
+  & file size are those of csv segments
+
+Usage: python3 benchmarks/bench_payload.py [--sizes 10000,50000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table, BENCHMARK_PASSWORD
+import csv, os, shutil, tempfile
+
+
+def parse_csv(module=None, lines=[]):
+
+    for line in lines:
+        fields = next(csv.reader([line.decode('utf-8')], quotechar='"', delimiter=',', \
+                                 quoting=csv.QUOTE_ALL, skipinitialspace=True))
+        module.convert_list_to_record(fields)
+
+
+def parse_binary(module=None, payloads=[]):
+
+    for data in payloads:
+        module.decode_record(data)
+
+
+def main():
+
+    args    = parse_args('Load & save of the binary payload vs quoted csv', [10000, 50000])
+    modules = get_modules(args)
+
+    tmp_dir = tempfile.mkdtemp()
+
+    rows = []
+
+    try:
+
+        for n in args.sizes:
+
+            row = [n]
+
+            for label, module in modules:
+
+                handler = make_handler(module, n)
+                records = [handler.get_record_at_index_with_enc_pw(i) for i in range(n)]
+                path    = os.path.join(tmp_dir, '%s.enc' % label)
+
+                if (label == 'current'):
+
+                    lines    = [bytes(r.format_csv(), 'utf-8') for r in records]
+                    payloads = [module.encode_record(r) for r in records]
+
+                    for fn in [lambda : [bytes(r.format_csv(), 'utf-8') for r in records], \
+                               lambda : [module.encode_record(r) for r in records],        \
+                               lambda : parse_csv(module, lines),                           \
+                               lambda : parse_binary(module, payloads)]:
+                        row.append(format_time(best_of(fn, args.repeat), 's'))
+
+                def save():
+                    for name in os.listdir(tmp_dir):
+                        os.remove(os.path.join(tmp_dir, name))
+
+                    handler.write_encrypted_database(path)
+
+                def load():
+                    module.ManageRecord().load_database(path, BENCHMARK_PASSWORD)
+
+                row.append(format_time(best_of(save, args.repeat), 's'))
+                row.append(format_time(best_of(load, args.repeat), 's'))
+                row.append('%.1f B' % (os.path.getsize(path) / n))
+
+            rows.append(row)
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    header = ['records', 'encode csv', 'encode binary', 'parse csv', 'parse binary', \
+              'save', 'load', 'size / record']
+
+    if (len(modules) > 1):
+        header += ['against save', 'against load', 'against size']
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
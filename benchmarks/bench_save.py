@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+"""
+Save latency vs number of records
+
+* 'csv' / 'payload' only time the serialization of every record, as a quoted
+  csv line (Record.format_csv(), the save path before the binary payload)
+  & as the binary payload (encode_record(), which Record.serialize() keeps)
+
+* 'full save' writes every record to a new file, 'save after change'
+  modifies one record of a database that was just written & saves it again
+
+* kdf is excluded, keys are derived once before anything is timed
+
+Usage: python3 benchmarks/bench_save.py [--sizes 1000,10000,50000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table
+import os, shutil, tempfile
+
+
+def save_after_change(handler=None, path=''):
+
+    handler.write_encrypted_database(path)
+
+    record = handler.get_record_at_index_with_enc_pw(0)
+    record.set_remark(record.get_remark() + 'x')
+
+    handler.update_index(record, 0)
+
+    return best_of(lambda : handler.write_encrypted_database(path), 1)
+
+
+def main():
+
+    args    = parse_args('Save latency vs number of records', [1000, 10000, 50000])
+    modules = get_modules(args)
+
+    tmp_dir = tempfile.mkdtemp()
+
+    rows = []
+
+    try:
+
+        for n in args.sizes:
+
+            row = [n]
+
+            for label, module in modules:
+
+                handler = make_handler(module, n)
+                records = [handler.get_record_at_index_with_enc_pw(i) for i in range(n)]
+
+                if (label == 'current'):
+                    t = best_of(lambda : [bytes(r.format_csv(), 'utf-8') for r in records], args.repeat)
+                    row.append(format_time(t, 's'))
+                    t = best_of(lambda : [module.encode_record(r) for r in records], args.repeat)
+                    row.append(format_time(t, 's'))
+
+                def full_save():
+                    path = os.path.join(tmp_dir, 'full.enc')
+
+                    for name in os.listdir(tmp_dir):
+                        os.remove(os.path.join(tmp_dir, name))
+
+                    handler.write_encrypted_database(path)
+
+                row.append(format_time(best_of(full_save, args.repeat), 's'))
+                row.append(format_time(save_after_change(handler, os.path.join(tmp_dir, 'db.enc')), 's'))
+
+            rows.append(row)
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    header = ['records', 'csv', 'payload', 'full save', 'save after change']
+
+    if (len(modules) > 1):
+        header += ['against full save', 'against after change']
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
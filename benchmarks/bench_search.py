@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+"""
+search_all() latency vs number of records
+
+* 'scan' is a linear scan of every field of every record (one pass per
+  field, deduplicated & sorted), the way search_all() worked before the
+  trigram index, it's run on the records of this checkout
+
+* The index is built by the first search, its build time is shown
+  separately & isn't part of the latency per query
+
+Usage: python3 benchmarks/bench_search.py [--sizes 1000,10000,50000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, make_handler, best_of, \
+                       format_time, print_table
+import time
+
+QUERIES = ['site00012', 'user77', 'mail3', 'group1', 'example', 'us', 'zzz']
+
+
+def scan_search_all(handler=None, keyword=''):
+
+    keyword = keyword.lower()
+    matches = []
+
+    for getter in ['get_website', 'get_username', 'get_email', 'get_group']:
+
+        for i in range(handler.get_number_of_records()):
+
+            value = getattr(handler.get_record_at_index_with_enc_pw(i), getter)()
+
+            if (keyword in value.lower()):
+                matches.append(i)
+
+    return sorted(set(matches))
+
+
+def main():
+
+    args    = parse_args('search_all() latency vs number of records', [1000, 10000, 50000])
+    modules = get_modules(args)
+
+    rows = []
+
+    for n in args.sizes:
+
+        row = [n]
+
+        for label, module in modules:
+
+            handler = make_handler(module, n)
+
+            t = time.perf_counter()
+            handler.search_all(QUERIES[0])
+            build = time.perf_counter() - t
+
+            latency = best_of(lambda : [handler.search_all(q) for q in QUERIES], args.repeat)
+
+            if (label == 'current'):
+                scan = best_of(lambda : [scan_search_all(handler, q) for q in QUERIES], args.repeat)
+
+                # Results of the index have to match the scan
+                for q in QUERIES:
+                    assert handler.search_all(q) == scan_search_all(handler, q), q
+
+                row += [format_time(scan / len(QUERIES)), format_time(build)]
+
+            row.append(format_time(latency / len(QUERIES)))
+
+        rows.append(row)
+
+    header = ['records', 'scan / query', 'first search', 'index / query']
+
+    if (len(modules) > 1):
+        header.append('against / query')
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
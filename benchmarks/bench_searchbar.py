@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+"""
+Time of run_searchbar() vs number of choices
+
+* dmenu is replaced by a script that chooses the last line ('tail -n 1'),
+  so only passing the choices to it & mapping the choice back are timed,
+  it's put first in PATH for the duration of the script
+
+* 'shell' builds the choices by repeated concatenation & passes them to
+  'echo -e' through a shell, then maps the choice back with list.index(),
+  the way run_searchbar() worked before choices were piped to dmenu. It's
+  only run up to --shell-limit choices, same for --against.
+
+* Last 2 choices are identical, the last one has to be chosen
+
+Usage: python3 benchmarks/bench_searchbar.py [--sizes 1000,10000,100000] [--against DIR]
+"""
+
+from bench_util import parse_args, get_modules, best_of, format_time, print_table
+import os, shutil, subprocess, tempfile
+
+SEARCHBAR_CONFIG = {'theme': 1, 'searchbar_font_name': 'mono', 'searchbar_font_size': '10'}
+
+
+def shell_searchbar(input_list=[]):
+
+    msg = input_list[0]
+
+    for i in range(1, len(input_list)):
+        msg = '%s\n%s' % (msg, input_list[i])
+
+    process = subprocess.Popen('echo -e "%s" | dmenu -l 7 -i' % msg, shell=True, \
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    stdout, stderr = process.communicate()
+
+    return input_list.index(stdout.decode('utf-8').strip())
+
+
+def run_timed(fn=None, repeat=1):
+
+    """
+    Returns: (seconds, value returned by fn), seconds is None if fn failed
+    """
+
+    result = []
+
+    def call():
+        result.append(fn())
+
+    try:
+        return (best_of(call, repeat), result[-1])
+    except (OSError, ValueError) as e:
+        return (None, type(e).__name__)
+
+
+def main():
+
+    args    = parse_args('Time of run_searchbar() vs number of choices', [1000, 10000, 100000], \
+                         [('--shell-limit', 10000, 'Largest number of choices passed through a shell')])
+    modules = get_modules(args, 'pwmgr')
+
+    tmp_dir = tempfile.mkdtemp()
+
+    with open(os.path.join(tmp_dir, 'dmenu'), 'w') as fh:
+        fh.write('#!/bin/sh\ntail -n 1\n')
+
+    os.chmod(os.path.join(tmp_dir, 'dmenu'), 0o700)
+
+    os.environ['PATH'] = '%s:%s' % (tmp_dir, os.environ['PATH'])
+
+    rows = []
+
+    try:
+
+        for n in args.sizes:
+
+            choices = ['site%06d.example.com, user%d, user%d@mail.com, group%d' % (i, i, i, i % 12) \
+                           for i in range(n)]
+            choices[-2] = choices[-1]
+
+            row = [n]
+
+            for label, module in modules:
+
+                module.config = SEARCHBAR_CONFIG
+
+                if (label == 'current'):
+
+                    if (n <= args.shell_limit):
+                        t, index = run_timed(lambda : shell_searchbar(choices))
+                        row.append('%s (%s)' % (format_time(t), index))
+                    else:
+                        row.append(format_time(None))
+
+                    t, index = run_timed(lambda : module.run_searchbar(choices, list(range(1, n + 1))), \
+                                         args.repeat)
+                    row.append('%s (%s)' % (format_time(t), index))
+
+                elif (n <= args.shell_limit):
+                    t, index = run_timed(lambda : module.run_searchbar(choices))
+                    row.append('%s (%s)' % (format_time(t), index))
+
+                else:
+                    row.append(format_time(None))
+
+            rows.append(row)
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    header = ['choices', 'shell (chosen)', 'pipe (chosen)']
+
+    if (len(modules) > 1):
+        header.append('against (chosen)')
+
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+"""
+Helpers shared by the benchmark scripts in this directory
+
+* Every script measures database_pwmgr.py of this checkout. With '--against DIR'
+  the same workload is run on database_pwmgr.py of another checkout as well,
+  so that numbers before / after a change can be reproduced, e.g:
+
+      git worktree add /tmp/pwmgr-old <commit before the change>
+      python3 benchmarks/bench_search.py --against /tmp/pwmgr-old
+
+* Records are generated (See make_records()), nothing is read from
+  ~/.config/pwmgr/ & temporary files are removed when a script exits
+"""
+
+import argparse, importlib.util, os, sys, time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def load_module(directory='', name='database_pwmgr'):
+
+    """
+    Returns: Module loaded from 'directory/name.py', modules of different
+                 checkouts can be loaded side by side
+    """
+
+    path = os.path.join(directory, '%s.py' % name)
+
+    spec = importlib.util.spec_from_file_location('%s_%d' % (name, abs(hash(path))), path)
+    module = importlib.util.module_from_spec(spec)
+
+    # pwmgr.py imports database_pwmgr of the same checkout
+    sys.path.insert(0, directory)
+
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(directory)
+
+    return module
+
+
+def parse_args(description='', sizes=[], extra_args=[]):
+
+    """
+    Args: 1) Description of the script (str)
+          2) Default record counts (list of int)
+          3) Additional arguments [(name, default, help), ..]
+
+    Returns: Parsed arguments, sizes as a list of int
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+
+    parser.add_argument('--against', default='', metavar='DIR', \
+                        help='Checkout whose database_pwmgr.py is measured as well')
+    parser.add_argument('--sizes', default=','.join([str(n) for n in sizes]), \
+                        help='Comma separated record counts (Default: %(default)s)')
+    parser.add_argument('--repeat', default=3, type=int, \
+                        help='Best of n runs (Default: %(default)s)')
+
+    for name, default, text in extra_args:
+        parser.add_argument(name, default=default, type=type(default), \
+                            help='%s (Default: %%(default)s)' % text)
+
+    args = parser.parse_args()
+
+    args.sizes = [int(n) for n in args.sizes.split(',') if n != '']
+
+    return args
+
+
+def get_modules(args=None, name='database_pwmgr'):
+
+    """
+    Returns: [(label, module), ..] module of this checkout first
+    """
+
+    modules = [('current', load_module(REPO_DIR, name))]
+
+    if (args.against != ''):
+        modules.append(('against', load_module(os.path.abspath(args.against), name)))
+
+    return modules
+
+
+def best_of(fn=None, repeat=3):
+
+    """
+    Returns: Lowest time of n calls (seconds)
+    """
+
+    best = None
+
+    for i in range(repeat):
+
+        t = time.perf_counter()
+        fn()
+        t = time.perf_counter() - t
+
+        if (best == None or t < best):
+            best = t
+
+    return best
+
+
+def make_records(module=None, n=0, reused=0):
+
+    """
+    Args:    1) Module that provides Record
+             2) Number of records
+             3) Number of distinct passwords, 0 if every password is unique
+
+    Returns: Records with plain text passwords (list)
+    """
+
+    records = []
+
+    for i in range(n):
+
+        pw_n = i
+
+        if (reused > 0):
+            pw_n = i % reused
+
+        r = module.Record('site%06d.example.com' % i, 'Pw-%08d-%s' % (pw_n, 'x' * 8))
+        r.set_username('user%d' % i)
+        r.set_email('user%d@mail%d.com' % (i, i % 7))
+        r.set_group('group%d' % (i % 12))
+
+        records.append(r)
+
+    return records
+
+
+def make_handler(module=None, n=0, reused=0):
+
+    """
+    Returns: ManageRecord with new keys & n records added to it
+
+    * Checkouts that have set_kdf() use the lowest cost of pbkdf2, so that
+      kdf doesn't hide the time of loading, older ones have a fixed cost
+    """
+
+    handler = module.ManageRecord()
+
+    if (hasattr(handler, 'set_kdf')):
+        handler.set_kdf('01', [100000, 0, 0])
+
+    handler.generate_new_key(BENCHMARK_PASSWORD, True, True)
+    handler.add(make_records(module, n, reused))
+
+    return handler
+
+
+def format_time(seconds=None, unit='ms'):
+
+    if (seconds == None):
+        return '-'
+
+    if (unit == 'us'):
+        return '%.1f us' % (seconds * 1000000)
+    elif (unit == 'ms'):
+        return '%.2f ms' % (seconds * 1000)
+
+    return '%.3f s' % seconds
+
+
+def print_table(header=[], rows=[]):
+
+    widths = [max([len(str(row[i])) for row in [header] + rows]) for i in range(len(header))]
+
+    for row in [header] + rows:
+        print('  '.join([str(row[i]).rjust(widths[i]) for i in range(len(row))]))
+
+    print()
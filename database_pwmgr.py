@@ -1,12 +1,17 @@
 #!/usr/bin/python3
 from datetime import datetime
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives import hashes
 from hashlib import sha256
 import subprocess, ctypes
 import sys, os, csv
-import base64, math
+import base64, math, time, hmac, re
+import bisect
+from concurrent.futures import ThreadPoolExecutor
 
 
 global __app, __author, __last_updated__, __current_revision__
@@ -22,22 +27,30 @@ __current_revision__ = '3.0.1'
     ┃             Code Index             ┃
     ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
 
-       Record Class                   47
-       ManageRecord                  358
+       Record Class                   45
+       ManageRecord                  428
 
-       Database Encryption Mgmt      377
-       Database RW                   661
-       Database Password Auditing    919
-       Database Miscellaneous       1436
-       Database Export              1937
+       Database Encryption Mgmt      533
+       Database RW                  1392
+       Database Password Auditing   2477
+       Database Miscellaneous       3162
+       Database Export              4043
 
-       Utility                      2177
-       Security Functions           2374
+       Key Derivation               4372
+       Utility                      4613
+       Security Functions           5048
 """
 
 
 class Record():
 
+    # Large vaults (e.g imported browser exports) hold a lot of records, 
+    # slots keep them compact (no __dict__ per record)
+    __slots__ = ('__id', '__website', '__password', '__last_modified', '__last_modified_checked', \
+                 '__last_modified_epoch', '__summary', '__serialized', '__email', '__username',   \
+                 '__group', '__remark', '__two_factor', '__recovery_email', '__phone_number',     \
+                 '__pw_age', '__pw_reuse', '__pw_complexity', '__security_rating')
+
     def __init__(self, website='', password='', last_modified=''):
 
         """
@@ -55,32 +68,28 @@ class Record():
 
         """
 
+        # Assigned by ManageRecord when the record is added / loaded (0: unassigned)
+        self.__id = 0
+
         self.__website = website.lower()
         self.__password = password
 
+        # Summary is built on first call to get_summary()
+        self.__summary = None
+
+        # Built on first call to serialize()
+        self.__serialized = None
+
         if (last_modified == ''):
 
             self.update_last_modified()
 
         else:
 
-            reset_date    = False
-
-            test_date_obj = None
-
-            try:
-                test_date_obj = datetime.strptime(last_modified, "%d-%m-%Y %H:%M")
-
-                if (test_date_obj >= datetime.now()):
-                    reset_date = True
-
-            except (ValueError):
-                reset_date = True
-
-            if (reset_date):
-                self.update_last_modified()
-            else:
-                self.__last_modified = last_modified
+            # Date is validated on first access (See get_last_modified()),
+            # loading a database doesn't need to parse dates of all records
+            self.__last_modified         = last_modified
+            self.__last_modified_checked = False
 
         self.__email = ''
         self.__username = ''
@@ -137,6 +146,9 @@ class Record():
         Used by: get_record_summary() in Class ManageDatabase()
         """
 
+        if (self.__summary != None):
+            return self.__summary
+
         s = "%s" % (self.get_website())
 
         if (self.__username != ''):
@@ -148,6 +160,8 @@ class Record():
         if (self.__group != ''):
             s = '%s, %s' % (s, self.get_group())
 
+        self.__summary = s
+
         return s
 
 
@@ -156,29 +170,9 @@ class Record():
         Makes our data compatible with double quote enclosed csv format
         """
 
-        tmp_data = list(data)
-
-        new_list = []
-        new_list.append('"')
-
-        # Since we use double quoted csv format,
-        # if there's any double quote present, it
-        # needs to be replaced wit 2 double quote
-        if '"' in tmp_data:
-            for i in range(len(tmp_data)):
-
-                if (tmp_data[i] == '"'):
-                    new_list.append('"')
-                    new_list.append('"')
-                else:
-                    new_list.append(tmp_data[i])
-
-            new_list.append('"')
-        else:
-            new_list = new_list + tmp_data
-            new_list.append('"')
-
-        return (''.join(new_list))
+        # Since we use double quoted csv format, if there's any 
+        # double quote present, it needs to be replaced with 2 double quote
+        return '"%s"' % (data.replace('"', '""'))
 
 
     def format_csv(self):
@@ -198,29 +192,54 @@ class Record():
         # pw_age,pw_reuse,pw_complexity,security_rating
         #==========================================================
 
-        data = '%s' % self.format_field_csv(self.get_website())
-        data = '%s,%s' % (data, self.format_field_csv(self.get_password_encrypted()))
-        data = '%s,%s' % (data, self.format_field_csv(self.get_last_modified()))
-        data = '%s,%s' % (data, self.format_field_csv(self.get_email()))
-        data = '%s,%s' % (data, self.format_field_csv(self.get_username()))
-        data = '%s,%s' % (data, self.format_field_csv(self.get_group()))
-        data = '%s,%s' % (data, self.format_field_csv(self.get_remark()))
+        fields = self.format_list()
+
+        data = '","'.join(fields)
+
+        # Only the separators have double quotes, nothing needs to be escaped
+        if (data.count('"') != 2 * (len(fields) - 1)):
+            data = '","'.join([field.replace('"', '""') for field in fields])
+
+        return '"%s"' % (data)
+
+
+    def serialize(self):
+        """
+        Binary payload of the record (See encode_record()), it's kept until a field 
+            is modified so that records that haven't changed aren't encoded on every write
+
+        Args:       N/A
+
+        Returns:    (bytes)
+        """
+
+        if (self.__serialized == None):
+            self.__serialized = encode_record(self)
+
+        return self.__serialized
+
+
+    def format_list(self):
+        """
+        All fields of a record as a list of str, in the same
+        order as the csv headers
+
+        Args:       N/A
+
+        Returns:    (list)
+        """
 
         # Internally two factor is stored as '0' or '1' or '' (if not set)
         # We store it in its original form by directry accessing the variable,
         # but when called by pwmgr frontend using get_two_factor(), we modify
         # it's value to be more readable
-        data = '%s,%s' % (data,self.format_field_csv(self.__two_factor))
-
-        data = '%s,%s' % (data,self.format_field_csv(self.get_recovery_email()))
-        data = '%s,%s' % (data,self.format_field_csv(self.get_phone_number()))
 
-        data = '%s,%s' % (data,self.format_field_csv(self.get_pw_age()))
-        data = '%s,%s' % (data,self.format_field_csv(self.get_pw_reuse()))
-        data = '%s,%s' % (data,self.format_field_csv(self.get_pw_complexity()))
-        data = '%s,%s' % (data,self.format_field_csv(self.get_security_rating()))
-
-        return ''.join(data)
+        return [self.get_website(), self.get_password_encrypted(), \
+                self.get_last_modified(), self.get_email(), \
+                self.get_username(), self.get_group(), self.get_remark(), \
+                self.__two_factor, self.get_recovery_email(), \
+                self.get_phone_number(), self.get_pw_age(), self.get_pw_reuse(), \
+                self.get_pw_complexity(), self.get_security_rating()]
 
 
     def update_last_modified(self):
@@ -236,8 +255,42 @@ class Record():
         ## Format
         # 'dd-mm-yyyy hh:min'
 
-        self.__last_modified = datetime.today().strftime("%d-%m-%Y %H:%M")
+        date_obj = datetime.today().replace(second=0, microsecond=0)
+
+        self.__last_modified         = date_obj.strftime("%d-%m-%Y %H:%M")
+        self.__last_modified_epoch   = int(date_obj.timestamp())
+        self.__last_modified_checked = True
+        self.__serialized            = None
+
+
+    def __check_last_modified(self):
+
+        """
+        Resets 'last_modified' if it isn't a valid date or it is in the future
+        """
+
+        reset_date    = False
+
+        test_date_obj = None
+
+        try:
+            test_date_obj = datetime.strptime(self.__last_modified, "%d-%m-%Y %H:%M")
+
+            if (test_date_obj >= datetime.now()):
+                reset_date = True
+
+        except (ValueError):
+            reset_date = True
 
+        if (reset_date):
+            self.update_last_modified()
+        else:
+            self.__last_modified_epoch   = int(test_date_obj.timestamp())
+            self.__last_modified_checked = True
+
+
+    def get_id(self):
+        return self.__id
 
     def get_group(self):
         return self.__group
@@ -249,8 +302,23 @@ class Record():
         return self.__password
 
     def get_last_modified(self):
+
+        if (not self.__last_modified_checked):
+            self.__check_last_modified()
+
         return self.__last_modified
 
+    def get_last_modified_epoch(self):
+
+        """
+        Returns: 'last_modified' as seconds since epoch (int), for sorting
+        """
+
+        if (not self.__last_modified_checked):
+            self.__check_last_modified()
+
+        return self.__last_modified_epoch
+
     def get_email(self):
         return self.__email
 
@@ -285,28 +353,45 @@ class Record():
     def get_security_rating(self):
         return self.__security_rating
 
+    def set_id(self, value=0):
+        self.__id = value
+
     def set_group(self, value=""):
-        self.__group = value
+        # Same few values are shared by many records
+        self.__group = sys.intern(value)
+        self.__summary = None
+        self.__serialized = None
 
     def set_website(self, value=""):
         self.__website = value
+        self.__summary = None
+        self.__serialized = None
 
     def set_password(self, value="", update_lm=False):
         self.__password = value
+        self.__serialized = None
 
         if (update_lm):
             self.update_last_modified()
 
     def set_email(self, value=""):
-        self.__email = value
+        # Same few values are shared by many records
+        self.__email = sys.intern(value)
+        self.__summary = None
+        self.__serialized = None
 
     def set_username(self, value=""):
         self.__username = value
+        self.__summary = None
+        self.__serialized = None
 
     def set_remark(self, value=""):
         self.__remark = value
+        self.__serialized = None
 
     def set_two_factor(self, value=''):
+        self.__serialized = None
+
         if (type(value) == bool):
             if (value):
                 self.__two_factor = '1'
@@ -317,21 +402,27 @@ class Record():
 
     def set_recovery_email(self, value=""):
         self.__recovery_email = value
+        self.__serialized = None
 
     def set_phone_number(self, value=""):
         self.__phone_number = value
+        self.__serialized = None
 
     def set_pw_age(self, value=""):
         self.__pw_age = value
+        self.__serialized = None
 
     def set_pw_reuse(self, value=""):
         self.__pw_reuse = value
+        self.__serialized = None
 
     def set_pw_complexity(self, value=""):
         self.__pw_complexity = value
+        self.__serialized = None
 
     def set_security_rating(self, value=""):
         self.__security_rating = value
+        self.__serialized = None
 
 
 class ManageRecord():
@@ -345,15 +436,92 @@ class ManageRecord():
 
         self.__salt_length       = 32
         self.__record_list       = []
+
+        # Records are sorted by website in __record_list, they're also 
+        # mapped by id (See get_record_by_id()), ids are stored in the footer
+        self.__record_map        = {}
+        self.__next_id           = 1
         self.__hash_length       = 64 # SHA-256
 
         self.__master_password   = ''
 
+        # Derived from the password (& keyfile), it only wraps key 1 & key 2 which
+        # are random (See __generate_data_keys()), so changing the password doesn't 
+        # change the keys records are encrypted with. Databases in format '00' / '01'
+        # used derived keys, they're replaced on the next write (legacy keys)
+        self.__master_key        = ''
+        self.__wrapped_keys      = b''
+        self.__legacy_keys       = False
+
+        # Unlock methods that wrap the same keys [[type, kdf_id, params, salt, wrapped keys], ..],
+        # the slot that unlocked the database is the one whose master key, salt 1, kdf &
+        # wrapped keys are in use, only its type is kept in here (See __get_key_slots())
+        self.__key_slots         = []
+        self.__key_slot          = 0
+
         self.__encryption_key_1  = ''
         self.__encryption_key_2  = ''
+
+        # Cipher handles of key 1 & key 2 {1: (key, Fernet), 2: ..}, built once per key 
+        # (See __reset_fernet_handlers())
+        self.__fernet_handlers   = {}
         self.__salt_1            = ''
         self.__salt_2            = ''
 
+        self.__kdf_id            = KDF_PBKDF2
+        self.__kdf_params        = list(KDF_DEFAULT_PARAMS[KDF_PBKDF2])
+
+        # State of the segmented file ('02') that was last loaded / written,
+        # used to encrypt only the records that changed (see write_encrypted_database())
+        self.__segment_file      = ''
+        self.__segment_header    = b''
+        self.__segment_key       = ''
+        self.__segment_trailer   = b''
+        self.__segment_footer    = b''
+        self.__segment_stat      = None
+        self.__segment_pool      = {}
+
+        # Summary section as (digest of payload, offset, length, digest), 
+        # it's copied as it is if the summary of records hasn't changed
+        self.__segment_summary   = None
+
+        # Records that were loaded from the summary only, by id (offset, length, digest,
+        # digest of payload) of their segments, see load_database() & fetch_record()
+        self.__summary_segments  = {}
+
+        self.__backup_generations = BACKUP_GENERATIONS
+
+        # Changes that are appended to the journal next to the database
+        # instead of writing it (see __write_journal()). Methods that modify
+        # records in place (audit, etc.) set __journal_ok to False, so that
+        # the database is written instead
+        self.__journal_ok        = False
+        self.__journal_pending   = []
+        self.__journal_count     = 0
+        self.__journal_stat      = None
+        self.__journal_end       = 0
+        self.__journal_last      = ''
+        self.__record_digests    = {}
+
+        # Trigram index of website, username, email & group (lowercase), 
+        # built by the first search & kept updated by add() / update_index() / 
+        # remove_index() (See __search_partial_match())
+        self.__search_index      = None
+        self.__search_fields     = {}
+
+        # Records ordered by last modified & security rating [(key, id), ..], 
+        # built on first use & kept updated the same way as the search index 
+        # (See __order_add()), keys are stored as they were when ordered
+        self.__orders            = {}
+        self.__order_keys        = {}
+
+        # Ids of records that share a password [[id, ..], ..] (See audit_pw_reuse_and_cmp_all())
+        self.__pw_reuse_clusters = []
+
+        # Audit information of records by id {id: (fingerprint, pw digest)}, stored 
+        # next to the database so that audits only decrypt passwords that changed
+        self.__audit_cache       = None
+
         self.__symbols           = "[!@#$%&,./<;()|:^{}]?-_*'+=>"
         self.__ucase             = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
         self.__num               = "0123456789"
@@ -369,11 +537,12 @@ class ManageRecord():
     def get_key(self):
 
         """
-        Returns the key that was used for encryption of data
+        Returns the master key, derived from the password (& keyfile), 
+            the database can be loaded with it instead of the password
 
         """
 
-        return self.__encryption_key_1.decode('utf-8')
+        return self.__master_key.decode('utf-8')
 
 
     def get_key_2(self):
@@ -386,6 +555,75 @@ class ManageRecord():
         return self.__encryption_key_2.decode('utf-8')
 
 
+    def uses_legacy_keys(self):
+
+        """
+        Returns: True if key 2 is derived from the password (format '00' / '01'),
+                     False if keys are random & wrapped by the master key
+        """
+
+        return self.__legacy_keys
+
+
+    def get_salt_id(self):
+
+        """
+        Returns an identifier (sha256 hex digest) of the kdf parameters & 
+            the salt pair that was used to derive the keys
+
+        * Used by the frontend to check whether a cached key 2 
+          belongs to the database that is being loaded
+        """
+
+        salt_2 = self.__salt_2
+
+        # Keys that are wrapped don't have salt 2 (See write_encrypted_database())
+        if (salt_2 == ''):
+            salt_2 = b''
+
+        return self.generate_hash(kdf_format_header(self.__kdf_id, self.__kdf_params) + \
+                                  self.__salt_1 + salt_2)
+
+
+    def set_backup_generations(self, n=3):
+
+        """
+        Sets the number of previous databases that are kept when it's written, 0 disables it
+        """
+
+        if (type(n) != int or n < 0):
+            raise InvalidParameterException('set_backup_generations(): requires a positive integer')
+
+        self.__backup_generations = n
+
+
+    def get_kdf(self):
+
+        """
+        Returns: (kdf_id, [param-1, param-2, param-3]) used for deriving the keys
+        """
+
+        return (self.__kdf_id, list(self.__kdf_params))
+
+
+    def set_kdf(self, kdf_id='', params=[]):
+
+        """
+        Sets the key derivation function & its cost parameters
+
+        * It only takes effect the next time keys are derived, so it needs to
+          be followed by change_password() / use_keyfile() to wrap the keys again
+
+        Exceptions: InvalidParameterException if kdf or its parameters are not valid
+        """
+
+        if (not kdf_validate_params(kdf_id, params)):
+            raise InvalidParameterException('set_kdf(): kdf parameters are not valid')
+
+        self.__kdf_id     = kdf_id
+        self.__kdf_params = list(params)
+
+
     def get_master_password(self):
 
         """
@@ -410,7 +648,7 @@ class ManageRecord():
         fernet_handler = ''
 
         if (enc_key == ''):
-            fernet_handler = Fernet(self.__encryption_key_2)
+            fernet_handler = self.__get_fernet_handler(2)
         else:
             fernet_handler = Fernet(enc_key)
 
@@ -432,7 +670,7 @@ class ManageRecord():
         fernet_handler = ''
 
         if (enc_key == ''):
-            fernet_handler = Fernet(self.__encryption_key_2)
+            fernet_handler = self.__get_fernet_handler(2)
         else:
             fernet_handler = Fernet(enc_key)
 
@@ -444,6 +682,56 @@ class ManageRecord():
             raise IncorrectPasswordException('Unable to decrypt pw, database possibly corrupted')
 
 
+    def decrypt_passwords(self, indexes=None, enc_key=''):
+
+        """
+        Plain text pw of records at indexes, decrypted in batches that are 
+            spread over threads (See map_in_chunks())
+
+        Args:    1) Indexes (list), all records if None
+                 2) Key, same as get_pw_of_index()
+
+        Returns: Plain text pw (list) in the order of indexes
+
+        Exceptions: IncorrectPasswordException if a pw can't be decrypted
+        """
+
+        if (indexes == None):
+            indexes = range(len(self.__record_list))
+
+        fernet_handler = self.__get_fernet_handler(2)
+
+        if (enc_key != ''):
+            fernet_handler = Fernet(enc_key)
+
+        tokens = [bytes(self.__record_list[i].get_password_encrypted(), 'utf-8') for i in indexes]
+
+        try:
+            return map_in_chunks(fernet_decrypt_chunk, fernet_handler, tokens)
+        except (InvalidToken, UnicodeDecodeError):
+            raise IncorrectPasswordException('Unable to decrypt pw, database possibly corrupted')
+
+
+    def encrypt_passwords(self, pw_list=[], enc_key=''):
+
+        """
+        Encrypts plain text pw in batches that are spread over threads, 
+            same as __encrypt_pw() for each of them
+
+        Args:    1) Plain text pw (list)
+                 2) Key, key 2 if not specified
+
+        Returns: Encrypted pw (list of str) in the same order
+        """
+
+        fernet_handler = self.__get_fernet_handler(2)
+
+        if (enc_key != ''):
+            fernet_handler = Fernet(enc_key)
+
+        return map_in_chunks(fernet_encrypt_chunk, fernet_handler, pw_list)
+
+
     def generate_new_key(self, \
             password='', generate_salt=True,
                update_enc_key=True, path_to_keyfile=''):
@@ -480,46 +768,93 @@ class ManageRecord():
             # Used for database encryption
             self.__salt_1 = os.urandom(self.__salt_length) 
 
-        key = ''
+        key = self.__derive_master_key(self.__kdf_id, self.__kdf_params, self.__salt_1, \
+                                       password, path_to_keyfile)
 
-        if (path_to_keyfile == ''):
+        if (update_enc_key):
+            self.__master_key   = key
+            self.__wrapped_keys = b''
+
+            if (generate_salt):
 
-            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), \
-                    length=32, salt=self.__salt_1, iterations=1000000)
+                # New database / new password, a database with legacy keys is migrated
+                if (self.__encryption_key_1 == '' or self.__legacy_keys):
+                    self.__generate_data_keys()
 
-            key = base64.urlsafe_b64encode(\
-                    kdf.derive(bytes(password, 'utf-8')))
+                self.__key_slots[self.__key_slot][0] = KEY_SLOT_PASSWORD
 
+                if (path_to_keyfile != ''):
+                    self.__key_slots[self.__key_slot][0] = KEY_SLOT_KEYFILE
         else:
+            return key.decode('utf-8')
+
 
-            if (not os.path.isfile(path_to_keyfile)):
-                raise FileNotFoundError('generate_new_key(): keyfile not found')
+    def __derive_master_key(self, kdf_id='', params=[], salt=b'', password='', path_to_keyfile=''):
 
-            kf_data = ''
+        """
+        Derives a master key from password (& keyfile), see generate_new_key()
 
-            output = keyfile_load(path_to_keyfile)
+        Returns: (bytes) base64 encoded key
 
-            if (not output[0] or len(output[1]) < 1000):
-                raise KeyFileInvalidException()
-            else:
-                kf_data = bytes(output[1], 'utf-8')
+        Exceptions: FileNotFoundError / KeyFileInvalidException if keyfile can't be used
+        """
+
+        if (path_to_keyfile == ''):
+            return base64.urlsafe_b64encode(kdf_derive(kdf_id, params, salt, bytes(password, 'utf-8')))
 
-            kf_data = kf_data + bytes(password, 'utf-8')
+        if (not os.path.isfile(path_to_keyfile)):
+            raise FileNotFoundError('generate_new_key(): keyfile not found')
 
-            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), \
-                    length=32, salt=self.__salt_1, iterations=1000000)
+        kf_data = ''
 
-            key = base64.urlsafe_b64encode(kdf.derive(kf_data))
+        output = keyfile_load(path_to_keyfile)
 
-        if (update_enc_key):
-            self.__encryption_key_1 = key
-            self.__generate_new_key_2()
+        if (not output[0] or len(output[1]) < 1000):
+            raise KeyFileInvalidException()
         else:
-            return key.decode('utf-8')
+            kf_data = bytes(output[1], 'utf-8')
+
+        kf_data = kf_data + bytes(password, 'utf-8')
+
+        return base64.urlsafe_b64encode(kdf_derive(kdf_id, params, salt, kf_data))
+
+
+    def __generate_data_keys(self):
+
+        """
+        Generates random key 1 & key 2, they're stored wrapped by the master key 
+            in the header (See __format_segment_header()), passwords encrypted with
+            the previous key 2 are migrated to the new one
+
+        * Other key slots wrap the previous keys, so only the slot in use is kept
+        """
+
+        old_key_2 = self.__encryption_key_2
+
+        slot_type = KEY_SLOT_PASSWORD
+
+        if (len(self.__key_slots) > 0):
+            slot_type = self.__key_slots[self.__key_slot][0]
+
+        self.__encryption_key_1 = Fernet.generate_key()
+        self.__encryption_key_2 = Fernet.generate_key()
+        self.__wrapped_keys     = b''
+        self.__legacy_keys      = False
+        self.__key_slots        = [[slot_type]]
+        self.__key_slot         = 0
+
+        self.__reset_fernet_handlers()
+
+        if (old_key_2 != '' and len(self.__record_list) > 0):
+            self.__migrate_all_pw_from_old_to_new_key(old_key_2, self.__encryption_key_2)
 
 
     def __generate_new_key_2(self):
 
+        """
+        Derives key 2 from key 1, only used by databases with legacy keys
+        """
+
         if (self.__encryption_key_1 == ''):
             raise InvalidParameterException('__generate_new_key_2(): ' + \
                                             'key 1 needs to be generated first, ' + \
@@ -527,51 +862,183 @@ class ManageRecord():
         if (self.__salt_2 == ''):
             self.__salt_2 = os.urandom(self.__salt_length)
 
-        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), \
-                length=32, salt=self.__salt_2, iterations=1000000)
-
         _key = self.__encryption_key_1
 
-        self.__encryption_key_2 = base64.urlsafe_b64encode(kdf.derive(_key))
+        self.__encryption_key_2 = base64.urlsafe_b64encode(kdf_derive(self.__kdf_id, \
+                                                           self.__kdf_params, self.__salt_2, _key))
+
+        self.__reset_fernet_handlers()
+
+
+    def __get_fernet_handler(self, n=2):
+
+        """
+        Returns the cipher handle (Fernet) of key 1 / key 2, so that it doesn't need
+            to be built (key decoded, etc.) every time a pw / segment is encrypted
+
+        * If the key has changed since the handle was built, a new one is built
+        """
+
+        key = self.__encryption_key_2
+
+        if (n == 1):
+            key = self.__encryption_key_1
+
+        handler = self.__fernet_handlers.get(n)
+
+        if (handler == None or handler[0] is not key):
+            handler = (key, Fernet(key))
+            self.__fernet_handlers[n] = handler
+
+        return handler[1]
+
+
+    def __reset_fernet_handlers(self):
+
+        """
+        Drops handles of the previous keys & builds them for the current ones,
+            called whenever keys are derived / loaded
+        """
+
+        self.__fernet_handlers = {}
+
+        if (self.__encryption_key_1 != '' and self.__encryption_key_2 != ''):
+            self.__get_fernet_handler(1)
+            self.__get_fernet_handler(2)
 
 
     def change_password(self, new_password=''):
 
         """
-        Generates new salt and derives a new key based on the 
-        new password. Re-encrypts database with new key.
+        Generates new salt and derives a new master key based on the 
+        new password. Key 1 & key 2 are wrapped with it on the next write,
+        records don't need to be encrypted again (unless keys are legacy).
+        Only the key slot in use is changed, other slots are left as they are.
+
+        * Keys derived from key 1 (mac, audit & segment keys) don't change
 
         Args:    The new password to use to encrypt the database
 
-        Returns: Boolean value indicating success / failure
+        Returns: N/A
         """
 
-        old_key_2 = self.__encryption_key_2
-
         self.__master_password = new_password
         self.generate_new_key(new_password, generate_salt=True, update_enc_key=True)
 
-        self.__migrate_all_pw_from_old_to_new_key(old_key_2, self.__encryption_key_2)
-
 
     def use_keyfile(self, pw, path_to_keyfile=''):
 
-        old_key_2 = self.__encryption_key_2
-
         self.__master_password = pw
         self.generate_new_key(pw, True, True, path_to_keyfile)
 
-        self.__migrate_all_pw_from_old_to_new_key(old_key_2, self.__encryption_key_2)
-
 
     def remove_keyfile(self, pw):
 
-        old_key_2 = self.__encryption_key_2
-
         self.__master_password = pw
         self.generate_new_key(pw, True, True, '')
 
-        self.__migrate_all_pw_from_old_to_new_key(old_key_2, self.__encryption_key_2)
+
+    def add_key_slot(self, slot_type='', password='', path_to_keyfile='', kdf_id='', params=[]):
+
+        """
+        Adds a key slot that wraps key 1 & key 2 with a master key derived from 
+            another password / keyfile / recovery key, so the database can be 
+            unlocked with either of them. Records don't need to be encrypted again 
+            (unless keys are legacy), only the header changes on the next write.
+
+        Args:    1) KEY_SLOT_PASSWORD / KEY_SLOT_KEYFILE / KEY_SLOT_RECOVERY
+                 2) Password / recovery key (See generate_recovery_key())
+                 3) Path to keyfile, only used by KEY_SLOT_KEYFILE
+                 4) Kdf & its parameters (Default: kdf of the slot in use)
+
+        Returns: (int) index of the new slot
+
+        Exceptions: 
+
+         1) InvalidParameterException if a parameter is not valid / no more slots can be added
+         2) NoKeyFoundException if keys haven't been generated / loaded
+         3) FileNotFoundError / KeyFileInvalidException if keyfile can't be used
+        """
+
+        if (slot_type not in KEY_SLOT_NAMES):
+            raise InvalidParameterException('add_key_slot(): type of key slot is not valid')
+        elif (password == ''):
+            raise InvalidParameterException('add_key_slot(): requires a password')
+        elif (slot_type == KEY_SLOT_KEYFILE and path_to_keyfile == ''):
+            raise InvalidParameterException('add_key_slot(): requires a keyfile')
+        elif (len(self.__key_slots) >= KEY_SLOTS_MAX):
+            raise InvalidParameterException('add_key_slot(): database can only have %d key slots' % \
+                                            KEY_SLOTS_MAX)
+
+        if (self.__master_key == '' or self.__encryption_key_1 == ''):
+            raise NoKeyFoundException('Need to initialize key first, ' + \
+                    'call generate_new_key() function')
+
+        if (kdf_id == ''):
+            kdf_id, params = self.__kdf_id, self.__kdf_params
+        elif (not kdf_validate_params(kdf_id, params)):
+            raise InvalidParameterException('add_key_slot(): kdf parameters are not valid')
+
+        if (slot_type != KEY_SLOT_KEYFILE):
+            path_to_keyfile = ''
+
+        salt = os.urandom(self.__salt_length)
+
+        master_key = self.__derive_master_key(kdf_id, params, salt, password, path_to_keyfile)
+
+        # Other slots can't wrap keys that are derived from the password
+        if (self.__legacy_keys):
+            self.__generate_data_keys()
+
+        wrapped_keys = Fernet(master_key).encrypt(self.__encryption_key_1 + self.__encryption_key_2)
+
+        self.__key_slots.append([slot_type, kdf_id, list(params), salt, wrapped_keys])
+
+        return len(self.__key_slots) - 1
+
+
+    def remove_key_slot(self, index=0):
+
+        """
+        Removes a key slot, so it can no longer unlock the database once it's written
+
+        * Keys are not changed, anyone who has unlocked the database with the slot 
+          before may still have them. Changing the password of the slot in use 
+          doesn't change them either.
+
+        Exceptions: InvalidParameterException if index is not valid / it's the slot in use
+        """
+
+        if (type(index) != int or index < 0 or index >= len(self.__key_slots)):
+            raise InvalidParameterException('remove_key_slot(): key slot %s does not exist' % index)
+        elif (index == self.__key_slot):
+            raise InvalidParameterException('remove_key_slot(): key slot in use can not be removed')
+
+        del self.__key_slots[index]
+
+        if (index < self.__key_slot):
+            self.__key_slot -= 1
+
+
+    def get_key_slots(self):
+
+        """
+        Returns: [(type, kdf_id, [param-1, param-2, param-3]), ..] of every key slot
+        """
+
+        if (len(self.__key_slots) == 0):
+            return []
+
+        return [(slot[0], slot[1], list(slot[2])) for slot in self.__get_key_slots()]
+
+
+    def get_key_slot(self):
+
+        """
+        Returns: (int) index of the key slot that unlocked the database
+        """
+
+        return self.__key_slot
 
 
     def generate_hash(self, input_str):
@@ -599,11 +1066,12 @@ class ManageRecord():
             raise InvalidParameterException('migrate_all_pw_from_old_to_new_key():' + \
                 ' encryption keys cannot be empty')
 
-        for i in range(len(self.__record_list)):
+        self.__journal_ok = False
 
-            pw = self.get_pw_of_index(i, old_key)
+        pw_list = self.encrypt_passwords(self.decrypt_passwords(None, old_key), new_key)
 
-            self.__record_list[i].set_password(self.__encrypt_pw(pw, new_key))
+        for i in range(len(self.__record_list)):
+            self.__record_list[i].set_password(pw_list[i])
 
 
     def __encrypt_pw(self, pw, enc_key=''):
@@ -619,1083 +1087,2614 @@ class ManageRecord():
         fernet_handler = ''
 
         if (enc_key == ''):
-            fernet_handler = Fernet(self.__encryption_key_2)
+            fernet_handler = self.__get_fernet_handler(2)
         else:
             fernet_handler = Fernet(enc_key)
 
         return fernet_handler.encrypt(bytes(pw, 'utf-8')).decode()
 
 
-    def __encrypt_database_in_memory(self):
+    def __get_mac_key(self):
 
         """
-        Encrypts the entire database
+        Returns the key used for authenticating the segmented file format,
+            it is derived from key 1 (a random data key, see __generate_data_keys())
 
-        Used by: write_encrypted_database()
+        * Key 1 is only wrapped again when the password / keyfile / kdf changes 
+          (See change_password()), so the mac key stays the same. It's only replaced 
+          along with key 1 when legacy keys are migrated.
         """
 
-        data = self.format_csv(include_header=False)
+        return hmac.new(base64.urlsafe_b64decode(self.__encryption_key_1), \
+                        b'PWMGR02 mac', sha256).digest()
 
-        output_str = ''
 
-        for item in data: 
-            output_str += item 
+    def __get_segment_cipher(self):
 
-        fernet_handler = Fernet(self.__encryption_key_1)
+        """
+        Returns the AES-GCM handle segments are encrypted with, its 
+            key is derived from key 1 like the mac key. It's kept along with the 
+            fernet handles, so it's built again when keys change.
+        """
 
-        return fernet_handler.encrypt(bytes(output_str, 'utf-8'))
+        handler = self.__fernet_handlers.get('segment')
 
+        if (handler == None or handler[0] is not self.__encryption_key_1):
+            key = hmac.new(base64.urlsafe_b64decode(self.__encryption_key_1), \
+                           b'PWMGR02 segment key', sha256).digest()
 
-    '''
-    ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
-    ┃   Database Read / Write                                            ┃
-    ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
-    '''
+            handler = (self.__encryption_key_1, AESGCM(key))
+            self.__fernet_handlers['segment'] = handler
 
-    def write_encrypted_database(self, filename='data.enc'):
+        return handler[1]
+
+
+    def __format_segment_header(self):
 
         """
-        Responsible for encryption of database
+        Returns: (bytes) PWMGR | 02 | slot count | key slots | key check
+        """
 
-        Args:       The name of the regular encryted file. (Default: 'data.enc')
+        header = b'PWMGR02'
 
-        Returns:    Boolean value indicating whether the operation succeeded or not.
+        slots = self.__get_key_slots()
 
-        Exceptions:
+        header += bytes('%02d' % len(slots), 'utf-8')
 
-         1) NoKeyFoundException if a new key hasn't been generated
-         2) IOError If an error occured while reading/writing file
+        for slot_type, kdf_id, params, salt, keys in slots:
+            header += bytes(slot_type, 'utf-8') + kdf_format_header(kdf_id, params) + salt + \
+                      bytes('%04d' % len(keys), 'utf-8') + keys
 
-        Notes:
+        key_check = hmac.new(self.__get_mac_key(), b'PWMGR02 key check', sha256).hexdigest()
 
-              06/19/2024:
+        return header + bytes(key_check, 'utf-8')
 
-                  * Original file format had 'PWMGR' flag, which was used to identify the file format, 
-                         but down the line it got hacked & removed, that has now been fixed.
+
+    def __get_wrapped_keys(self):
+
+        """
+        Returns key 1 & key 2 encrypted with the master key (fernet token), it's 
+            kept until keys / master key change, so that the header stays the same
         """
 
-        if (self.__encryption_key_1 == '' or self.__salt_1 == '' or \
-                self.__encryption_key_2 == '' or self.__salt_2 == ''):
+        if (self.__wrapped_keys == b''):
+            self.__wrapped_keys = Fernet(self.__master_key).encrypt(self.__encryption_key_1 + \
+                                                                    self.__encryption_key_2)
 
-            # This exception like won't occur as frontend will make sure that
-            # the key has been initialized first before calling this function, 
-            # but it is kept as a safety measure in case this library 
-            # is used by other programs or for testing
-            raise NoKeyFoundException('Need to initialize key first, ' + \
-                    'call generate_new_key() function')
+        return self.__wrapped_keys
 
-        #-----------------------------------------------#  #-----------------------------------------------# 
-        # File without data                             #  # File with data                                #
-        #-----------------------------------------------#  #-----------------------------------------------#
-        # PWMGR | 00 | hash | salt-1 | salt-2           #  # PWMGR | 01 | hash | salt-1 | salt-2 | data    #
-        #-----------------------------------------------#  #-----------------------------------------------#
 
-        format_name    = 'PWMGR'
-        format_version = ''
+    def __get_key_slots(self):
 
-        file_hash      = ''
+        """
+        Returns: [[type, kdf_id, params, salt, wrapped keys], ..] slot in use is
+                     filled in with the kdf, salt 1 & keys wrapped by the master key
+        """
 
-        if (len(self.__record_list) == 0):
+        slots = [list(slot) for slot in self.__key_slots]
 
-            format_version = '00'
-            file_hash = self.generate_hash(bytes(format_name, 'utf-8') + \
-                                           bytes(format_version, 'utf-8') + \
-                                                 self.__salt_1 + \
-                                                 self.__salt_2)
-        else:
+        slots[self.__key_slot] = [slots[self.__key_slot][0], self.__kdf_id, list(self.__kdf_params), \
+                                  self.__salt_1, self.__get_wrapped_keys()]
 
-            format_version = '01'
+        return slots
 
-            data           =  self.__encrypt_database_in_memory()
 
-            file_hash = self.generate_hash(bytes(format_name, 'utf-8') + \
-                                           bytes(format_version, 'utf-8') + \
-                                                 self.__salt_1 + \
-                                                 self.__salt_2 + \
-                                                 data)
-        try:
+    def __format_segment_trailer(self, header=b'', footer=b'', footer_offset=0):
+
+        """
+        Returns: (bytes) footer offset | footer length | mac (header, footer offset & footer)
 
-            with open(filename, 'wb') as fh:
-                fh.write(bytes(format_name, 'utf-8'))
-                fh.write(bytes(format_version, 'utf-8'))
-                fh.write(bytes(file_hash, 'utf-8'))
-                fh.write(self.__salt_1)
-                fh.write(self.__salt_2)
+        * Footer has the digest of every segment, so the mac covers the entire file
+        """
 
-                if (format_version == '01'):
-                    fh.write(data)
+        location = bytes('%016d%016d' % (footer_offset, len(footer)), 'utf-8')
 
-        except IOError:
-            print("write_encrypted_database(): error#1 occured while writing database")
-            return False
+        mac = hmac.new(self.__get_mac_key(), header + location + footer, sha256).hexdigest()
 
-        return True
+        return location + bytes(mac, 'utf-8')
 
 
-    def load_database(self, filename='data.enc', password='', \
-                            override_integrity_check=False,   \
-                            path_to_keyfile='',               \
-                            load_key_from_keyring=False,      \
-                            enc_key=''):
+    def __segments_can_be_reused(self, filename=''):
 
         """
+        Checks whether the file on disk is still the one that was last loaded / written
+            with the same key 1, so that segments of records that haven't changed can be
+            reused (e.g after the password is changed, only the header is different)
+        """
 
-        Attempts to load database from specified path (filename)
+        if (self.__segment_file != os.path.abspath(filename) or \
+                self.__segment_key != self.__encryption_key_1):
+            return False
 
-        Args: Specify path to the database
+        try:
+            st = os.stat(filename)
 
-        Returns: Boolean value indicating success / failure
+            if ((st.st_size, st.st_mtime_ns) != self.__segment_stat):
+                return False
 
-        Exceptions:
+            with open(filename, 'rb') as fh:
+                fh.seek(-SEGMENT_TRAILER_LENGTH, 2)
+                return fh.read() == self.__segment_trailer
 
-         1) UnsupportedFileFormatException    File format is not supported
+        except (IOError, OSError):
+            return False
 
-         2) IntegrityCheckFailedException     Calculated hash is incorrect
 
-         3) IncorrectPasswordException        Data decryption failed
+    def __get_record_digest(self, record=None):
 
-         4) InvalidParameterException         Input parameters are incorrect
+        """
+        Returns the digest of a record as it was when it was last loaded / written,
+            records are referred to by it in the journal
 
-         5) DataCorruptedException            Decoding of unicode characters failed
+        * Frontend can modify a record in place before calling update_index(),
+          so the digest can't always be calculated from the record
+        """
+
+        digest = self.__record_digests.get(id(record))
+
+        if (digest == None):
+            digest = self.generate_hash(record.serialize())
+
+        return digest
+
+
+    def __journal_record(self, kind='', ref_digest='', record=None):
 
         """
+        Keeps track of a change made to records, so that write_encrypted_database() 
+            can append it to the journal instead of writing the database
 
-        ## Some of the parameter checks are not required as it is handled
-        ## by frontend, but its still placed in here as a safety measure 
-        ## in case this library is used by other programs.
+        Args: 1) 'a' (add), 'u' (update) or 'r' (remove)
+              2) Digest of the record that is updated / removed
+              3) Record that is added / updated
+        """
 
-        if (password == '' and load_key_from_keyring == False):
-            raise InvalidParameterException("load_database(): Password parameter cannot be empty")
-        elif (load_key_from_keyring == True and enc_key == ''):
-            raise InvalidParameterException("load_database(): Encryption key cannot be empty")
-        elif (not os.path.isfile(filename)):
-            raise InvalidParameterException("load_database(): Database file '%s' does not exist" % filename)
+        new_digest = ''
+        payload    = b''
+        record_id  = 0
 
-        fh = open(filename, 'rb')
+        if (record != None):
+            # Same payload as the segment of the record (See encode_record())
+            payload    = record.serialize()
+            new_digest = self.generate_hash(payload)
+            record_id  = record.get_id()
+            self.__record_digests[id(record)] = new_digest
 
-        format_name          = 'PWMGR'
-        format_name_bytes    = ''
+        op = bytes('%s,%s,%s,%d\n' % (kind, ref_digest, new_digest, record_id), 'utf-8') + payload
 
-        format_version       = ''
-        format_version_bytes = ''
+        self.__journal_pending.append(op)
 
-        try:
-            # 'PWMGR'
-            format_name_bytes = fh.read(5)
 
-            # '00' / '01'
-            format_version_bytes = fh.read(2)
+    def __journal_reset_state(self):
 
-        except IOError:
-            fh.close()
-            raise DataCorruptedException("load_database(): IO error occured " + \
-                                         "while reading database (error#1)")
+        """
+        Starts tracking changes from the database that was last loaded / written
+        """
 
-        if (format_name_bytes == '' or format_version_bytes == ''):
-            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#2)")
+        self.__journal_ok      = True
+        self.__journal_pending = []
+        self.__journal_count   = 0
+        self.__journal_stat    = None
+        self.__journal_end     = 0
+        self.__journal_last    = self.__get_snapshot_id()
 
-        output1 = decode_unicode_str_safely(format_name_bytes)
-        output2 = decode_unicode_str_safely(format_version_bytes)
 
-        if (not (output1[0] and output1[1] == format_name)):
-            fh.close()
-            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#3)")
+    def __get_snapshot_id(self):
 
+        """
+        Returns an identifier of the database (segmented file) that was last loaded / written,
+            the journal is bound to it so that it's ignored if the database was replaced
+        """
 
-        if (output2[0] and output2[1] in ['00','01'] ):
+        return self.generate_hash(self.__segment_trailer)
 
-            format_version = output2[1]
 
-        else:
+    def __journal_can_be_appended(self, filename=''):
 
-            fh.close()
-            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#4)")
+        """
+        Checks whether changes made since the database was last loaded / written are all
+            in the journal & journal on disk is the one that was last loaded / written
+        """
 
-        loaded_hash = ''
+        if (not self.__journal_ok or \
+                self.__journal_count + len(self.__journal_pending) > JOURNAL_MAX_OPS):
+            return False
+
+        path = journal_path(filename)
 
         try:
-            loaded_hash   = fh.read(self.__hash_length)
-            self.__salt_1 = fh.read(self.__salt_length)
-            self.__salt_2 = fh.read(self.__salt_length)
-        except IOError:
-            fh.close()
-            raise DataCorruptedException("load_database(): IO error occured " + \
-                                         "while reading database (error#5)")
 
-        if (loaded_hash == '' or self.__salt_1 == '' or self.__salt_2 == ''):
-            fh.close()
-            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#6)")
+            if (self.__journal_stat == None):
 
+                if (not os.path.isfile(path)):
+                    return True
 
-        #-----------------------------------------------#  #-----------------------------------------------# 
-        # File with data                                #  # File without data                             #
-        #-----------------------------------------------#  #-----------------------------------------------#
-        # PWMGR | 01 | hash | salt-1 | salt-2 | data    #  # PWMGR | 00 | hash | salt-1 | salt-2           #
-        #-----------------------------------------------#  #-----------------------------------------------#
+                # A journal that belongs to a database that was replaced can be overwritten
+                with open(path, 'rb') as fh:
+                    return fh.readline().strip() != b'PWMGRJ01' + \
+                                bytes(self.__get_snapshot_id(), 'utf-8')
 
-        data = ''
+            st = os.stat(path)
 
-        if (format_version == '01'):
+            return (st.st_size, st.st_mtime_ns) == self.__journal_stat
 
-            try:
-                data = fh.read()
-                fh.close()
-            except IOError:
-                fh.close()
-                raise DataCorruptedException("load_database(): IO error occured " + \
-                                             "while reading database (error#7)")
+        except (IOError, OSError):
+            return False
 
-            if (data == ''):
-                raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#8)")
 
-        if (not override_integrity_check):
+    def __write_journal(self, filename=''):
 
-            generated_hash = ''
+        """
+        Appends changes that were made since the database was last written to the journal
 
-            if (format_version == '01'):
-                generated_hash = self.generate_hash(format_name_bytes + format_version_bytes + \
-                                                    self.__salt_1 + self.__salt_2 + data)
-            else:
-                generated_hash = self.generate_hash(format_name_bytes + format_version_bytes + \
-                                                    self.__salt_1 + self.__salt_2)
+        Journal:  PWMGRJ01 snapshot id \n op \n op \n ...
 
-            if (loaded_hash != bytes(generated_hash, 'utf-8')):
-                raise IntegrityCheckFailedException('load_database(): Hash mismatch detected (error#9)')
+                  op:  fernet token (key 1) of 'prev,kind,ref digest,new digest,id\n' followed
+                       by the payload of the record (See encode_record(), empty if removed),
+                       prev is the digest of the previous op (or snapshot id), 
+                       so that ops can't be reordered / removed
+        """
 
-        if (load_key_from_keyring):
-            self.__encryption_key_1 = enc_key
-            self.__generate_new_key_2()
-        else:
-            self.generate_new_key(password=password, generate_salt=False, \
-                                     update_enc_key=True, path_to_keyfile=path_to_keyfile)
+        if (len(self.__journal_pending) == 0):
+            return True
 
-        if (format_version == '01'):
+        fernet_handler = self.__get_fernet_handler(1)
 
-            fernet_handler = Fernet(self.__encryption_key_1)
+        data_l = []
 
-            try:
-                decrypted = fernet_handler.decrypt(data)
-            except InvalidToken:
-                raise IncorrectPasswordException("load_database(): Password is incorrect (error#10)")
+        prev = self.__journal_last
 
-            output = decode_unicode_str_safely(decrypted)
+        for op in self.__journal_pending:
 
-            if (output[0]):
-                decrypted = output[1]
+            token = fernet_handler.encrypt(bytes('%s,' % prev, 'utf-8') + op)
+            prev  = self.generate_hash(token)
+
+            data_l.append(token + b'\n')
+
+        path = journal_path(filename)
+
+        try:
+
+            if (self.__journal_stat == None):
+
+                with open(path, 'wb') as fh:
+                    fh.write(b'PWMGRJ01' + bytes(self.__get_snapshot_id(), 'utf-8') + b'\n')
+                    fh.write(b''.join(data_l))
+                    fh.flush()
+                    os.fsync(fh.fileno())
             else:
-                raise DataCorruptedException("load_database(): IO error occured " + \
-                                                 "while reading database (error#11)")
 
-            if (not load_key_from_keyring):
-                self.__master_password = password
+                with open(path, 'r+b') as fh:
+                    fh.seek(self.__journal_end)
+                    fh.write(b''.join(data_l))
+                    fh.truncate()
+                    fh.flush()
+                    os.fsync(fh.fileno())
 
-            self.convert_csvlist_to_record(self.read_csv_in_memory(decrypted), True)
+            st = os.stat(path)
+
+        except (IOError, OSError):
+            print("write_encrypted_database(): error#2 occured while writing journal")
+            self.__journal_ok = False
+            return False
+
+        self.__journal_count  += len(self.__journal_pending)
+        self.__journal_pending = []
+        self.__journal_stat    = (st.st_size, st.st_mtime_ns)
+        self.__journal_end     = st.st_size
+        self.__journal_last    = prev
 
         return True
 
 
     '''
     ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
-    ┃   Database Password Auditing                                       ┃
+    ┃   Database Read / Write                                            ┃
     ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
     '''
 
-    def audit_security(self):
+    def write_encrypted_database(self, filename='data.enc'):
 
-        ## Combining pw_reuse & pw_complexity otherwise we'd run into memory enc errors
-        ##      due to the way this enc library functions
+        """
+        Responsible for encryption of database
 
-        self.audit_pw_age_all()
-        self.audit_pw_reuse_and_cmp_all()
-        self.rate_overall_security()
+        Args:       The name of the regular encryted file. (Default: 'data.enc')
 
+        Returns:    Boolean value indicating whether the operation succeeded or not.
 
-    # [x] Tested
-    def sort_security_rating(self):
+        Exceptions:
 
-        """
-        Sorts records by security ratings in ascending or descending order based 
-        on the paramter that has been set. Need to call audit_security() first before 
-        calling this function.
+         1) NoKeyFoundException if a new key hasn't been generated
+         2) IOError If an error occured while reading/writing file
+         3) PartiallyLoadedException if records were loaded from the summary & haven't been fetched
 
-         Ratings: 
+        Notes:
 
-            (15) Superb
-            (14) Excellent
-         (12-13) Good
-         (10-11) Average
-           (7-9) Weak
-           (0-6) Critical
+              06/19/2024:
 
-        Returns:  List of record indexes sorted in (ascending/descending order) 
-                  based on overall security rating
+                  * Original file format had 'PWMGR' flag, which was used to identify the file format, 
+                         but down the line it got hacked & removed, that has now been fixed.
 
-        """
+              Format '02':
 
-        if (len(self.__record_list) == 0):
-            return []
+                  * Every record is encrypted as a separate segment (AES-GCM over its binary 
+                    payload, see encrypt_segment()), so if the file on disk is the one that was 
+                    last loaded / written, only records that changed are encrypted & segments 
+                    of the rest are copied from it.
 
-        sorted_indexes = []
+                  * Records are encrypted with random keys, which are wrapped by the master key 
+                    of one or more key slots, each with its own kdf & salt (See add_key_slot()). 
+                    Changing the password / keyfile / kdf or adding / removing a slot only 
+                    changes the header, segments are copied as they are.
 
-        ## TODO: index,rating list needs to be sorted using optimized sorting method
+                  * A summary section (site, username, email, group & last modified of every 
+                    record) follows the segments, so that records can be searched & listed by 
+                    decrypting only the summary (See load_database(summary_only=True)), 
+                    segments are decrypted as records are used (See fetch_record()).
 
-        # Removing unavailable ratings
-        for i in range(0, len(self.__record_list)):
-            if (self.__record_list[i].get_security_rating() != ''):
-                sorted_indexes.append(i)
+                  * Changes are usually appended to the journal (See __write_journal()), 
+                    the database is only written when the journal is folded into it.
 
+                  * Database is never modified in place (See __replace_database())
 
-        while (True):
+                  * '00' / '01' can still be loaded, they're converted on the next write & 
+                    records are encrypted again once with new keys (See __generate_data_keys()).
+        """
 
-            index_moved = False
+        if (self.__master_key == '' or self.__salt_1 == '' or \
+                self.__encryption_key_1 == '' or self.__encryption_key_2 == ''):
 
-            for i in range(0, len(sorted_indexes)-1):
+            # This exception like won't occur as frontend will make sure that
+            # the key has been initialized first before calling this function, 
+            # but it is kept as a safety measure in case this library 
+            # is used by other programs or for testing
+            raise NoKeyFoundException('Need to initialize key first, ' + \
+                    'call generate_new_key() function')
 
-                try:
-                    rt1 = int(self.__record_list[sorted_indexes[i]].get_security_rating())
-                    rt2 = int(self.__record_list[sorted_indexes[i+1]].get_security_rating())
-                except ValueError:
-                    continue
+        # Passwords of records that weren't fetched aren't known
+        if (len(self.__summary_segments) > 0):
+            raise PartiallyLoadedException('write_encrypted_database(): %d records ' % \
+                    len(self.__summary_segments) + 'need to be fetched first')
 
-                if (rt1 > rt2):
-                    tmp_index = sorted_indexes[i+1]
-                    sorted_indexes[i+1] = sorted_indexes[i]
-                    sorted_indexes[i] = tmp_index
-                    index_moved = True
+        #-------------------------------------------------------------------------------------#
+        # PWMGR | 02 | slot count | key slots | key check | segments | summary | footer | ...  #
+        #-------------------------------------------------------------------------------------#
+        # slot count: number of key slots (2)
+        # key slot:  type (1) | kdf | salt (32) | keys
+        # kdf:       kdf-id (2) | param-1 (10) | param-2 (10) | param-3 (10)
+        # keys:      length (4) | key 1 & key 2 encrypted with master key of the slot (fernet token)
+        # key check: hmac of a constant (64), detects a header that doesn't belong to the keys
+        # segment:   nonce (12) | payload of a record (See encode_record()) encrypted with 
+        #            AES-GCM (key derived from key 1, id of the record as associated data) | tag (16)
+        # summary:   fields needed to search records (See encode_summary()) encrypted like 
+        #            a segment of id 0
+        # footer:    's,offset,length,sha256 digest\n' of the summary, followed by 
+        #            'offset,length,sha256 digest,id\n' of each segment in the order of records
+        # trailer:   footer offset (16) | footer length (16) | hmac (64)
 
-            if (not index_moved):
-                break
+        # Keys that were derived from the password are replaced with random ones
+        if (self.__legacy_keys):
+            self.__generate_data_keys()
 
-        return sorted_indexes
+        header = self.__format_segment_header()
 
+        reuse = self.__segments_can_be_reused(filename)
 
-    # [x] Tested, Initial testing done. More testing needed
-    def rate_overall_security(self):
+        # Header changes along with the password / kdf, the journal belongs to the previous one
+        same_header = (reuse and header == self.__segment_header)
 
-        """
-                   Rates overall security posture of all records in database
+        if (same_header and self.__journal_can_be_appended(filename)):
+            return self.__write_journal(filename)
 
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-                                             Ratings
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        cipher    = self.__get_segment_cipher()
 
-         pw_complexity (6)  's' =  6, 'e' =  5, 'g' =  2, 'a' =  0, 'w' = -3, 'u' = -6
-         pw_age        (3)  'n' =  3, 'o' =  1, 'r' = -3, 't' = -5, 'h' = -6
-         pw_reuse      (6)  '0' =  6, '1' =  0
+        pool      = {}
+        new_pool  = {}
+        index     = []
+        data      = bytearray(header)
+        digests   = {}
 
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-         Total score (15)   max = 15, min = 0 (negative values are set to 0)
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        if (reuse):
+            pool = self.__segment_pool
 
-            (15) Superb
-            (14) Excellent
-         (12-13) Good
-         (10-11) Average
-           (7-9) Weak
-           (0-6) Critical
+        try:
 
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+            fh = None
 
-        """
+            if (reuse):
+                fh = open(filename, 'rb')
 
-        if (len(self.__record_list) == 0):
-            return []
+            for item in self.__record_list:
 
-        for i in range(len(self.__record_list)):
+                # Kept by the record until it is modified (See Record.serialize())
+                line = item.serialize()
 
-            r = self.__record_list[i]
+                line_digest = self.generate_hash(line)
 
-            rating_age = 0
-            rating_reuse = 0
-            rating_complexity = 0
-            rating_total = 0
+                digests[id(item)] = line_digest
 
-            pw_age = r.get_pw_age()
+                # Segment is bound to the id of the record, so it's only reused by the same record
+                pool_key = (line_digest, item.get_id())
 
-            # pw_age (3)  'n' =  3, 'o' =  1, 'r' = -3, 't' = -5, 'h' = -6
-            if (pw_age == 'n'):
-                rating_age = 3
-            elif (pw_age == 'o'):
-                rating_age = 1
-            elif (pw_age == 'r'):
-                rating_age = -3
-            elif (pw_age == 't'):
-                rating_age = -5
-            elif (pw_age == 'h'):
-                rating_age = -6
-            else: # Skipping rating if there's errors with last_modified attribute
-                continue
+                offset = len(data)
 
-            pw_reuse = r.get_pw_reuse()
+                if (pool.get(pool_key)):
+                    old_segment = pool[pool_key].pop()
+                    fh.seek(old_segment[0])
+                    token = fh.read(old_segment[1])
+                    segment = (offset, old_segment[1], old_segment[2])
+                else:
+                    token   = encrypt_segment(cipher, line, item.get_id())
+                    segment = (offset, len(token), self.generate_hash(token))
 
-            # pw_reuse (6)  '0' =  6, '1' = 0
-            if (pw_reuse == '0'):
-                rating_reuse = 6
-            elif (pw_age == '1'):
-                rating_reuse = 0
+                data += token
 
-            # pw_complexity (6)  's' =  6, 'e' =  5, 'g' =  2, 'a' =  0, 'w' = -3, 'u' = -6
-            pw_complexity = r.get_pw_complexity()
+                index.append(segment + (item.get_id(),))
 
-            if (pw_complexity == 's'):
-                rating_complexity = 6
-            elif (pw_complexity == 'e'):
-                rating_complexity = 5
-            elif (pw_complexity == 'g'):
-                rating_complexity = 2
-            elif (pw_complexity == 'a'):
-                rating_complexity = 0
-            elif (pw_complexity == 'w'):
-                rating_complexity = -3
-            elif (pw_complexity == 'u'):
-                rating_complexity = -6
+                if (pool_key in new_pool):
+                    new_pool[pool_key].append(segment)
+                else:
+                    new_pool[pool_key] = [segment]
 
-            rating_total = rating_age + rating_reuse + rating_complexity
+            summary = encode_summary([[str(item.get_id()), digests[id(item)], item.get_website(), \
+                                       item.get_username(), item.get_email(), item.get_group(), \
+                                       item.get_last_modified()] \
+                                          for item in self.__record_list])
 
-            if (rating_total < 0):
-                rating_total = 0
+            summary_digest = self.generate_hash(summary)
 
-            rating_str = '%d' % (rating_total)
+            offset = len(data)
 
-            self.__record_list[i].set_security_rating(rating_str)
+            if (reuse and self.__segment_summary != None and \
+                    self.__segment_summary[0] == summary_digest):
+                fh.seek(self.__segment_summary[1])
+                token = fh.read(self.__segment_summary[2])
+                summary_segment = (offset, self.__segment_summary[2], self.__segment_summary[3])
+            else:
+                token = encrypt_segment(cipher, summary, 0)
+                summary_segment = (offset, len(token), self.generate_hash(token))
 
+            data += token
 
-    # [x] Tested
-    def audit_pw_age_all(self):
+            if (fh != None):
+                fh.close()
 
-        """
-        Audits records to check if they exceed the desired password age,
-            & stores audit information within each record
+        except (IOError, OSError):
+            print("write_encrypted_database(): error#1 occured while reading database")
+            return False
 
-        Returns: 7 lists
+        footer  = bytes('s,%d,%d,%s\n' % summary_segment + \
+                        ''.join(['%d,%d,%s,%d\n' % seg for seg in index]), 'utf-8')
 
-                 Not audited / Error / No Password age information ('e')
-                 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        # Nothing has changed
+        if (same_header and footer == self.__segment_footer):
 
-                 1) List of record indexes whose last modified value
-                    is blank / not updated.
-                    (This could be because after importing from another 
-                    password manager datebase)
+            self.__segment_pool    = new_pool
+            self.__segment_summary = (summary_digest,) + summary_segment
+            self.__record_digests  = digests
 
-                 2) List of record indexes whose last modified value
-                    is probably incorrect as it points to somewhere 
-                    in the future
+            try:
+                if (os.path.isfile(journal_path(filename))):
+                    os.remove(journal_path(filename))
+            except OSError:
+                pass
 
+            self.__journal_reset_state()
 
-                 Audited attributes ('n', 'o', 'r', 't', 'h')
-                 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+            return True
 
-                 3) Password age is < 6 months & don't need to be changed ('n')
+        trailer = self.__format_segment_trailer(header, footer, len(data))
 
-                 4) Password age is >= 6 months to < 1 year old ('o')
+        data += footer
+        data += trailer
 
-                 5) Password age is >= 1 year and < 1.5 years.
-                    The user would be recommended to change it ('r')
+        try:
+            self.__replace_database(filename, data)
+            st = os.stat(filename)
+        except (IOError, OSError):
+            print("write_encrypted_database(): error#2 occured while writing database")
+            self.__segment_file = ''
+            return False
 
-                 6) Password age is 1.5-2 years, change is urgently required ('t')
+        self.__segment_file    = os.path.abspath(filename)
+        self.__segment_header  = header
+        self.__segment_key     = self.__encryption_key_1
+        self.__segment_trailer = trailer
+        self.__segment_footer  = footer
+        self.__segment_stat    = (st.st_size, st.st_mtime_ns)
+        self.__segment_pool    = new_pool
+        self.__segment_summary = (summary_digest,) + summary_segment
+
+        self.__record_digests  = digests
+
+        self.__journal_reset_state()
+
+        return True
+
+
+    def __replace_database(self, filename='', data=b''):
 
-                 7) Password age is > 2 years, password change is critical
-                    for overall security ('h')
         """
+        Replaces the database atomically (temp file, fsync, rename, fsync of directory),
+            so that a crash leaves either the previous or the new database
 
-        lm_not_updated         =     []
-        lm_err                 =     []
-        pw_reset_not_needed    =     []
-        pw_reset_optional      =     []
-        pw_reset_recommended   =     []
-        pw_reset_urgent        =     []
-        pw_reset_critical      =     []
+        The previous database is kept as the first generation of backups
+            'filename.1' ... 'filename.N' (See set_backup_generations()), older
+            generations are shifted by renaming them. Generations are hard links 
+            to the databases that were replaced, so they don't need to be copied.
 
-        for i in range(len(self.__record_list)):
+        * Journal of the previous database is moved along with it (compaction), so 
+          that a generation can be restored with the changes that were in its journal
 
-            lm = self.__record_list[i].get_last_modified()
+        Exceptions: IOError / OSError if an error occured while writing database
+        """
 
-            if (lm == ''):
-                lm_not_updated.append(i)
-                continue
+        tmp_path = '%s.tmp' % filename
+
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        n = self.__backup_generations
+
+        if (n > 0 and os.path.isfile(filename)):
+
+            for path in [generation_path(filename, n), journal_path(generation_path(filename, n))]:
+                if (os.path.isfile(path)):
+                    os.remove(path)
+
+            for i in range(n - 1, 0, -1):
+
+                for path, new_path in [(generation_path(filename, i), generation_path(filename, i + 1)), \
+                                       (journal_path(generation_path(filename, i)),                     \
+                                        journal_path(generation_path(filename, i + 1)))]:
+                    if (os.path.isfile(path)):
+                        os.rename(path, new_path)
+
+            os.link(filename, generation_path(filename, 1))
+
+        os.replace(tmp_path, filename)
+
+        # Journal is moved after the database is replaced, as it's ignored once
+        # the database it belongs to is replaced
+        if (os.path.isfile(journal_path(filename))):
+
+            if (n > 0 and os.path.isfile(generation_path(filename, 1))):
+                os.replace(journal_path(filename), journal_path(generation_path(filename, 1)))
             else:
-                result = self.audit_pw_age_single_record(i)
+                os.remove(journal_path(filename))
 
-                if (result == 'e'):
-                    lm_err.append(i)
-                elif (result == 'n'):
-                    pw_reset_not_needed.append(i)
-                elif (result == 'o'):
-                    pw_reset_optional.append(i)
-                elif (result == 'r'):
-                    pw_reset_recommended.append(i)
-                elif (result == 't'):
-                    pw_reset_urgent.append(i)
-                elif (result == 'h'):
-                    pw_reset_critical.append(i)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
 
-        return lm_not_updated, lm_err, pw_reset_not_needed, \
-                     pw_reset_optional, pw_reset_recommended, \
-                     pw_reset_urgent, pw_reset_critical
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
 
-    def audit_pw_age_single_record(self, chosen_index=-1):
+    def __load_keys(self, password='', path_to_keyfile='', load_key_from_keyring=False, \
+                          enc_key='', enc_key_2='', enc_key_2_salt_id='', key_slots=[]):
 
         """
-        Audits records to check if they exceed the desired password age,
-            & stores audit information within each record
+        Sets the master key for loading database, either derived from password or 
+            the one that was stored in keyring (See load_database()), key 1 & key 2 
+            are unwrapped with it from one of the key slots (format '02'), 
+            otherwise they're legacy keys
 
-        * If there's any errors, for example last modified is missing,
-            (which probably won't happen) pw_age attribute is set to 'e'
+        * Keyfile is only used for keyfile slots, password & recovery slots are tried 
+          with it last (e.g slot of a legacy database that was converted after the 
+          master key was loaded from keyring), type of the slot is then corrected
 
-        Returns: A char in the range as show in the chart below
+        * Salts & kdf need to be read from the file first
 
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-           pw_age (3) 'n' =  3, 'o' =  1, 'r' = -2, 't' = -4, 's' = -6, 'e' = n/a
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-                                   n =          #days < 0.5 yr
-                                   o = 0.5 yr < #days < 1 yr
-                                   r =   1 yr < #days < 1.5 yr
-                                   t = 1.5 yr < #days < 2 yr
-                                   h =   2 yr < #days
-        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        Returns: Type of the slot that unlocked the database, it's only set once the 
+                 header has been verified, since the header has the type it was read with
+
+        Exceptions: IncorrectPasswordException if keys can't be unwrapped
         """
 
-        if (chosen_index == -1):
-            raise InvalidParameterException('audit_pw_age_single_record(): Index parameter cannot be empty')
+        slot_type = KEY_SLOT_PASSWORD
 
-        day_today = datetime.today()
+        if (path_to_keyfile != ''):
+            slot_type = KEY_SLOT_KEYFILE
 
-        days_this_year = 365
-        half_year = 180
+        if (len(key_slots) == 0):
 
-        if (self.is_year_leap_year(day_today.year)):
-            days_this_year = 366
+            if (load_key_from_keyring):
+                self.__master_key = enc_key
+            else:
+                self.__master_key = self.__derive_master_key(self.__kdf_id, self.__kdf_params, \
+                                                             self.__salt_1, password, path_to_keyfile)
+
+            # Key 1 was the master key & key 2 was derived from it
+            self.__encryption_key_1 = self.__master_key
+            self.__wrapped_keys     = b''
+            self.__legacy_keys      = True
+            self.__key_slots        = [[slot_type]]
+            self.__key_slot         = 0
+
+            if (load_key_from_keyring and enc_key_2 != '' and enc_key_2_salt_id == self.get_salt_id()):
+                self.__encryption_key_2 = enc_key_2
+                self.__reset_fernet_handlers()
+            else:
+                self.__generate_new_key_2()
 
-        # 1 < 1yr+ < 1.5
-        days_1_yr_plus = days_this_year + 180
+            return slot_type
 
-        days_2_yr = (days_this_year * 2)
+        # (index of slot, keyfile the master key is derived with)
+        attempts = []
 
-        lm = self.__record_list[chosen_index].get_last_modified()
+        if (load_key_from_keyring or path_to_keyfile == ''):
+            attempts = [(i, '') for i in range(len(key_slots)) \
+                            if (load_key_from_keyring or key_slots[i][0] != KEY_SLOT_KEYFILE)]
+        else:
+            attempts = [(i, path_to_keyfile) for i in range(len(key_slots)) \
+                            if key_slots[i][0] == KEY_SLOT_KEYFILE] + \
+                       [(i, '') for i in range(len(key_slots)) \
+                            if key_slots[i][0] != KEY_SLOT_KEYFILE] + \
+                       [(i, path_to_keyfile) for i in range(len(key_slots)) \
+                            if key_slots[i][0] != KEY_SLOT_KEYFILE]
 
-        if (lm == ''):
-            self.__record_list[i].set_pw_age('e')
-            return
+        for i, keyfile in attempts:
 
-        date = lm.split(' ')[0]
-        time = lm.split(' ')[1]
+            kdf_id, params, salt, wrapped_keys = key_slots[i][1:]
 
-        day = int(date.split('-')[0])
-        month = int(date.split('-')[1])
-        yr = int(date.split('-')[2])
+            if (load_key_from_keyring):
+                master_key = enc_key
+            else:
+                master_key = self.__derive_master_key(kdf_id, params, salt, password, keyfile)
 
-        hr = int(time.split(':')[0])
-        minute = int(time.split(':')[1])
+            try:
+                keys = Fernet(master_key).decrypt(wrapped_keys)
+            except (InvalidToken, ValueError):
+                continue
 
-        days_of_past = datetime(yr, month, day, hr, minute)
+            slot_type = key_slots[i][0]
 
-        '''
-            n =          #days < 0.5 yr
-            o = 0.5 yr < #days < 1 yr
-            r =   1 yr < #days < 1.5 yr
-            t = 1.5 yr < #days < 2 yr
-            h =   2 yr < #days
-        '''
+            if (keyfile != ''):
+                slot_type = KEY_SLOT_KEYFILE
 
-        if (days_of_past > day_today):
+            self.__kdf_id           = kdf_id
+            self.__kdf_params       = list(params)
+            self.__salt_1           = salt
+            self.__master_key       = master_key
+            self.__encryption_key_1 = keys[:44]
+            self.__encryption_key_2 = keys[44:]
+            self.__wrapped_keys     = wrapped_keys
+            self.__legacy_keys      = False
+            self.__key_slots        = key_slots
+            self.__key_slot         = i
 
-            ## 'e' metric is used for errors, usually we won't get this
-            self.__record_list[chosen_index].set_pw_age('e')
-            return 'e'
+            self.__reset_fernet_handlers()
 
-        num_days = (day_today-days_of_past).days
+            return slot_type
 
-        if (num_days < half_year):
-            self.__record_list[chosen_index].set_pw_age('n')
-            return 'n'
-        elif (num_days < days_this_year):
-            self.__record_list[chosen_index].set_pw_age('o')
-            return 'o'
-        elif (num_days < days_1_yr_plus):
-            self.__record_list[chosen_index].set_pw_age('r')
-            return 'r'
-        elif (num_days < days_2_yr):
-            self.__record_list[chosen_index].set_pw_age('t')
-            return 't'
-        else:
-            self.__record_list[chosen_index].set_pw_age('h')
-            return 'h'
+        raise IncorrectPasswordException("load_database(): Password is incorrect (error#22)")
 
 
-    def is_year_leap_year(self, y=0):
+    def __iter_segmented_database(self, fh, filename='', override_integrity_check=False, \
+                                        summary_only=False):
 
-        if (y <= 0):
-            return False
+        """
+        Loads records from format '02' (See write_encrypted_database()) & yields 
+            them one at a time as segments are verified & decrypted, kdf & salts
+            need to be loaded first & keys need to be set
 
-        if (y % 4 != 0):
-            return False
+        * Key check & mac are verified before the first record is yielded, 
+          every segment is verified against its digest in the footer before 
+          it is decrypted, so records can be used as they're yielded
 
-        else:
+        * Changes in the journal are read first, records that were removed / 
+          updated are left out & the ones that were added / updated are merged 
+          in, so records are yielded in the order they'll be in once loaded
 
-            if (y % 100 != 0):
-                return True
-            elif (y % 400 == 0):
-                return True
-            else:
-                return False
+        * With summary_only, records are built from the summary section 
+          instead of their segments (See fetch_record()). If the summary is 
+          corrupted & integrity check is overridden, segments are decrypted.
 
+        Args: File handler positioned before the key check, summary_only
 
-    # [x] Tested
-    def audit_pw_reuse_and_cmp_all(self):
+        Exceptions:
 
-        """
-        Audits records to see if any of them reuse the same password & the pw complexity
+         1) UnsupportedFileFormatException    File format is not recognized
 
-        Returns: None
+         2) IncorrectPasswordException        Key check doesn't match
+
+         3) IntegrityCheckFailedException     Mac or digest of a segment doesn't match,
+                                              if integrity check is overridden, segments 
+                                              that are corrupted are left out
+
+         4) DataCorruptedException            IO error / decoding of unicode characters failed
         """
 
-        rec_len = len(self.__record_list)
+        header = self.__format_segment_header()
 
-        ## PW Reuse Calculations
-        if (rec_len == 0):
-            return
+        try:
+            key_check = fh.read(self.__hash_length)
+            fh.seek(-SEGMENT_TRAILER_LENGTH, 2)
+            trailer   = fh.read(SEGMENT_TRAILER_LENGTH)
+        except (IOError, OSError):
+            fh.close()
+            raise DataCorruptedException("load_database(): IO error occured " + \
+                                         "while reading database (error#12)")
 
-        reuse_pw_indexes_l = []
+        # Rest of the header was read from the file
+        if (header[-self.__hash_length:] != key_check):
+            fh.close()
+            raise IncorrectPasswordException("load_database(): Password is incorrect (error#13)")
 
-        pw_list = []
+        try:
+            footer_offset = int(trailer[:16])
+            footer_length = int(trailer[16:32])
+            fh.seek(footer_offset)
+            footer = fh.read(footer_length)
+        except (IOError, OSError, ValueError):
+            fh.close()
+            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#14)")
 
-        for i in range(rec_len):
-            pw_list.append(self.get_pw_of_index(i))
+        mac_verified = (trailer == self.__format_segment_trailer(header, footer, footer_offset))
 
-        for i in range(0, rec_len):
+        if (not mac_verified and not override_integrity_check):
+            fh.close()
+            raise IntegrityCheckFailedException('load_database(): Mac mismatch detected (error#15)')
 
-            if (i in reuse_pw_indexes_l):
-                continue
+        output = decode_unicode_str_safely(footer)
 
-            pw1 = pw_list[i]
+        if (not output[0]):
+            fh.close()
+            raise DataCorruptedException("load_database(): IO error occured " + \
+                                         "while reading database (error#16)")
 
-            match = False
+        st = os.stat(filename)
 
-            for j in range(0, rec_len):
+        self.__segment_file    = os.path.abspath(filename)
+        self.__segment_header  = header
+        self.__segment_key     = self.__encryption_key_1
+        self.__segment_trailer = trailer
+        self.__segment_stat    = (st.st_size, st.st_mtime_ns)
+        self.__segment_pool    = {}
+        self.__segment_footer  = footer
 
-                if (j==i or j in reuse_pw_indexes_l):
-                    continue
+        self.__record_digests  = {}
 
-                pw2 = pw_list[j]
+        try:
+            removed, added = self.__read_journal(filename, override_integrity_check)
+        except:
+            fh.close()
+            raise
 
-                if (pw1 == pw2):
-                    match = True
-                    reuse_pw_indexes_l.append(j)
+        # Stable sort, same as sort() after records are appended
+        added.sort(key=lambda x : x[1].get_website())
 
-            if (match):
-                reuse_pw_indexes_l.append(i)
+        pool     = self.__segment_pool
+        repaired = not mac_verified
 
-        reuse_pw_indexes_l = list(set(reuse_pw_indexes_l))
+        entries  = output[1].splitlines()
 
-        for i in range(0, rec_len):
+        self.__segment_summary  = None
+        self.__summary_segments = {}
 
-            if (i not in reuse_pw_indexes_l):
-                self.__record_list[i].set_pw_reuse('0')
-            else:
-                self.__record_list[i].set_pw_reuse('1')
+        summary = None
 
-        ## PW Complexity calculations
-        for i in range(0, rec_len):
-            self.__record_list[i].set_pw_complexity(self.audit_pw_complexity(pw_list[i]))
+        # Summary section is the first entry of the footer
+        try:
+            summary = self.__read_summary(fh, entries.pop(0) if (len(entries) > 0) else '')
+        except IntegrityCheckFailedException:
+            if (not override_integrity_check):
+                fh.close()
+                raise
+            repaired = True
 
+        if (summary_only and summary != None):
+            loaded = self.__iter_summary_records(fh, entries, summary, override_integrity_check)
+        else:
+            loaded = self.__iter_segment_records(fh, entries, override_integrity_check)
 
-    # [x] Tested
-    def audit_pw_complexity(self, pw=''):
+        for item in loaded:
 
-        """
-                             * Rates password complexity of the input password
+            # Segment is corrupted & integrity check is overridden
+            if (item == None):
+                repaired = True
+                continue
 
+            record, line_digest, segment = item
 
-                                             Rating Metrics:
+            pool_key = (line_digest, record.get_id())
 
-                             4 character classes (upper, lower, symbols, digits)
+            if (pool_key in pool):
+                pool[pool_key].append(segment)
+            else:
+                pool[pool_key] = [segment]
 
-              u,w,a,g,e,s where u=unsuitable, w=weak, a=avg, g=good, e=excellent, s=superb
+            # Segment was written from serialize() of the record, so there's no need 
+            # to encode it again (fields like last_modified are only validated on use)
+            record_digest = line_digest
 
+            if (removed.get(record_digest)):
+                removed[record_digest] -= 1
+                self.__summary_segments.pop(record.get_id(), None)
+                continue
 
-                Unsuitable        Typically length is less than 8 characters
+            # Records from journal that come before it
+            while (len(added) > 0 and added[0][1].get_website() < record.get_website()):
+                yield self.__append_loaded_record(*added.pop(0))
 
+            yield self.__append_loaded_record(record_digest, record)
 
-                Weak              This is the recommendation from the 90's which
-                                  consists of minimum of 8 characters and mix of
-                                  character classes
+        fh.close()
 
+        for record_digest, record in added:
+            yield self.__append_loaded_record(record_digest, record)
 
-                Average           This is what is recommended by most password managers
+        # Journal refers to records that are not in the database
+        if (sum(removed.values()) > 0):
+            if (override_integrity_check):
+                repaired = True
+            else:
+                raise IntegrityCheckFailedException('load_database(): Journal is corrupted (error#21)')
 
+        self.sort()
 
-                Good              PW length in the range of 12-14, with a mix of 3 or more classes
+        # So that the next write repairs the file, even if records haven't changed
+        if (repaired):
+            self.__segment_footer = b''
+            self.__journal_ok     = False
 
 
-                Excellent         This ensures that there's a high probability
-                                  that your password will not be part of a wordlist
-                                  found in the wild
+    def __iter_segment_records(self, fh, entries=[], override_integrity_check=False):
 
+        """
+        Reads, verifies & decrypts the segments of entries in the footer 
+            (See __iter_segmented_database())
 
-                Superb            This makes bruteforce style attacks unfeasible
-                                  using modern gpu clusters. This is as close to having
-                                  full cracking immunity as you can get
+        Yields: (Record, digest of payload, (offset, length, digest)), 
+                    None if the segment is corrupted & integrity check is overridden
+
+        Exceptions: IntegrityCheckFailedException if a segment is corrupted
         """
 
-        ##                         pw_len, n chr classes, rating
+        cipher = self.__get_segment_cipher()
 
-        pw_complexity_rating_l =   {( 8, 1) : 'u', ( 8, 2) : 'u', ( 8, 3) : 'u', ( 8, 4) : 'w', \
-                                    ( 9, 1) : 'u', ( 9, 2) : 'u', ( 9, 3) : 'u', ( 9, 4) : 'w', \
-                                    (10, 1) : 'u', (10, 2) : 'u', (10, 3) : 'u', (10, 4) : 'w', \
-                                    (11, 1) : 'u', (11, 2) : 'w', (11, 3) : 'w', (11, 4) : 'a', \
-                                    (12, 1) : 'w', (12, 2) : 'w', (12, 3) : 'a', (12, 4) : 'g', \
-                                    (13, 1) : 'w', (13, 2) : 'a', (13, 3) : 'a', (13, 4) : 'g', \
-                                    (14, 1) : 'w', (14, 2) : 'a', (14, 3) : 'g', (14, 4) : 'g', \
-                                    (15, 1) : 'a', (15, 2) : 'g', (15, 3) : 'g', (15, 4) : 'e', \
-                                    (16, 1) : 'a', (16, 2) : 'g', (16, 3) : 'g', (16, 4) : 'e', \
-                                    (17, 1) : 'g', (17, 2) : 'g', (17, 3) : 'g', (17, 4) : 'e', \
-                                    (18, 1) : 'g', (18, 2) : 'g', (18, 3) : 'e', (18, 4) : 'e', \
-                                    (19, 1) : 'g', (19, 2) : 'g', (19, 3) : 'e', (19, 4) : 'e', \
-                                    (20, 1) : 'g', (20, 2) : 'g', (20, 3) : 'e', (20, 4) : 'e', \
-                                    (21, 1) : 'g', (21, 2) : 'e', (21, 3) : 'e', (21, 4) : 's', \
-                                    (22, 1) : 'g', (22, 2) : 'e', (22, 3) : 'e', (22, 4) : 's', \
-                                    (23, 1) : 'g', (23, 2) : 'e', (23, 3) : 'e', (23, 4) : 's', \
-                                    (24, 1) : 'e', (24, 2) : 'e', (24, 3) : 's', (24, 4) : 's', \
-                                    (25, 1) : 'e', (25, 2) : 'e', (25, 3) : 's', (25, 4) : 's', \
-                                    (26, 1) : 'e', (26, 2) : 'e', (26, 3) : 's', (26, 4) : 's', \
-                                    (27, 1) : 'e', (27, 2) : 's', (27, 3) : 's', (27, 4) : 's', \
-                                    (28, 1) : 'e', (28, 2) : 's', (28, 3) : 's', (28, 4) : 's', \
-                                    (29, 1) : 'e', (29, 2) : 's', (29, 3) : 's', (29, 4) : 's', \
-                                    (30, 1) : 's', (30, 2) : 's', (30, 3) : 's', (30, 4) : 's'}
-
-
-        pw_len = len(pw)
+        for entry in entries:
 
-        n_chr_classes = self.check_num_char_classes(pw)
+            try:
+                offset, length, digest, record_id = entry.split(',')
+                offset, length, record_id = int(offset), int(length), int(record_id)
 
+                # Segments are usually in the order of the file
+                if (fh.tell() != offset):
+                    fh.seek(offset)
 
-        if (pw_len < 8):
+                token = fh.read(length)
 
-            return 'u'
+            except (IOError, OSError, ValueError):
+                if (override_integrity_check):
+                    yield None
+                    continue
+                fh.close()
+                raise IntegrityCheckFailedException('load_database(): Segment is corrupted (error#17)')
 
-        elif (pw_len > 30):
+            if (self.generate_hash(token) != digest):
+                if (override_integrity_check):
+                    yield None
+                    continue
+                fh.close()
+                raise IntegrityCheckFailedException('load_database(): Hash mismatch detected (error#18)')
 
-            return 's'
+            try:
+                line   = decrypt_segment(cipher, token, record_id)
+                record = decode_record(line)
+                record.set_id(record_id)
 
-        else:
+            except (InvalidTag, UnicodeDecodeError, UnsupportedFileFormatException):
+                if (override_integrity_check):
+                    yield None
+                    continue
+                fh.close()
+                raise IntegrityCheckFailedException('load_database(): Segment is corrupted (error#17)')
 
-            return pw_complexity_rating_l.get((pw_len, n_chr_classes))            
+            yield (record, self.generate_hash(line), (offset, length, digest))
 
 
-    def check_num_char_classes(self, pw=''):
+    def __iter_summary_records(self, fh, entries=[], summary=[], override_integrity_check=False):
 
         """
-        Returns the number of character classes that are present in a password  
+        Builds records from the summary section (site, username, email, group 
+            & last modified), 
+            segments are only located in the footer so that they can be decrypted 
+            later on (See fetch_record())
 
+        Yields: Same as __iter_segment_records()
+
+        Exceptions: IntegrityCheckFailedException if the summary doesn't match the footer
         """
 
-        _pw = list(pw)
+        # (offset, length, digest) of segments by id
+        segments = {}
 
-        count_l = 0
-        count_s = 0
-        count_u = 0
-        count_n = 0
+        for entry in entries:
 
-        for i in range(len(_pw)):
+            try:
+                offset, length, digest, record_id = entry.split(',')
+                segments[int(record_id)] = (int(offset), int(length), digest)
+            except ValueError:
+                if (override_integrity_check):
+                    yield None
+                    continue
+                fh.close()
+                raise IntegrityCheckFailedException('load_database(): Segment is corrupted (error#17)')
 
-            if (_pw[i] in self.__lcase):
-                count_l += 1
-            elif (_pw[i] in self.__symbols):
-                count_s += 1
-            elif (_pw[i] in self.__ucase):
-                count_u += 1
-            elif (_pw[i] in self.__num):
-                count_n += 1
+        for record_id, line_digest, site, username, email, group, last_modified in summary:
 
-        count_total = 0
+            segment = None
 
-        if (count_l != 0):
-            count_total += 1
+            if (record_id.isdigit()):
+                segment = segments.get(int(record_id))
 
-        if (count_s != 0):
-            count_total += 1
+            if (segment == None):
+                if (override_integrity_check):
+                    yield None
+                    continue
+                fh.close()
+                raise IntegrityCheckFailedException('load_database(): Summary is corrupted (error#23)')
 
-        if (count_u != 0):
-            count_total += 1
+            record = Record(site, '', last_modified)
+            record.set_username(username)
+            record.set_email(email)
+            record.set_group(group)
+            record.set_id(int(record_id))
 
-        if (count_n != 0):
-            count_total += 1
+            self.__summary_segments[record.get_id()] = segment + (line_digest,)
 
-        return count_total
+            yield (record, line_digest, segment)
 
 
+    def __read_summary(self, fh, entry=''):
 
-    '''
-    ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
-    ┃   Database Miscellaneous                                           ┃
-    ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
-    '''
+        """
+        Reads & decrypts the summary section, it's located by the 
+            first entry of the footer 's,offset,length,digest'
 
-    def validate_index(self, index=None):
+        Returns: [[id, digest of payload, site, username, email, group, last modified], ..] (See encode_summary())
 
+        Exceptions: IntegrityCheckFailedException if it's corrupted
         """
-        Validates whether index or a list of indexes represents
-         record indices in database
 
-        Args:    An int value or a list of integers 
-                             OR
-                 The list which will be used to validate indexes
+        try:
+            kind, offset, length, digest = entry.split(',')
+            offset, length = int(offset), int(length)
 
-        Returns: Boolean value indicating whether index/indexes are valid
+            if (kind != 's'):
+                raise ValueError()
 
-        Exception: TypeError is raised if there's a data type mismatch
+            fh.seek(offset)
+            token = fh.read(length)
 
-        """
+        except (IOError, OSError, ValueError):
+            raise IntegrityCheckFailedException('load_database(): Summary is corrupted (error#23)')
 
-        if (type(index) == int):
-            if (index >= 0 and (index < len(self.__record_list))):
-                return True
-            else:
-                return False
+        if (self.generate_hash(token) != digest):
+            raise IntegrityCheckFailedException('load_database(): Hash mismatch detected (error#18)')
 
-        elif (type(index) == list):
+        try:
+            # Summary is encrypted like a segment of id 0, ids of records start at 1
+            data    = decrypt_segment(self.__get_segment_cipher(), token, 0)
+            summary = decode_summary(data)
+        except (InvalidTag, UnicodeDecodeError, UnsupportedFileFormatException):
+            raise IntegrityCheckFailedException('load_database(): Summary is corrupted (error#23)')
 
-            for i in index:
-                if (not (i >= 0 or (i < len(self.__record_list)))):
-                    return False
+        self.__segment_summary = (self.generate_hash(data), offset, length, digest)
 
-            return True
+        return summary
 
-        else:
-            raise TypeError('validate_index(): Needs to be of type int or list')
 
+    def __append_loaded_record(self, record_digest='', record=None):
 
-    def get_number_of_records(self):
+        self.__search_index_reset()
+        self.__order_reset()
 
-        """
-        Returns the number of records in database
-        """
-        return len(self.__record_list)
+        self.__record_list.append(record)
+        self.__record_digests[id(record)] = record_digest
+        self.__assign_id(record)
 
+        return record
 
-    def get_record_at_index_with_enc_pw(self, index):
+
+    def __read_journal(self, filename='', override_integrity_check=False):
 
         """
-        Provides the record object at the specified index with enc pw
+        Reads changes from the journal (See __write_journal()), so that they can be 
+            applied while records are loaded from the database
 
-        Args:    index (int)
-        Returns: (Record)
+        * An op that was partially written at the end of journal (e.g crash) is ignored
 
-        """
+        Returns: 1) Digests of records in database that were removed / updated, 
+                    along with the number of times (dict)
+                 2) Records that were added / updated along with their digests,
+                    in the order of journal [(digest, Record), ..]
 
-        return self.__record_list[index]
+        Exceptions: IntegrityCheckFailedException if an op is corrupted or out of order,
+                    if integrity check is overridden, journal is read until that op
+        """
 
+        self.__journal_reset_state()
 
-    def get_summary(self):
+        removed = {}
+        added   = []
 
-        """
-        This is used by the frontend for the search bar.
+        path = journal_path(filename)
 
-        Presents a summary of records in database for autocompletion 
-        when searching.
+        if (not os.path.isfile(path)):
+            return (removed, added)
 
-        Uses:    get_summary() method in Class @Record()
-        Used by: search_bar_show() in @pwmgr
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            st = os.stat(path)
+        except (IOError, OSError):
+            raise DataCorruptedException("load_database(): IO error occured " + \
+                                         "while reading journal (error#19)")
 
-        Args:    N/A
+        line_l = data.split(b'\n')
 
-        Returns: A list of strings matching record indexes in database
-        """
+        # Journal of a database that was replaced
+        if (line_l[0] != b'PWMGRJ01' + bytes(self.__get_snapshot_id(), 'utf-8')):
+            return (removed, added)
 
-        if (len(self.__record_list) == 0):
-            return []
+        fernet_handler = self.__get_fernet_handler(1)
 
-        l = []
+        prev  = self.__journal_last
+        end   = len(line_l[0]) + 1
+        count = 0
 
-        for i in range(len(self.__record_list)):
-            l.append(self.__record_list[i].get_summary())
+        for i in range(1, len(line_l)):
 
-        return l
+            token = line_l[i]
 
+            if (token == b'' and i == len(line_l) - 1):
+                break
 
-    def print_data(self):
+            op     = None
+            record = None
 
-        print('Number of records: %d' %len(self.__record_list))
+            try:
+                header, _, payload = fernet_handler.decrypt(token).partition(b'\n')
+                op = header.decode('utf-8').split(',')
 
-        for i in range(len(self.__record_list)):
-            print(self.__record_list[i])
+                if (len(op) == 5 and op[1] in ['a','u']):
+                    record = decode_record(payload)
 
+            except (InvalidToken, UnicodeDecodeError, UnsupportedFileFormatException):
+                op = None
 
-    def add(self, item):
+            if (op == None or len(op) != 5 or op[0] != prev or \
+                    op[1] not in ['a','u','r'] or not op[4].isdigit()):
 
-        """
-        Adds a Record object, also supports a list of records
-        
-        Args:    A single Record or a list of Record
-        
-        Returns: N/A
-        """
+                # Partially written
+                if (i == len(line_l) - 1):
+                    break
+                elif (override_integrity_check):
+                    self.__journal_ok = False
+                    break
 
-        if (type(item) == Record):
+                raise IntegrityCheckFailedException('load_database(): Journal is corrupted (error#20)')
 
-            _item = item
-            _item.set_password(self.__encrypt_pw(item.get_password_encrypted()))
+            kind, ref_digest, new_digest = op[1], op[2], op[3]
 
-            self.__record_list.append(_item) 
+            if (kind in ['u','r']):
 
-        elif (type(item) == list):
+                # Record that was added by the journal, otherwise it's in the database
+                for j in range(len(added) - 1, -1, -1):
+                    if (added[j][0] == ref_digest):
+                        added.pop(j)
+                        break
+                else:
+                    removed[ref_digest] = removed.get(ref_digest, 0) + 1
 
-            for record in item:
+            if (kind in ['a','u']):
 
-                _record = record
-                _record.set_password(self.__encrypt_pw(record.get_password_encrypted()))
+                record.set_id(int(op[4]))
 
-                self.__record_list.append(_record) 
+                added.append((new_digest, record))
 
-        self.sort()
+            prev   = self.generate_hash(token)
+            end   += len(token) + 1
+            count += 1
 
+        self.__journal_count = count
+        self.__journal_stat  = (st.st_size, st.st_mtime_ns)
+        self.__journal_end   = end
+        self.__journal_last  = prev
 
-    def check_duplicate_entry(self, site):
+        return (removed, added)
 
-        """
-        Searches for duplicate entries & returns boolean value
-        indicating whether a duplicate entry exists or not.
-        An entry is considered duplicate if the site name along with
-        username / email match any existing record in database.
 
-        Args:    Record object
+    def load_database(self, filename='data.enc', password='', \
+                            override_integrity_check=False,   \
+                            path_to_keyfile='',               \
+                            load_key_from_keyring=False,      \
+                            enc_key='', enc_key_2='',         \
+                            enc_key_2_salt_id='',             \
+                            summary_only=False):
 
-        Returns: Boolean
         """
-        result = self.search_website(site, partial_match=False)
 
-        if (len(result) != 0):
-            return True
-        else:
-            return False
+        Attempts to load database from specified path (filename)
 
+        Args: Specify path to the database
 
-    def sort(self):
+              * When loading with a key from keyring, a cached key 2 can also be
+                passed along with the salt id (get_salt_id()) it was derived with.
+                It is only used if the salts in the file are the same, otherwise
+                key 2 is derived again.
 
-        self.__sort_by_website()
+              * summary_only only decrypts the summary section of format '02', 
+                records only have site, username, email, group & last modified 
+                until they're fetched (See fetch_record()), '00' / '01' are loaded completely
 
+        Returns: Boolean value indicating success / failure
 
-    def __sort_by_website(self):
+        Exceptions:
 
-        self.__record_list.sort(key=lambda x : x.get_website())
+         1) UnsupportedFileFormatException    File format is not supported
 
+         2) IntegrityCheckFailedException     Calculated hash is incorrect
 
-    def __sort_by_last_modified(self, custom_list=None):
+         3) IncorrectPasswordException        Data decryption failed
 
-        """
-        Sorts records by most recent to least
+         4) InvalidParameterException         Input parameters are incorrect
 
-        Args:    Accepts a list of records for sorting. 
-                 If no parameters are passed, sorts the 
-                 inernal list of records
+         5) DataCorruptedException            Decoding of unicode characters failed
 
-        Returns: If optional parameter was passed returns
-                 the sorted list
         """
 
-        if (custom_list == None or len(custom_list) == 0):
-            return []
+        for record in self.load_database_iter(filename, password, override_integrity_check, \
+                                              path_to_keyfile, load_key_from_keyring,     \
+                                              enc_key, enc_key_2, enc_key_2_salt_id,      \
+                                              summary_only):
+            pass
 
-        l_mod = [] 
+        return True
 
-        for i in range(len(custom_list)):
-            l_mod.append([custom_list[i],i])
 
-        while (True):
-            changes = False
-        
-            for i in range(len(l_mod)):
-                j = i+1
-        
-                if (j < len(l_mod)):
-                    j_last = l_mod[j][0].get_last_modified().split(' ')
-                    j_date = j_last[0].split('-')
-                    j_time = j_last[1].split(':')
-        
-                    j_day = int(j_date[0])
-                    j_month = int(j_date[1])
-                    j_year = int(j_date[2])
-                    j_hr = int(j_time[0])
-                    j_min = int(j_time[1])
+    def load_database_iter(self, filename='data.enc', password='', \
+                                 override_integrity_check=False,   \
+                                 path_to_keyfile='',               \
+                                 load_key_from_keyring=False,      \
+                                 enc_key='', enc_key_2='',         \
+                                 enc_key_2_salt_id='',             \
+                                 summary_only=False):
 
-                    #print('%s/%s/%s %s:%s' % (j_year, j_month, j_day, j_hr, j_min))
-        
-                    j_dt_obj = datetime(j_year, j_month, j_day, j_hr, j_min)
-        
-                    i_last = l_mod[i][0].get_last_modified().split(' ')
-                    i_date = i_last[0].split('-')
-                    i_time = i_last[1].split(':')
-        
-                    i_day = int(i_date[0])
-                    i_month = int(i_date[1])
-                    i_year = int(i_date[2])
-                    i_hr = int(i_time[0])
-                    i_min = int(i_time[1])
-        
-                    #print('%s/%s/%s %s:%s' % (i_year, i_month, i_day, i_hr, i_min))
+        """
+        Same as load_database(), but yields records as they are loaded, in the
+            order they'll be in once the database is loaded
 
-                    i_dt_obj = datetime(i_year, i_month, i_day, i_hr, i_min)
-        
+        * Format '02' is read one segment at a time, so the first records are 
+          available before the rest of database is decrypted. '00' / '01' 
+          are loaded completely before the first record is yielded.
 
-                    if (i_dt_obj < j_dt_obj):
-                        tmp = l_mod[i]
-                        l_mod[i] = l_mod[j]
-                        l_mod[j] = tmp
-                        changes = True
-        
-            if (changes == False):
-                break
+        * Key check & mac are verified before the first record is yielded, 
+          exceptions are the same as load_database()
 
-        return l_mod
+        * Database is only loaded completely once the generator is exhausted
 
+        Yields: (Record)
+        """
 
-    def get_records_last_modified(self):
+        ## Some of the parameter checks are not required as it is handled
+        ## by frontend, but its still placed in here as a safety measure 
+        ## in case this library is used by other programs.
 
-        """
-        Returns a list of records from database, sorted in 
-        the order of most recently modified 
+        if (password == '' and load_key_from_keyring == False):
+            raise InvalidParameterException("load_database(): Password parameter cannot be empty")
+        elif (load_key_from_keyring == True and enc_key == ''):
+            raise InvalidParameterException("load_database(): Encryption key cannot be empty")
+        elif (not os.path.isfile(filename)):
+            raise InvalidParameterException("load_database(): Database file '%s' does not exist" % filename)
 
-        Args:    N/A
+        fh = open(filename, 'rb')
 
-        Returns: A list of records sorted in the order of 
-                 most recently modified along with their
-                 appropriate index in the database
-                 e.g [[r1,2], [r2,3], [r3,7],..]
+        format_name          = 'PWMGR'
+        format_name_bytes    = ''
 
-        Note: This function is just used to sort & display internal
-              records in read only mode, we keep our default sorting 
-              (sort by website) & our database intact.
-        """
+        format_version       = ''
+        format_version_bytes = ''
 
-        return self.__sort_by_last_modified(self.__record_list)
+        try:
+            # 'PWMGR'
+            format_name_bytes = fh.read(5)
 
+            # '00' - '02'
+            format_version_bytes = fh.read(2)
 
-    def remove_index(self, index):
+        except IOError:
+            fh.close()
+            raise DataCorruptedException("load_database(): IO error occured " + \
+                                         "while reading database (error#1)")
 
-        """
-        Deletes a Record object based on index, also supports a list of indexes
-        
-        Args:    Index(es) to remove (int) or (list)
-        
-        Returns: N/A
-        """
+        if (format_name_bytes == '' or format_version_bytes == ''):
+            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#2)")
 
-        if (type(index) == int):
-            self.__record_list.pop(index)
-        elif (type(index) == list):
+        output1 = decode_unicode_str_safely(format_name_bytes)
+        output2 = decode_unicode_str_safely(format_version_bytes)
 
-            tmp_records = []
+        if (not (output1[0] and output1[1] == format_name)):
+            fh.close()
+            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#3)")
 
-            for i in index:
-                r = self.__record_list[i]
-                tmp_records.append(r)
 
-            for record in tmp_records:
-                for i in range(0, len(self.__record_list)):
-                    if (record == self.__record_list[i]):
-                        self.__record_list.pop(i)
-                        break
+        if (output2[0] and output2[1] in ['00','01','02'] ):
+
+            format_version = output2[1]
+
+        else:
+
+            fh.close()
+            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#4)")
+
+        loaded_hash = ''
+
+        # [[type, kdf_id, params, salt, wrapped keys], ..]
+        key_slots   = []
+
+        if (format_version == '02'):
+
+            try:
+                for i in range(int(fh.read(2))):
+
+                    slot = [fh.read(1).decode('utf-8')]
+                    slot.extend(kdf_parse_header(fh.read(KDF_HEADER_LENGTH)))
+                    slot.append(fh.read(self.__salt_length))
+                    slot.append(fh.read(int(fh.read(4))))
+
+                    key_slots.append(slot)
+
+            except (IOError, ValueError):
+                fh.close()
+                raise DataCorruptedException("load_database(): IO error occured " + \
+                                             "while reading database (error#5)")
+            except UnsupportedFileFormatException:
+                fh.close()
+                raise
+
+            if (len(key_slots) == 0 or \
+                    [slot for slot in key_slots if slot[0] not in KEY_SLOT_NAMES or \
+                                                   len(slot[3]) != self.__salt_length or slot[4] == b'']):
+                fh.close()
+                raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#6)")
+
+            # Kdf & salt 1 are set from the slot that unlocks (See __load_keys())
+            self.__salt_2 = b''
+
+            try:
+                slot_type = self.__load_keys(password, path_to_keyfile, load_key_from_keyring, \
+                                             enc_key, enc_key_2, enc_key_2_salt_id, key_slots)
+            except:
+                fh.close()
+                raise
+
+            for record in self.__iter_segmented_database(fh, filename, override_integrity_check, \
+                                                         summary_only):
+
+                if (not load_key_from_keyring):
+                    self.__master_password = password
+
+                self.__key_slots[self.__key_slot][0] = slot_type
+
+                yield record
+
+            self.__key_slots[self.__key_slot][0] = slot_type
+
+            if (not load_key_from_keyring):
+                self.__master_password = password
+
+            return
+
+        try:
+            loaded_hash   = fh.read(self.__hash_length)
+            self.__salt_1 = fh.read(self.__salt_length)
+            self.__salt_2 = fh.read(self.__salt_length)
+        except IOError:
+            fh.close()
+            raise DataCorruptedException("load_database(): IO error occured " + \
+                                         "while reading database (error#5)")
+
+        if (loaded_hash == b'' or self.__salt_1 == b'' or self.__salt_2 == b''):
+            fh.close()
+            raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#6)")
+
+        # '00' / '01' were always derived with PBKDF2 (1M iterations)
+        self.__kdf_id     = KDF_PBKDF2
+        self.__kdf_params = list(KDF_DEFAULT_PARAMS[KDF_PBKDF2])
+
+        #-----------------------------------------------#  #-----------------------------------------------# 
+        # File with data                                #  # File without data                             #
+        #-----------------------------------------------#  #-----------------------------------------------#
+        # PWMGR | 01 | hash | salt-1 | salt-2 | data    #  # PWMGR | 00 | hash | salt-1 | salt-2           #
+        #-----------------------------------------------#  #-----------------------------------------------#
+
+        data = b''
+
+        if (format_version == '01'):
+
+            try:
+                data = fh.read()
+                fh.close()
+            except IOError:
+                fh.close()
+                raise DataCorruptedException("load_database(): IO error occured " + \
+                                             "while reading database (error#7)")
+
+            if (data == ''):
+                raise UnsupportedFileFormatException("load_database(): Format is not recognized (error#8)")
+
+        if (not override_integrity_check):
+
+            generated_hash = ''
+
+            if (format_version == '01'):
+                generated_hash = self.generate_hash(format_name_bytes + format_version_bytes + \
+                                                    self.__salt_1 + self.__salt_2 + data)
+            else:
+                generated_hash = self.generate_hash(format_name_bytes + format_version_bytes + \
+                                                    self.__salt_1 + self.__salt_2)
+
+            if (loaded_hash != bytes(generated_hash, 'utf-8')):
+                raise IntegrityCheckFailedException('load_database(): Hash mismatch detected (error#9)')
+
+        self.__load_keys(password, path_to_keyfile, load_key_from_keyring, \
+                         enc_key, enc_key_2, enc_key_2_salt_id)
+
+        if (data != b''):
+
+            fernet_handler = self.__get_fernet_handler(1)
+
+            try:
+                decrypted = fernet_handler.decrypt(data)
+            except InvalidToken:
+                raise IncorrectPasswordException("load_database(): Password is incorrect (error#10)")
+
+            output = decode_unicode_str_safely(decrypted)
+
+            if (output[0]):
+                decrypted = output[1]
+            else:
+                raise DataCorruptedException("load_database(): IO error occured " + \
+                                                 "while reading database (error#11)")
+
+            if (not load_key_from_keyring):
+                self.__master_password = password
+
+            self.convert_csvlist_to_record(self.read_csv_in_memory(decrypted), True)
+
+        for record in self.__record_list:
+            yield record
+
+
+    '''
+    ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
+    ┃   Database Password Auditing                                       ┃
+    ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+    '''
+
+    def audit_security(self):
+
+        """
+        Audits pw age, reuse, complexity & rates overall security of all records
+
+        * Only passwords of records that changed since the last audit are 
+          decrypted (See audit_pw_reuse_and_cmp_all())
+
+        Returns: Whether audit information of any record has changed (bool), 
+                 database only needs to be written if it has
+        """
+
+        ## Combining pw_reuse & pw_complexity otherwise we'd run into memory enc errors
+        ##      due to the way this enc library functions
+
+        audit_l = [self.__get_audit_fields(record) for record in self.__record_list]
+
+        self.audit_pw_age_all()
+        self.audit_pw_reuse_and_cmp_all()
+        self.rate_overall_security()
+
+        for i in range(len(self.__record_list)):
+            if (audit_l[i] != self.__get_audit_fields(self.__record_list[i])):
+                return True
+
+        return False
+
+
+    def __get_audit_fields(self, record=None):
+
+        return (record.get_pw_age(), record.get_pw_reuse(), \
+                record.get_pw_complexity(), record.get_security_rating())
+
+
+    def __get_audit_key(self):
+
+        """
+        Returns the key used for audit fingerprints & pw digests, it is derived 
+            from key 1 (a random data key, see __generate_data_keys())
+
+        * Audit key stays the same when the password / keyfile / kdf changes, like 
+          the mac key (See __get_mac_key()), so the audit cache stays valid & 
+          passwords aren't audited again after 'change-enc-key'
+        """
+
+        return hmac.new(base64.urlsafe_b64decode(self.__encryption_key_1), \
+                        b'PWMGR02 audit', sha256).digest()
+
+
+    def __get_audit_fingerprint(self, record=None, audit_key=b''):
+
+        """
+        Returns a digest of what the audit of a record depends on (encrypted pw, 
+            last modified & version of audit rules), if it hasn't changed the 
+            password doesn't need to be audited again
+        """
+
+        data = '%s\n%s\n%s' % (AUDIT_RULES_VERSION, record.get_password_encrypted(), \
+                                record.get_last_modified())
+
+        return hmac.new(audit_key, bytes(data, 'utf-8'), sha256).hexdigest()
+
+
+    def __audit_cache_load(self):
+
+        """
+        Loads audit cache of the database that was last loaded / written, 
+            it's ignored if it can't be read (every password is audited)
+        """
+
+        self.__audit_cache = {}
+
+        path = audit_path(self.__segment_file)
+
+        if (self.__segment_file == '' or not os.path.isfile(path)):
+            return
+
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+
+            if (not data.startswith(b'PWMGRA01\n')):
+                return
+
+            data = self.__get_fernet_handler(1).decrypt(data[9:]).decode('utf-8')
+
+            for line in data.splitlines():
+                record_id, fingerprint, digest = line.split(',')
+                self.__audit_cache[int(record_id)] = (fingerprint, digest)
+
+        except (IOError, OSError, ValueError, InvalidToken, UnicodeDecodeError):
+            self.__audit_cache = {}
+
+
+    def __audit_cache_write(self):
+
+        """
+        Audit cache:  PWMGRA01 \n fernet token (key 1) of 'id,fingerprint,pw digest\n' of each record
+        """
+
+        if (self.__segment_file == ''):
+            return
+
+        path     = audit_path(self.__segment_file)
+        tmp_path = '%s.tmp' % path
+
+        data = ''.join(['%d,%s,%s\n' % (record_id, entry[0], entry[1]) \
+                            for record_id, entry in self.__audit_cache.items()])
+
+        try:
+            with open(tmp_path, 'wb') as fh:
+                fh.write(b'PWMGRA01\n')
+                fh.write(self.__get_fernet_handler(1).encrypt(bytes(data, 'utf-8')))
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            os.replace(tmp_path, path)
+
+        except (IOError, OSError):
+            print("audit_security(): error#1 occured while writing audit cache")
+
+
+    # [x] Tested
+    def sort_security_rating(self):
+
+        """
+        Sorts records by security ratings in ascending or descending order based 
+        on the paramter that has been set. Need to call audit_security() first before 
+        calling this function.
+
+         Ratings: 
+
+            (15) Superb
+            (14) Excellent
+         (12-13) Good
+         (10-11) Average
+           (7-9) Weak
+           (0-6) Critical
+
+        Returns:  List of record indexes sorted in (ascending/descending order) 
+                  based on overall security rating
+
+        """
+
+        if (len(self.__record_list) == 0):
+            return []
+
+        # Records without a rating are left out (See __get_order_key())
+        return [i for key, i in self.__get_ordered_indexes('security_rating') if key >= 0]
+
+
+    # [x] Tested, Initial testing done. More testing needed
+    def rate_overall_security(self):
+
+        """
+                   Rates overall security posture of all records in database
+
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+                                             Ratings
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+         pw_complexity (6)  's' =  6, 'e' =  5, 'g' =  2, 'a' =  0, 'w' = -3, 'u' = -6
+         pw_age        (3)  'n' =  3, 'o' =  1, 'r' = -3, 't' = -5, 'h' = -6
+         pw_reuse      (6)  '0' =  6, '1' =  0
+
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+         Total score (15)   max = 15, min = 0 (negative values are set to 0)
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+            (15) Superb
+            (14) Excellent
+         (12-13) Good
+         (10-11) Average
+           (7-9) Weak
+           (0-6) Critical
+
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+        """
+
+        self.__journal_ok = False
+        self.__order_reset('security_rating')
+
+        if (len(self.__record_list) == 0):
+            return []
+
+        for i in range(len(self.__record_list)):
+
+            r = self.__record_list[i]
+
+            rating_age = 0
+            rating_reuse = 0
+            rating_complexity = 0
+            rating_total = 0
+
+            pw_age = r.get_pw_age()
+
+            # pw_age (3)  'n' =  3, 'o' =  1, 'r' = -3, 't' = -5, 'h' = -6
+            if (pw_age == 'n'):
+                rating_age = 3
+            elif (pw_age == 'o'):
+                rating_age = 1
+            elif (pw_age == 'r'):
+                rating_age = -3
+            elif (pw_age == 't'):
+                rating_age = -5
+            elif (pw_age == 'h'):
+                rating_age = -6
+            else: # Skipping rating if there's errors with last_modified attribute
+                continue
+
+            pw_reuse = r.get_pw_reuse()
+
+            # pw_reuse (6)  '0' =  6, '1' = 0
+            if (pw_reuse == '0'):
+                rating_reuse = 6
+            elif (pw_age == '1'):
+                rating_reuse = 0
+
+            # pw_complexity (6)  's' =  6, 'e' =  5, 'g' =  2, 'a' =  0, 'w' = -3, 'u' = -6
+            pw_complexity = r.get_pw_complexity()
+
+            if (pw_complexity == 's'):
+                rating_complexity = 6
+            elif (pw_complexity == 'e'):
+                rating_complexity = 5
+            elif (pw_complexity == 'g'):
+                rating_complexity = 2
+            elif (pw_complexity == 'a'):
+                rating_complexity = 0
+            elif (pw_complexity == 'w'):
+                rating_complexity = -3
+            elif (pw_complexity == 'u'):
+                rating_complexity = -6
+
+            rating_total = rating_age + rating_reuse + rating_complexity
+
+            if (rating_total < 0):
+                rating_total = 0
+
+            rating_str = '%d' % (rating_total)
+
+            self.__record_list[i].set_security_rating(rating_str)
+
+
+    # [x] Tested
+    def audit_pw_age_all(self):
+
+        """
+        Audits records to check if they exceed the desired password age,
+            & stores audit information within each record
+
+        Returns: 7 lists
+
+                 Not audited / Error / No Password age information ('e')
+                 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+                 1) List of record indexes whose last modified value
+                    is blank / not updated.
+                    (This could be because after importing from another 
+                    password manager datebase)
+
+                 2) List of record indexes whose last modified value
+                    is probably incorrect as it points to somewhere 
+                    in the future
+
+
+                 Audited attributes ('n', 'o', 'r', 't', 'h')
+                 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+                 3) Password age is < 6 months & don't need to be changed ('n')
+
+                 4) Password age is >= 6 months to < 1 year old ('o')
+
+                 5) Password age is >= 1 year and < 1.5 years.
+                    The user would be recommended to change it ('r')
+
+                 6) Password age is 1.5-2 years, change is urgently required ('t')
+
+                 7) Password age is > 2 years, password change is critical
+                    for overall security ('h')
+        """
+
+        self.__journal_ok = False
+
+        lm_not_updated         =     []
+        lm_err                 =     []
+        pw_reset_not_needed    =     []
+        pw_reset_optional      =     []
+        pw_reset_recommended   =     []
+        pw_reset_urgent        =     []
+        pw_reset_critical      =     []
+
+        for i in range(len(self.__record_list)):
+
+            lm = self.__record_list[i].get_last_modified()
+
+            if (lm == ''):
+                lm_not_updated.append(i)
+                continue
+            else:
+                result = self.audit_pw_age_single_record(i)
+
+                if (result == 'e'):
+                    lm_err.append(i)
+                elif (result == 'n'):
+                    pw_reset_not_needed.append(i)
+                elif (result == 'o'):
+                    pw_reset_optional.append(i)
+                elif (result == 'r'):
+                    pw_reset_recommended.append(i)
+                elif (result == 't'):
+                    pw_reset_urgent.append(i)
+                elif (result == 'h'):
+                    pw_reset_critical.append(i)
+
+        return lm_not_updated, lm_err, pw_reset_not_needed, \
+                     pw_reset_optional, pw_reset_recommended, \
+                     pw_reset_urgent, pw_reset_critical
+
+
+    def audit_pw_age_single_record(self, chosen_index=-1):
+
+        """
+        Audits records to check if they exceed the desired password age,
+            & stores audit information within each record
+
+        * If there's any errors, for example last modified is missing,
+            (which probably won't happen) pw_age attribute is set to 'e'
+
+        Returns: A char in the range as show in the chart below
+
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+           pw_age (3) 'n' =  3, 'o' =  1, 'r' = -2, 't' = -4, 's' = -6, 'e' = n/a
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+                                   n =          #days < 0.5 yr
+                                   o = 0.5 yr < #days < 1 yr
+                                   r =   1 yr < #days < 1.5 yr
+                                   t = 1.5 yr < #days < 2 yr
+                                   h =   2 yr < #days
+        ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        """
+
+        self.__journal_ok = False
+
+        if (chosen_index == -1):
+            raise InvalidParameterException('audit_pw_age_single_record(): Index parameter cannot be empty')
+
+        day_today = datetime.today()
+
+        days_this_year = 365
+        half_year = 180
+
+        if (self.is_year_leap_year(day_today.year)):
+            days_this_year = 366
+
+        # 1 < 1yr+ < 1.5
+        days_1_yr_plus = days_this_year + 180
+
+        days_2_yr = (days_this_year * 2)
+
+        lm = self.__record_list[chosen_index].get_last_modified()
+
+        if (lm == ''):
+            self.__record_list[i].set_pw_age('e')
+            return
+
+        date = lm.split(' ')[0]
+        time = lm.split(' ')[1]
+
+        day = int(date.split('-')[0])
+        month = int(date.split('-')[1])
+        yr = int(date.split('-')[2])
+
+        hr = int(time.split(':')[0])
+        minute = int(time.split(':')[1])
+
+        days_of_past = datetime(yr, month, day, hr, minute)
+
+        '''
+            n =          #days < 0.5 yr
+            o = 0.5 yr < #days < 1 yr
+            r =   1 yr < #days < 1.5 yr
+            t = 1.5 yr < #days < 2 yr
+            h =   2 yr < #days
+        '''
+
+        if (days_of_past > day_today):
+
+            ## 'e' metric is used for errors, usually we won't get this
+            self.__record_list[chosen_index].set_pw_age('e')
+            return 'e'
+
+        num_days = (day_today-days_of_past).days
+
+        if (num_days < half_year):
+            self.__record_list[chosen_index].set_pw_age('n')
+            return 'n'
+        elif (num_days < days_this_year):
+            self.__record_list[chosen_index].set_pw_age('o')
+            return 'o'
+        elif (num_days < days_1_yr_plus):
+            self.__record_list[chosen_index].set_pw_age('r')
+            return 'r'
+        elif (num_days < days_2_yr):
+            self.__record_list[chosen_index].set_pw_age('t')
+            return 't'
+        else:
+            self.__record_list[chosen_index].set_pw_age('h')
+            return 'h'
+
+
+    def is_year_leap_year(self, y=0):
+
+        if (y <= 0):
+            return False
+
+        if (y % 4 != 0):
+            return False
+
+        else:
+
+            if (y % 100 != 0):
+                return True
+            elif (y % 400 == 0):
+                return True
+            else:
+                return False
+
+
+    # [x] Tested
+    def audit_pw_reuse_and_cmp_all(self):
+
+        """
+        Audits records to see if any of them reuse the same password & the pw complexity
+
+        * Passwords are only decrypted & their complexity is only calculated if
+          the record has changed since it was last audited (See __get_audit_fingerprint())
+
+        Returns: None
+        """
+
+        self.__journal_ok = False
+
+        rec_len = len(self.__record_list)
+
+        ## PW Reuse Calculations
+        if (rec_len == 0):
+            return
+
+        if (self.__audit_cache == None):
+            self.__audit_cache_load()
+
+        audit_key = self.__get_audit_key()
+
+        # Passwords are grouped by a keyed digest instead of comparing every pair,
+        # digests of records that haven't changed since the last audit are cached
+        clusters  = {}
+        cache     = {}
+        changed   = False
+
+        fingerprints = []
+        audit_l      = []
+
+        for i in range(0, rec_len):
+
+            record      = self.__record_list[i]
+            fingerprint = self.__get_audit_fingerprint(record, audit_key)
+            entry       = self.__audit_cache.get(record.get_id())
+
+            if (entry != None and entry[0] == fingerprint and record.get_pw_complexity() != ''):
+                cache[record.get_id()] = entry
+            else:
+                audit_l.append(i)
+
+            fingerprints.append(fingerprint)
+
+        # Records that changed are decrypted as a batch
+        pw_list = self.decrypt_passwords(audit_l)
+
+        for n in range(len(audit_l)):
+
+            record = self.__record_list[audit_l[n]]
+            digest = hmac.new(audit_key, bytes(pw_list[n], 'utf-8'), sha256).hexdigest()
+
+            record.set_pw_complexity(self.audit_pw_complexity(pw_list[n]))
+
+            cache[record.get_id()] = (fingerprints[audit_l[n]], digest)
+            changed = True
+
+        pw_list = None
+
+        for i in range(0, rec_len):
+
+            digest = cache[self.__record_list[i].get_id()][1]
+
+            if (digest in clusters):
+                clusters[digest].append(i)
+            else:
+                clusters[digest] = [i]
+
+        # Records that were removed
+        if (len(cache) != len(self.__audit_cache)):
+            changed = True
+
+        self.__audit_cache = cache
+
+        if (changed):
+            self.__audit_cache_write()
+
+        self.__pw_reuse_clusters = []
+
+        for cluster in clusters.values():
+
+            if (len(cluster) > 1):
+
+                self.__pw_reuse_clusters.append([self.__record_list[i].get_id() for i in cluster])
+
+                for i in cluster:
+                    self.__record_list[i].set_pw_reuse('1')
+            else:
+                self.__record_list[cluster[0]].set_pw_reuse('0')
+
+
+    def get_pw_reuse_clusters(self):
+
+        """
+        Records that share a password, as of the last audit (See audit_security()),
+            records that have been removed since are left out
+
+        Returns: Indexes of records grouped by password, largest group first
+                 e.g [[2,7,9], [0,4]]
+        """
+
+        positions = {}
+
+        for i in range(len(self.__record_list)):
+            positions[self.__record_list[i].get_id()] = i
+
+        clusters = []
+
+        for cluster in self.__pw_reuse_clusters:
+
+            indexes = [positions[record_id] for record_id in cluster if record_id in positions]
+
+            if (len(indexes) > 1):
+                clusters.append(sorted(indexes))
+
+        clusters.sort(key=lambda x : -len(x))
+
+        return clusters
+
+
+    # [x] Tested
+    def audit_pw_complexity(self, pw=''):
+
+        """
+                             * Rates password complexity of the input password
+
+
+                                             Rating Metrics:
+
+                             4 character classes (upper, lower, symbols, digits)
+
+              u,w,a,g,e,s where u=unsuitable, w=weak, a=avg, g=good, e=excellent, s=superb
+
+
+                Unsuitable        Typically length is less than 8 characters
+
+
+                Weak              This is the recommendation from the 90's which
+                                  consists of minimum of 8 characters and mix of
+                                  character classes
+
+
+                Average           This is what is recommended by most password managers
+
+
+                Good              PW length in the range of 12-14, with a mix of 3 or more classes
+
+
+                Excellent         This ensures that there's a high probability
+                                  that your password will not be part of a wordlist
+                                  found in the wild
+
+
+                Superb            This makes bruteforce style attacks unfeasible
+                                  using modern gpu clusters. This is as close to having
+                                  full cracking immunity as you can get
+        """
+
+        ##                         pw_len, n chr classes, rating
+
+        pw_complexity_rating_l =   {( 8, 1) : 'u', ( 8, 2) : 'u', ( 8, 3) : 'u', ( 8, 4) : 'w', \
+                                    ( 9, 1) : 'u', ( 9, 2) : 'u', ( 9, 3) : 'u', ( 9, 4) : 'w', \
+                                    (10, 1) : 'u', (10, 2) : 'u', (10, 3) : 'u', (10, 4) : 'w', \
+                                    (11, 1) : 'u', (11, 2) : 'w', (11, 3) : 'w', (11, 4) : 'a', \
+                                    (12, 1) : 'w', (12, 2) : 'w', (12, 3) : 'a', (12, 4) : 'g', \
+                                    (13, 1) : 'w', (13, 2) : 'a', (13, 3) : 'a', (13, 4) : 'g', \
+                                    (14, 1) : 'w', (14, 2) : 'a', (14, 3) : 'g', (14, 4) : 'g', \
+                                    (15, 1) : 'a', (15, 2) : 'g', (15, 3) : 'g', (15, 4) : 'e', \
+                                    (16, 1) : 'a', (16, 2) : 'g', (16, 3) : 'g', (16, 4) : 'e', \
+                                    (17, 1) : 'g', (17, 2) : 'g', (17, 3) : 'g', (17, 4) : 'e', \
+                                    (18, 1) : 'g', (18, 2) : 'g', (18, 3) : 'e', (18, 4) : 'e', \
+                                    (19, 1) : 'g', (19, 2) : 'g', (19, 3) : 'e', (19, 4) : 'e', \
+                                    (20, 1) : 'g', (20, 2) : 'g', (20, 3) : 'e', (20, 4) : 'e', \
+                                    (21, 1) : 'g', (21, 2) : 'e', (21, 3) : 'e', (21, 4) : 's', \
+                                    (22, 1) : 'g', (22, 2) : 'e', (22, 3) : 'e', (22, 4) : 's', \
+                                    (23, 1) : 'g', (23, 2) : 'e', (23, 3) : 'e', (23, 4) : 's', \
+                                    (24, 1) : 'e', (24, 2) : 'e', (24, 3) : 's', (24, 4) : 's', \
+                                    (25, 1) : 'e', (25, 2) : 'e', (25, 3) : 's', (25, 4) : 's', \
+                                    (26, 1) : 'e', (26, 2) : 'e', (26, 3) : 's', (26, 4) : 's', \
+                                    (27, 1) : 'e', (27, 2) : 's', (27, 3) : 's', (27, 4) : 's', \
+                                    (28, 1) : 'e', (28, 2) : 's', (28, 3) : 's', (28, 4) : 's', \
+                                    (29, 1) : 'e', (29, 2) : 's', (29, 3) : 's', (29, 4) : 's', \
+                                    (30, 1) : 's', (30, 2) : 's', (30, 3) : 's', (30, 4) : 's'}
+
+
+        pw_len = len(pw)
+
+        n_chr_classes = self.check_num_char_classes(pw)
+
+
+        if (pw_len < 8):
+
+            return 'u'
+
+        elif (pw_len > 30):
+
+            return 's'
+
+        else:
+
+            return pw_complexity_rating_l.get((pw_len, n_chr_classes))            
+
+
+    def check_num_char_classes(self, pw=''):
+
+        """
+        Returns the number of character classes that are present in a password  
+
+        """
+
+        _pw = list(pw)
+
+        count_l = 0
+        count_s = 0
+        count_u = 0
+        count_n = 0
+
+        for i in range(len(_pw)):
+
+            if (_pw[i] in self.__lcase):
+                count_l += 1
+            elif (_pw[i] in self.__symbols):
+                count_s += 1
+            elif (_pw[i] in self.__ucase):
+                count_u += 1
+            elif (_pw[i] in self.__num):
+                count_n += 1
+
+        count_total = 0
+
+        if (count_l != 0):
+            count_total += 1
+
+        if (count_s != 0):
+            count_total += 1
+
+        if (count_u != 0):
+            count_total += 1
+
+        if (count_n != 0):
+            count_total += 1
+
+        return count_total
+
+
+
+    '''
+    ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
+    ┃   Database Miscellaneous                                           ┃
+    ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+    '''
+
+    def validate_index(self, index=None):
+
+        """
+        Validates whether index or a list of indexes represents
+         record indices in database
+
+        Args:    An int value or a list of integers 
+                             OR
+                 The list which will be used to validate indexes
+
+        Returns: Boolean value indicating whether index/indexes are valid
+
+        Exception: TypeError is raised if there's a data type mismatch
+
+        """
+
+        if (type(index) == int):
+            if (index >= 0 and (index < len(self.__record_list))):
+                return True
+            else:
+                return False
+
+        elif (type(index) == list):
+
+            for i in index:
+                if (not (i >= 0 or (i < len(self.__record_list)))):
+                    return False
+
+            return True
+
+        else:
+            raise TypeError('validate_index(): Needs to be of type int or list')
+
+
+    def get_number_of_records(self):
+
+        """
+        Returns the number of records in database
+        """
+        return len(self.__record_list)
+
+
+    def get_record_at_index_with_enc_pw(self, index):
+
+        """
+        Provides the record object at the specified index with enc pw
+
+        Args:    index (int)
+        Returns: (Record)
+
+        """
+
+        return self.__record_list[index]
+
+
+    def get_summary(self):
+
+        """
+        This is used by the frontend for the search bar.
+
+        Presents a summary of records in database for autocompletion 
+        when searching.
+
+        Uses:    get_summary() method in Class @Record()
+        Used by: search_bar_show() in @pwmgr
+
+        Args:    N/A
+
+        Returns: A list of strings matching record indexes in database
+        """
+
+        if (len(self.__record_list) == 0):
+            return []
+
+        l = []
+
+        for i in range(len(self.__record_list)):
+            l.append(self.__record_list[i].get_summary())
+
+        return l
+
+
+    def get_ids(self):
+
+        """
+        Returns: Ids of records, in the same order as get_summary() (list of int)
+        """
+
+        return [record.get_id() for record in self.__record_list]
+
+
+    def print_data(self):
+
+        print('Number of records: %d' %len(self.__record_list))
+
+        for i in range(len(self.__record_list)):
+            print(self.__record_list[i])
+
+
+    def add(self, item):
+
+        """
+        Adds a Record object, also supports a list of records
+        
+        Args:    A single Record or a list of Record
+        
+        Returns: N/A
+        """
+
+        if (type(item) == Record):
+
+            _item = item
+            _item.set_password(self.__encrypt_pw(item.get_password_encrypted()))
+
+            self.__assign_id(_item, new_id=True)
+            self.__insert_sorted(_item)
+            self.__journal_record('a', '', _item)
+            self.__search_index_add(_item)
+            self.__order_add(_item)
+
+        elif (type(item) == list):
+
+            for record in item:
+
+                _record = record
+                _record.set_password(self.__encrypt_pw(record.get_password_encrypted()))
+
+                self.__assign_id(_record, new_id=True)
+                self.__insert_sorted(_record)
+                self.__journal_record('a', '', _record)
+                self.__search_index_add(_record)
+                self.__order_add(_record)
+
+
+    def check_duplicate_entry(self, site):
+
+        """
+        Searches for duplicate entries & returns boolean value
+        indicating whether a duplicate entry exists or not.
+        An entry is considered duplicate if the site name along with
+        username / email match any existing record in database.
+
+        Args:    Record object
+
+        Returns: Boolean
+        """
+        result = self.search_website(site, partial_match=False)
+
+        if (len(result) != 0):
+            return True
+        else:
+            return False
+
+
+    def sort(self):
+
+        self.__sort_by_website()
+
+
+    def get_record_by_id(self, record_id=0):
+
+        """
+        Args:    Id of a record (See Record.get_id()), ids don't change 
+                 when records are added / removed / sorted
+
+        Returns: (Record) or None if it doesn't exist
+        """
+
+        return self.__record_map.get(record_id)
+
+
+    def get_index_of_id(self, record_id=0):
+
+        """
+        Args:    Id of a record
+
+        Returns: Current index of the record (int) or None if it doesn't exist
+        """
+
+        record = self.__record_map.get(record_id)
+
+        if (record == None):
+            return None
+
+        return self.__get_index_of_record(record)
+
+
+    def fetch_record(self, record_id=0):
+
+        """
+        Decrypts the segment of a record that was loaded from the summary 
+            (See load_database(summary_only=True)) & replaces it in place
+
+        Args:    Id of a record
+
+        Returns: (Record) with every field, or None if it doesn't exist
+
+        Exceptions:
+
+         1) IntegrityCheckFailedException  Segment doesn't match its digest / summary
+         2) DataCorruptedException         IO error occured while reading database
+        """
+
+        segment = self.__summary_segments.get(record_id)
+
+        if (segment == None):
+            return self.__record_map.get(record_id)
+
+        offset, length, digest, line_digest = segment
+
+        try:
+            with open(self.__segment_file, 'rb') as fh:
+                fh.seek(offset)
+                token = fh.read(length)
+        except (IOError, OSError):
+            raise DataCorruptedException("fetch_record(): IO error occured " + \
+                                         "while reading database (error#1)")
+
+        if (self.generate_hash(token) != digest):
+            raise IntegrityCheckFailedException('fetch_record(): Hash mismatch detected (error#2)')
+
+        try:
+            line   = decrypt_segment(self.__get_segment_cipher(), token, record_id)
+            record = decode_record(line)
+        except (InvalidTag, UnicodeDecodeError, UnsupportedFileFormatException):
+            raise IntegrityCheckFailedException('fetch_record(): Segment is corrupted (error#3)')
+
+        if (self.generate_hash(line) != line_digest):
+            raise IntegrityCheckFailedException('fetch_record(): Segment does not match summary (error#4)')
+
+        old_record = self.__record_map.get(record_id)
+        index      = self.__get_index_of_record(old_record)
+
+        self.__search_index_remove(old_record)
+        self.__order_remove(old_record)
+
+        self.__record_digests.pop(id(old_record), None)
+
+        record.set_id(record_id)
+
+        self.__record_list[index]          = record
+        self.__record_map[record_id]       = record
+        self.__record_digests[id(record)]  = line_digest
+
+        self.__search_index_add(record)
+        self.__order_add(record)
+
+        self.__summary_segments.pop(record_id)
+
+        return record
+
+
+    def is_partially_loaded(self):
+
+        """
+        Returns: True if records were loaded from the summary & some of them 
+                     haven't been fetched (See fetch_record())
+        """
+
+        return len(self.__summary_segments) > 0
+
+
+    def __assign_id(self, record=None, new_id=False):
+
+        """
+        Maps a record by its id, a new id is assigned if it doesn't have one 
+            (or if it's used by another record)
+
+        Args: 1) (Record)
+              2) Always assign a new id, e.g record that is added (bool)
+        """
+
+        record_id = record.get_id()
+
+        if (new_id or record_id <= 0 or \
+                self.__record_map.get(record_id, record) is not record):
+            record_id = self.__next_id
+            record.set_id(record_id)
+
+        self.__next_id = max(self.__next_id, record_id + 1)
+
+        self.__record_map[record_id] = record
+
+
+    def __get_sorted_position(self, website='', after_equal=True):
+
+        """
+        Binary search in __record_list (sorted by website)
+
+        Returns: Index where a record with website would be inserted, after 
+                     (or before) records that have the same website (int)
+        """
+
+        lo = 0
+        hi = len(self.__record_list)
+
+        while (lo < hi):
+
+            mid = (lo + hi) // 2
+            key = self.__record_list[mid].get_website()
+
+            if (key < website or (after_equal and key == website)):
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+
+    def __insert_sorted(self, record=None):
+
+        # Same position as appending & sort() (stable)
+        self.__record_list.insert(self.__get_sorted_position(record.get_website()), record)
+
+
+    def __get_index_of_record(self, record=None):
+
+        """
+        Returns: Index of a record that is in __record_list (int) 
+                     or None if it isn't found
+
+        * Frontend modifies records in place before calling update_index(),
+          so if website has changed since it was sorted, list is searched
+        """
+
+        i = self.__get_sorted_position(record.get_website(), after_equal=False)
+
+        while (i < len(self.__record_list) and \
+                self.__record_list[i].get_website() == record.get_website()):
+
+            if (self.__record_list[i] is record):
+                return i
+
+            i += 1
+
+        for i in range(len(self.__record_list)):
+            if (self.__record_list[i] is record):
+                return i
+
+        return None
+
+
+    def __get_order_key(self, name='', record=None):
+
+        """
+        Args:    1) 'last_modified' (most recent first) or 'security_rating' (ascending)
+                 2) (Record)
+
+        Returns: Key of the record in the order (int), records without 
+                     a security rating have a negative key
+        """
+
+        if (name == 'last_modified'):
+            return -record.get_last_modified_epoch()
+
+        try:
+            return int(record.get_security_rating())
+        except ValueError:
+            return -1
+
+
+    def __get_ordered_indexes(self, name=''):
+
+        """
+        Returns: Indexes of records in the order (See __get_order_key()), 
+                     along with their keys [(key, index), ..]
+        """
+
+        if (name not in self.__orders):
+
+            keys  = {}
+            order = []
+
+            for record in self.__record_list:
+                key = self.__get_order_key(name, record)
+                keys[record.get_id()] = key
+                order.append((key, record.get_id()))
+
+            order.sort()
+
+            self.__orders[name]     = order
+            self.__order_keys[name] = keys
+
+        positions = {}
+
+        for i in range(len(self.__record_list)):
+            positions[self.__record_list[i].get_id()] = i
+
+        return [(key, positions[record_id]) for key, record_id in self.__orders[name]]
+
+
+    def __order_add(self, record=None):
+
+        for name in self.__orders:
+            key = self.__get_order_key(name, record)
+            self.__order_keys[name][record.get_id()] = key
+            bisect.insort(self.__orders[name], (key, record.get_id()))
+
+
+    def __order_remove(self, record=None):
+
+        for name in self.__orders:
+
+            key = self.__order_keys[name].pop(record.get_id(), None)
+
+            if (key == None):
+                continue
+
+            order = self.__orders[name]
+            i     = bisect.bisect_left(order, (key, record.get_id()))
+
+            if (i < len(order) and order[i] == (key, record.get_id())):
+                order.pop(i)
+
+
+    def __order_reset(self, name=None):
+
+        """
+        Orders are built again on next use, used when records are loaded / audited
+        """
+
+        if (name == None):
+            self.__orders     = {}
+            self.__order_keys = {}
+        else:
+            self.__orders.pop(name, None)
+            self.__order_keys.pop(name, None)
+
+
+    def __sort_by_website(self):
+
+        self.__record_list.sort(key=lambda x : x.get_website())
+
+
+    def __sort_by_last_modified(self, custom_list=None):
+
+        """
+        Sorts records by most recent to least
+
+        Args:    Accepts a list of records for sorting. 
+                 If no parameters are passed, sorts the 
+                 inernal list of records
+
+        Returns: If optional parameter was passed returns
+                 the sorted list
+        """
+
+        if (custom_list == None or len(custom_list) == 0):
+            return []
+
+        if (custom_list is self.__record_list):
+            return [[self.__record_list[i], i] for key, i in \
+                        self.__get_ordered_indexes('last_modified')]
+
+        order = sorted(range(len(custom_list)), \
+                       key=lambda i : -custom_list[i].get_last_modified_epoch())
+
+        return [[custom_list[i], i] for i in order]
+
+
+    def get_records_last_modified(self):
+
+        """
+        Returns a list of records from database, sorted in 
+        the order of most recently modified 
+
+        Args:    N/A
+
+        Returns: A list of records sorted in the order of 
+                 most recently modified along with their
+                 appropriate index in the database
+                 e.g [[r1,2], [r2,3], [r3,7],..]
+
+        Note: This function is just used to sort & display internal
+              records in read only mode, we keep our default sorting 
+              (sort by website) & our database intact.
+        """
+
+        return self.__sort_by_last_modified(self.__record_list)
+
+
+    def remove_index(self, index):
+
+        """
+        Deletes a Record object based on index, also supports a list of indexes
+        
+        Args:    Index(es) to remove (int) or (list)
+        
+        Returns: N/A
+        """
+
+        if (type(index) == int):
+            self.__remove_record(index)
+        elif (type(index) == list):
+
+            # Records in the order of indexes (journal), duplicates are ignored
+            records   = []
+            positions = {}
+
+            for i in index:
+
+                record = self.__record_list[i]
+
+                if (id(record) not in positions):
+                    positions[id(record)] = i % len(self.__record_list)
+                    records.append(record)
+
+            # Popping from the highest index first, so that the other indexes don't shift
+            for i in sorted(positions.values(), reverse=True):
+                self.__record_list.pop(i)
+
+            for record in records:
+                self.__remove_record(None, record)
+
+
+    def __remove_record(self, index=None, record=None):
+
+        """
+        Removes a record by index, or keeps track of a record that was 
+            already removed from __record_list
+        """
+
+        if (index != None):
+            record = self.__record_list.pop(index)
+
+        self.__journal_record('r', self.__get_record_digest(record))
+        self.__record_digests.pop(id(record), None)
+        self.__search_index_remove(record)
+        self.__order_remove(record)
+
+        if (self.__record_map.get(record.get_id()) is record):
+            self.__record_map.pop(record.get_id())
 
 
     def update_index(self, record_object, index):
@@ -1713,9 +3712,7 @@ class ManageRecord():
         _pw = self.__encrypt_pw(record_object.get_password_encrypted())
         _record.set_password(_pw)
 
-        self.__record_list[index] = _record
-
-        self.sort()
+        self.__replace_record(index, _record)
                 
 
     def update_index_with_sec_mem(self, record_obj, index, sec_mem_handler):
@@ -1735,9 +3732,33 @@ class ManageRecord():
         _pw = self.__encrypt_pw(sec_mem_handler.get_str())
         _record.set_password(_pw)
 
-        self.__record_list[index] = _record
+        self.__replace_record(index, _record)
 
-        self.sort()
+
+    def __replace_record(self, index=0, record=None):
+
+        """
+        Replaces the record at index, the new record keeps the id of the 
+            old one & is moved to its sorted position
+        """
+
+        old_record = self.__record_list.pop(index)
+        old_digest = self.__get_record_digest(old_record)
+
+        self.__record_digests.pop(id(old_record), None)
+        self.__search_index_remove(old_record)
+        self.__order_remove(old_record)
+
+        if (self.__record_map.get(old_record.get_id()) is old_record):
+            self.__record_map.pop(old_record.get_id())
+
+        record.set_id(old_record.get_id())
+
+        self.__assign_id(record)
+        self.__insert_sorted(record)
+        self.__journal_record('u', old_digest, record)
+        self.__search_index_add(record)
+        self.__order_add(record)
 
 
     def search_website(self, website='', partial_match=True, called_by_search_all=False):
@@ -1762,10 +3783,7 @@ class ManageRecord():
         search_matches = []
 
         if (partial_match):
-            for i in range(0, _end_index):
-                if (website.lower() in \
-                        self.__record_list[i].get_website().lower()):
-                    search_matches.append(i) 
+            search_matches = self.__search_partial_match(website, [0])
         else:
             for i in range(0, _end_index):
                 if (self.__record_list[i].get_website() == website):
@@ -1796,10 +3814,7 @@ class ManageRecord():
         search_matches = []
 
         if (partial_match):
-            for i in range(len(self.__record_list)):
-                if (group_name.lower() in \
-                        self.__record_list[i].get_group().lower()): 
-                    search_matches.append(i)
+            search_matches = self.__search_partial_match(group_name, [3])
         else:
             for i in range(len(self.__record_list)):
                 if (self.__record_list[i].get_group().lower() \
@@ -1833,10 +3848,7 @@ class ManageRecord():
         search_matches = []
 
         if (partial_match):
-            for i in range(len(self.__record_list)):
-                if (username.lower() in \
-                        self.__record_list[i].get_username().lower()): 
-                    search_matches.append(i)
+            search_matches = self.__search_partial_match(username, [1])
         else:
             for i in range(len(self.__record_list)):
                 if (self.__record_list[i].get_username().lower() \
@@ -1869,11 +3881,8 @@ class ManageRecord():
 
         search_matches = []
 
-        if (partial_match):
-            for i in range(len(self.__record_list)):
-                if (email.lower() in 
-                        self.__record_list[i].get_email().lower()):
-                    search_matches.append(i)
+        if (partial_match):
+            search_matches = self.__search_partial_match(email, [2])
         else:
             for i in range(len(self.__record_list)):
                 if (self.__record_list[i].get_email().lower() \
@@ -1901,19 +3910,132 @@ class ManageRecord():
                  None is returned if the parameters are invalid.
         """
 
-        if (keyword == ''):
+        if (keyword == '' or len(self.__record_list) == 0):
             return []
 
-        r1 = self.search_website(keyword, partial_match=True, called_by_search_all=True)
-        r2 = self.search_username(keyword, partial_match=True, called_by_search_all= True)
-        r3 = self.search_email(keyword, partial_match=True, called_by_search_all=True)
-        r4 = self.search_group(keyword, partial_match=True, called_by_search_all=True)
+        # Indexes are already sorted & unique
+        return self.__search_partial_match(keyword, [0,1,2,3])
 
-        search_matches = list(set(r1 + r2 + r3 + r4))
 
-        search_matches.sort()
-        
-        return search_matches
+    def __search_partial_match(self, keyword='', field_l=[]):
+
+        """
+        Searches records that contain keyword (case insensitive) in any of the 
+            fields, using the trigram index
+
+        * Records that contain all trigrams of keyword are checked for the keyword,
+          keywords shorter than a trigram are checked against all records
+
+        Args:    1) Keyword (str)
+                 2) Fields to search (list) 
+                    0: website, 1: username, 2: email, 3: group
+
+        Returns: Indexes of records that matched, in ascending order (list)
+        """
+
+        if (self.__search_index == None):
+            self.__search_index_build()
+
+        keyword = keyword.lower()
+        grams   = get_trigrams(keyword)
+        matches = set()
+
+        for n in field_l:
+
+            candidates = None
+
+            if (len(grams) == 0):
+                candidates = self.__search_fields.keys()
+            else:
+                # Starting with the smallest posting list
+                postings = sorted([self.__search_index[n].get(g, set()) for g in grams], key=len)
+
+                candidates = postings[0]
+
+                for posting in postings[1:]:
+                    if (len(candidates) == 0):
+                        break
+                    candidates = candidates & posting
+
+            for key in candidates:
+                if (keyword in self.__search_fields[key][1][n]):
+                    matches.add(key)
+
+        if (len(matches) == 0):
+            return []
+
+        # Few matches are located by binary search, otherwise a single pass is cheaper
+        if (len(matches) * 32 < len(self.__record_list)):
+            return sorted([self.__get_index_of_record(self.__search_fields[key][0]) for key in matches])
+
+        return [i for i in range(len(self.__record_list)) if id(self.__record_list[i]) in matches]
+
+
+    def __search_index_build(self):
+
+        self.__search_index  = [{}, {}, {}, {}]
+        self.__search_fields = {}
+
+        for record in self.__record_list:
+            self.__search_index_add(record)
+
+
+    def __search_index_reset(self):
+
+        """
+        Index is built again by the next search, used when records are loaded
+        """
+
+        self.__search_index  = None
+        self.__search_fields = {}
+
+
+    def __search_index_add(self, record=None):
+
+        if (self.__search_index == None):
+            return
+
+        fields = (record.get_website().lower(), record.get_username().lower(), \
+                  record.get_email().lower(), record.get_group().lower())
+
+        # Fields are stored as they were indexed, as records can be modified 
+        # in place before update_index() is called
+        self.__search_fields[id(record)] = (record, fields)
+
+        for n in range(len(fields)):
+
+            index = self.__search_index[n]
+
+            for gram in get_trigrams(fields[n]):
+                if (gram in index):
+                    index[gram].add(id(record))
+                else:
+                    index[gram] = {id(record)}
+
+
+    def __search_index_remove(self, record=None):
+
+        if (self.__search_index == None):
+            return
+
+        entry = self.__search_fields.pop(id(record), None)
+
+        if (entry == None):
+            return
+
+        for n in range(len(entry[1])):
+
+            index = self.__search_index[n]
+
+            for gram in get_trigrams(entry[1][n]):
+
+                posting = index.get(gram)
+
+                if (posting != None):
+                    posting.discard(id(record))
+
+                    if (len(posting) == 0):
+                        index.pop(gram)
 
 
     '''
@@ -1951,212 +4073,539 @@ class ManageRecord():
                     'recovery_email,phone_number,pw_age,pw_reuse,pw_complexity,security_rating\n'
             csv_list.append(header)
 
-        for item in self.__record_list:
-            csv_list.append('%s\n' % item.format_csv())
+        for item in self.__record_list:
+            csv_list.append('%s\n' % item.format_csv())
+
+        return csv_list
+
+
+    def read_csv_in_memory(self, data=''):
+        
+        """
+        Parses a csv formatted string & loads all 
+            information into database
+
+        Args:    (str)
+        
+        Returns: True if the operation succeeds
+                 False if the operation fails
+        """
+
+        data_list = data.splitlines()
+
+        record_list = csv.reader(data_list, quotechar='"', delimiter=',', \
+                quoting=csv.QUOTE_ALL, skipinitialspace=True)
+
+        tmp = []
+
+        for item in record_list:
+            tmp.append(item)
+
+        return tmp
+
+
+    def convert_csvlist_to_record(self, csv_list=[], used_by_load_database=False, sort_records=True):
+
+        """
+        Converts all entries in csv formatted list
+        to a list of Record objects
+
+        Args:    1) A list of str list
+                 2) Boolean value whether this function is called
+                    by the database internally (skips certain operations)
+                 3) Whether records are sorted afterwards, records that 
+                    are imported in batches are sorted once at the end
+
+        Returns: True if operation succeeds or
+                  raises UnsupportedFileFormatException if it fails
+
+        Remarks: We intentionally do not check for duplicates
+                 as we assume that the user knows what they're doing.
+
+                 * Called by frontend when user is importing a new csv database
+
+        """
+
+        if (not used_by_load_database):
+            self.__journal_ok = False
+
+        if (len(csv_list) == 0):
+            return
+
+        self.__search_index_reset()
+        self.__order_reset()
+
+        # Records that are already in the list have ids
+        first_new = len(self.__record_list)
+
+        r_l = len(csv_list[0])
+
+        if (r_l not in [2,3,4,5,10,14]):
+            raise UnsupportedFileFormatException('[!] The database format is not supported')
+
+        # Passwords being imported are encrypted as a batch
+        pw_list = [record[1] for record in csv_list]
+
+        if (not used_by_load_database):
+            pw_list = self.encrypt_passwords(pw_list)
+
+
+        if (r_l == 2):
+
+            for n in range(len(csv_list)):
+
+                record = csv_list[n]
+                pw     = pw_list[n]
+
+                record_object = Record(record[0], pw)
+                self.__record_list.append(record_object)
+
+        elif (r_l == 3):
+
+            for n in range(len(csv_list)):
+
+                record = csv_list[n]
+                pw     = pw_list[n]
+
+                record_object = Record(record[0], pw)
+                record_object.set_username(record[2])
+                self.__record_list.append(record_object)
+
+        elif (r_l == 4):
+
+            for n in range(len(csv_list)):
+
+                record = csv_list[n]
+                pw     = pw_list[n]
+
+                record_object = Record(record[0], pw)
+                record_object.set_username(record[2])
+                record_object.set_email(record[3])
+                self.__record_list.append(record_object)
+
+        elif (r_l == 5):
+
+            for n in range(len(csv_list)):
+
+                record = csv_list[n]
+                pw     = pw_list[n]
+
+                record_object = Record(record[0], pw)
+                record_object.set_username(record[2])
+                record_object.set_email(record[3])
+                record_object.set_remark(record[4])
+                self.__record_list.append(record_object)
+
+        elif (r_l == 10):
+
+            for n in range(len(csv_list)):
+
+                record = csv_list[n]
+                pw     = pw_list[n]
+
+                record_object = Record(record[0], pw, record[2])
+                record_object.set_email(record[3])
+                record_object.set_username(record[4])
+                record_object.set_group(record[5])
+                record_object.set_remark(record[6])
+                record_object.set_two_factor(record[7])
+                record_object.set_recovery_email(record[8])
+                record_object.set_phone_number(record[9])
+                self.__record_list.append(record_object)
+
+        elif (r_l == 14):
+
+            for n in range(len(csv_list)):
+
+                record_object = convert_list_to_record(csv_list[n])
+                record_object.set_password(pw_list[n])
+
+                self.__record_list.append(record_object)
+
+
+        for i in range(first_new, len(self.__record_list)):
+            self.__assign_id(self.__record_list[i])
+
+        if (sort_records):
+            self.sort()
+
+        return True
+
+
+    def import_csv_rows(self, rows=None, progress_fn=None):
+
+        """
+        Imports rows of a csv file in batches (See IMPORT_BATCH_SIZE), so that
+            only a batch of rows is in memory at a time along with the records
+
+        * Passwords of a batch are encrypted together (See encrypt_passwords()),
+          records are sorted once after all rows are imported
+
+        Args:    1) Rows (iterable of str list, e.g csv.reader), the number of 
+                    columns of the first row decides the format (See 
+                    convert_csvlist_to_record())
+                 2) Function that is called after each batch with the number 
+                    of rows imported so far & seconds elapsed (optional)
+
+        Returns: 1) Number of rows imported (int)
+                 2) Number of rows that were skipped, as their number of columns 
+                    is different from the first row (int), blank lines aren't counted
+
+        Exceptions: UnsupportedFileFormatException if the format isn't supported
+        """
+
+        self.__journal_ok = False
+
+        start   = time.time()
+        count   = 0
+        skipped = 0
+        columns = None
+        batch   = []
+
+        try:
+            for row in rows:
+
+                if (columns == None):
+                    columns = len(row)
+
+                    if (columns not in [2,3,4,5,10,14]):
+                        raise UnsupportedFileFormatException('[!] The database format is not supported')
+
+                # Rows with a different layout are left out
+                if (len(row) != columns):
+
+                    if (len(row) > 0):
+                        skipped += 1
+
+                    continue
+
+                batch.append(row)
+
+                if (len(batch) == IMPORT_BATCH_SIZE):
+
+                    self.convert_csvlist_to_record(batch, sort_records=False)
+                    count += len(batch)
+                    batch  = []
+
+                    if (progress_fn != None):
+                        progress_fn(count, time.time() - start)
+
+            if (len(batch) > 0):
+                self.convert_csvlist_to_record(batch, sort_records=False)
+                count += len(batch)
+
+        finally:
+            self.sort()
+
+        if (progress_fn != None):
+            progress_fn(count, time.time() - start)
+
+        return (count, skipped)
+
+
+    def export_csv(self, filename='data.csv', fields=None):
+        
+        """
+        Writes all entries in database into the specified file in csv 
+            format, a batch of records at a time (See EXPORT_BATCH_SIZE)
+
+        * Passwords are decrypted in batches (See decrypt_passwords()) 
+          without modifying the records, the file is only readable by owner
+
+        Args:    1) The name of the file
+                 2) Names of the columns (list) in the order they are 
+                    written, all columns if None (See CSV_FIELDS)
+
+        Returns: True if the operation succeeds
+                 False if the operation fails
+
+        Exceptions: InvalidParameterException if a column doesn't exist
+        """
+
+        if (fields == None):
+            fields = CSV_FIELDS
+
+        for field in fields:
+            if (field not in CSV_FIELDS):
+                raise InvalidParameterException('export_csv(): Unknown column %s (error#1)' % field)
+
+        columns = [CSV_FIELDS.index(field) for field in fields]
+        pw_col  = CSV_FIELDS.index('pass')
+
+        try:
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+            # Mode of os.open() only applies to a new file
+            os.fchmod(fd, 0o600)
+
+            with open(fd, 'w', newline='', buffering=2**20) as f:
+
+                f.write('%s\n' % (','.join(fields)))
+
+                writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator='\n')
+
+                for start in range(0, len(self.__record_list), EXPORT_BATCH_SIZE):
+
+                    indexes = range(start, min(start + EXPORT_BATCH_SIZE, len(self.__record_list)))
+                    pw_list = []
+
+                    if (pw_col in columns):
+                        pw_list = self.decrypt_passwords(indexes)
+
+                    for n in range(len(indexes)):
+
+                        data = self.__record_list[indexes[n]].format_list()
+
+                        if (pw_col in columns):
+                            data[pw_col] = pw_list[n]
+
+                        writer.writerow([data[col] for col in columns])
+
+        except (IOError):
+            return False
+
+        return True
+
+
+'''
+┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
+┃   Key Derivation                                                   ┃
+┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+
+  Stored in every key slot of format '02' as kdf-id & 3 cost parameters:
+
+    (01) PBKDF2-SHA256     iterations | 0 | 0
+    (02) Scrypt            n (cpu/memory cost) | r (block size) | p (parallelization)
+
+  * Unlocking the database derives the master key of a key slot, which unwraps the random 
+    keys records are encrypted with, any slot can unwrap them. Legacy databases ('00' / '01')
+    derive 2 keys with PBKDF2 (1M iterations).
+'''
+
+KDF_PBKDF2         = '01'
+KDF_SCRYPT         = '02'
+
+KDF_NAMES          = {KDF_PBKDF2: 'pbkdf2', KDF_SCRYPT: 'scrypt'}
+KDF_DEFAULT_PARAMS = {KDF_PBKDF2: [1000000, 0, 0], KDF_SCRYPT: [2**17, 8, 1]}
+
+KDF_HEADER_LENGTH  = 32
+
+# Lower bounds for calibration, so that a fast target can't weaken the keys too much
+KDF_MIN_PARAMS     = {KDF_PBKDF2: [100000, 0, 0], KDF_SCRYPT: [2**14, 8, 1]}
+
+# 1 GiB with r = 8
+KDF_SCRYPT_MAX_N   = 2**20
+
+# Types of key slots, each slot wraps the same keys (See ManageRecord.add_key_slot())
+KEY_SLOT_PASSWORD  = 'p'
+KEY_SLOT_KEYFILE   = 'k'
+KEY_SLOT_RECOVERY  = 'r'
+
+KEY_SLOT_NAMES     = {KEY_SLOT_PASSWORD: 'password', KEY_SLOT_KEYFILE: 'password+keyfile', \
+                      KEY_SLOT_RECOVERY: 'recovery'}
+
+KEY_SLOTS_MAX      = 8
+
+# Segmented file format ('02'), see ManageRecord.write_encrypted_database()
+SEGMENT_TRAILER_LENGTH       = 96
+
+# Segments are nonce | ciphertext | tag (AES-GCM), see encrypt_segment()
+SEGMENT_NONCE_LENGTH         = 12
+
+# Id, digest of payload, site, username, email, group & last modified of a record (See encode_summary())
+SUMMARY_FIELDS               = 7
 
-        return csv_list
+# Journal is folded into the database once it has this many changes
+JOURNAL_MAX_OPS              = 64
 
+# Number of previous databases that are kept (See ManageRecord.__replace_database())
+BACKUP_GENERATIONS           = 3
 
-    def read_csv_in_memory(self, data=''):
-        
-        """
-        Parses a csv formatted string & loads all 
-            information into database
+# Changing rules of the audit (e.g pw complexity) invalidates cached audits
+AUDIT_RULES_VERSION          = '1'
 
-        Args:    (str)
-        
-        Returns: True if the operation succeeds
-                 False if the operation fails
-        """
+# Number of csv rows that are imported at a time (See ManageRecord.import_csv_rows())
+IMPORT_BATCH_SIZE            = 4096
 
-        data_list = data.splitlines()
+# Number of records that are exported at a time (See ManageRecord.export_csv())
+EXPORT_BATCH_SIZE            = 4096
 
-        record_list = csv.reader(data_list, quotechar='"', delimiter=',', \
-                quoting=csv.QUOTE_ALL, skipinitialspace=True)
+# Columns of an exported csv file, in the order of Record.format_list()
+CSV_FIELDS                   = ['site', 'pass', 'last_modified', 'email', 'username', 'group', 
+                                'remark', 'two_factor', 'recovery_email', 'phone_number', 
+                                'pw_age', 'pw_reuse', 'pw_complexity', 'security_rating']
 
-        tmp = []
+# Passwords are encrypted / decrypted in chunks of this size, by up to this many threads
+PW_BATCH_SIZE                = 256
+PW_BATCH_WORKERS             = min(8, os.cpu_count() or 1)
 
-        for item in record_list:
-            tmp.append(item)
+# Binary payload of a segment (See encode_record()), first byte is the version
+PAYLOAD_VERSION              = 1
 
-        return tmp
+# Fields of the payload are separated by NUL, NUL & the escape char in a field are escaped
+PAYLOAD_ESCAPE               = re.compile('\x01([01])')
 
 
-    def convert_csvlist_to_record(self, csv_list=[], used_by_load_database=False):
+def kdf_validate_params(kdf_id='', params=[]):
 
-        """
-        Converts all entries in csv formatted list
-        to a list of Record objects
+    """
+    Returns: Boolean value indicating whether the kdf & its parameters are supported
+    """
 
-        Args:    1) A list of str list
-                 2) Boolean value whether this function is called
-                    by the database internally (skips certain operations)
+    if (kdf_id not in KDF_NAMES or type(params) not in [list, tuple] or len(params) != 3):
+        return False
 
-        Returns: True if operation succeeds or
-                  raises UnsupportedFileFormatException if it fails
+    for p in params:
+        if (type(p) != int or p < 0 or p > 9999999999):
+            return False
 
-        Remarks: We intentionally do not check for duplicates
-                 as we assume that the user knows what they're doing.
+    if (kdf_id == KDF_PBKDF2):
+        return params[0] >= KDF_MIN_PARAMS[KDF_PBKDF2][0]
+    else:
+        n, r, p = params
+        # n needs to be a power of 2
+        return (n >= KDF_MIN_PARAMS[KDF_SCRYPT][0] and n <= KDF_SCRYPT_MAX_N and \
+                (n & (n - 1)) == 0 and r >= 1 and p >= 1)
 
-                 * Called by frontend when user is importing a new csv database
 
-        """
+def kdf_derive(kdf_id='', params=[], salt=b'', data=b''):
 
-        if (len(csv_list) == 0):
-            return
+    """
+    Derives a 32 byte key from data using the specified kdf & cost parameters
 
-        r_l = len(csv_list[0])
+    Returns: (bytes) the raw key, needs to be b64 encoded for use with Fernet
 
-        if (r_l not in [2,3,4,5,10,14]):
-            raise UnsupportedFileFormatException('[!] The database format is not supported')
+    Exceptions: InvalidParameterException if the kdf is not supported
+    """
 
+    if (kdf_id == KDF_PBKDF2):
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), \
+                length=32, salt=salt, iterations=params[0])
+    elif (kdf_id == KDF_SCRYPT):
+        kdf = Scrypt(salt=salt, length=32, n=params[0], r=params[1], p=params[2])
+    else:
+        raise InvalidParameterException('kdf_derive(): kdf id %s is not supported' % kdf_id)
 
-        if (r_l == 2):
+    return kdf.derive(data)
 
-            for record in csv_list:
 
-                pw = ''
+def kdf_format_header(kdf_id='', params=[]):
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    """
+    Returns: (bytes) kdf header as stored in a key slot of file format '02'
+    """
 
-                record_object = Record(record[0], pw)
-                self.__record_list.append(record_object)
+    return bytes('%s%010d%010d%010d' % (kdf_id, params[0], params[1], params[2]), 'utf-8')
 
-        elif (r_l == 3):
 
-            for record in csv_list:
+def kdf_parse_header(header=b''):
 
-                pw = ''
+    """
+    Returns: (kdf_id, [param-1, param-2, param-3])
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    Exceptions: UnsupportedFileFormatException if kdf header is not valid
+    """
 
-                record_object = Record(record[0], pw)
-                record_object.set_username(record[2])
-                self.__record_list.append(record_object)
+    output = decode_unicode_str_safely(header)
 
-        elif (r_l == 4):
+    if (not output[0] or len(output[1]) != KDF_HEADER_LENGTH or not output[1].isdigit()):
+        raise UnsupportedFileFormatException('kdf_parse_header(): kdf header is not valid')
 
-            for record in csv_list:
+    header = output[1]
 
-                pw = ''
+    kdf_id = header[:2]
+    params = [int(header[i:i+10]) for i in range(2, KDF_HEADER_LENGTH, 10)]
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    if (not kdf_validate_params(kdf_id, params)):
+        raise UnsupportedFileFormatException('kdf_parse_header(): kdf %s is not supported' % kdf_id)
 
-                record_object = Record(record[0], pw)
-                record_object.set_username(record[2])
-                record_object.set_email(record[3])
-                self.__record_list.append(record_object)
+    return (kdf_id, params)
 
-        elif (r_l == 5):
 
-            for record in csv_list:
+def kdf_read_from_file(filename=''):
 
-                pw = ''
+    """
+    Reads the kdf from the header of a database without decrypting it
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    Returns: (kdf_id, [param-1, param-2, param-3]), '00' / '01' files 
+                 return the PBKDF2 defaults they were always derived with
 
-                record_object = Record(record[0], pw)
-                record_object.set_username(record[2])
-                record_object.set_email(record[3])
-                record_object.set_remark(record[4])
-                self.__record_list.append(record_object)
+    Exceptions: UnsupportedFileFormatException if format is not recognized
+    """
 
-        elif (r_l == 10):
+    try:
+        with open(filename, 'rb') as fh:
+            header = fh.read(7)
 
-            for record in csv_list:
+            # '02' has kdf of every key slot, the first one is returned
+            if (header == b'PWMGR02'):
+                fh.seek(3, 1)
 
-                pw = ''
+            kdf_header = fh.read(KDF_HEADER_LENGTH)
+    except IOError:
+        raise UnsupportedFileFormatException('kdf_read_from_file(): unable to read %s' % filename)
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    if (header in [b'PWMGR00', b'PWMGR01']):
+        return (KDF_PBKDF2, list(KDF_DEFAULT_PARAMS[KDF_PBKDF2]))
+    elif (header == b'PWMGR02'):
+        return kdf_parse_header(kdf_header)
+    else:
+        raise UnsupportedFileFormatException('kdf_read_from_file(): Format is not recognized')
 
-                record_object = Record(record[0], pw, record[2])
-                record_object.set_email(record[3])
-                record_object.set_username(record[4])
-                record_object.set_group(record[5])
-                record_object.set_remark(record[6])
-                record_object.set_two_factor(record[7])
-                record_object.set_recovery_email(record[8])
-                record_object.set_phone_number(record[9])
-                self.__record_list.append(record_object)
 
-        elif (r_l == 14):
+def kdf_benchmark(kdf_id='', params=[]):
 
-            for record in csv_list:
+    """
+    Returns: (float) time in seconds it takes to unlock a database 
+                 (derivation of the master key) with the kdf on this machine
+    """
 
-                pw = ''
+    salt = os.urandom(32)
 
-                if (not used_by_load_database):
-                    pw = self.__encrypt_pw(record[1])
-                else:
-                    pw = record[1]
+    t = time.perf_counter()
 
-                record_object = Record(record[0], pw, record[2])
-                record_object.set_email(record[3])
-                record_object.set_username(record[4])
-                record_object.set_group(record[5])
-                record_object.set_remark(record[6])
-                record_object.set_two_factor(record[7])
-                record_object.set_recovery_email(record[8])
-                record_object.set_phone_number(record[9])
-                record_object.set_pw_age(record[10])
-                record_object.set_pw_reuse(record[11])
-                record_object.set_pw_complexity(record[12])
-                record_object.set_security_rating(record[13])
-                self.__record_list.append(record_object)
+    kdf_derive(kdf_id, params, salt, b'benchmark')
 
+    return time.perf_counter() - t
 
-        self.sort()
-        return True
 
+def kdf_calibrate(kdf_id='', target_time=1.0):
 
-    ## Optimize code
-    def export_csv(self, filename='data.csv'):
-        
-        """
-        Writes all entries in database into 
-        the specified file in csv format
+    """
+    Picks the cost parameters of a kdf, so that unlocking the database 
+        takes roughly target_time seconds on this machine
 
-        Args:    The name of the file
-        
-        Returns: True if the operation succeeds
-                 False if the operation fails
-        """
+        * PBKDF2: iterations are scaled linearly from a short run
+        * Scrypt: r & p are kept at default, n is the largest power of 2 
+                  that stays within the target (memory use is 128 * n * r bytes)
 
-        header = 'site,pass,last_modified,email,username,group,remark,two_factor,recovery_email,phone_number,pw_age,pw_reuse,pw_complexity,security_rating\n'
+    Returns: [param-1, param-2, param-3], never lower than KDF_MIN_PARAMS
+    """
 
-        try:
-            with open(filename, 'w') as f:
+    if (kdf_id not in KDF_NAMES):
+        raise InvalidParameterException('kdf_calibrate(): kdf id %s is not supported' % kdf_id)
+    elif (target_time <= 0):
+        raise InvalidParameterException('kdf_calibrate(): target time needs to be greater than 0')
 
-                f.write(header)
+    params = list(KDF_MIN_PARAMS[kdf_id])
 
-                for i in range(len(self.__record_list)):
+    t = kdf_benchmark(kdf_id, params)
 
-                    r = self.__record_list[i]
-                    r.set_password(self.get_pw_of_index(i))
+    if (kdf_id == KDF_PBKDF2):
 
-                    data = '%s\n' % (r.format_csv())
+        iterations = int(params[0] * (target_time / t))
 
-                    f.write(data)
+        # Rounding to thousands
+        params[0] = max(KDF_MIN_PARAMS[KDF_PBKDF2][0], (iterations // 1000) * 1000)
 
-        except (IOError):
-            return False
+    else:
 
-        return True
+        # Time of scrypt grows linearly with n
+        while (params[0] < KDF_SCRYPT_MAX_N and t * 2 <= target_time):
+            params[0] *= 2
+            t *= 2
+
+    return params
 
 
 '''
@@ -2293,6 +4742,272 @@ def get_libc_path():
     return (False, '')
 
 
+def map_in_chunks(fn=None, handler=None, items=[]):
+
+    """
+    Applies fn(handler, chunk) to chunks of items (See PW_BATCH_SIZE), chunks are 
+        spread over a pool of threads as the cryptography library releases the 
+        GIL while it is encrypting / decrypting
+
+    Returns: Results of all chunks (list) in the same order as items
+    """
+
+    if (len(items) == 0):
+        return []
+
+    workers = min(PW_BATCH_WORKERS, (len(items) + PW_BATCH_SIZE - 1) // PW_BATCH_SIZE)
+
+    # Not worth starting threads
+    if (workers <= 1):
+        return fn(handler, items)
+
+    chunks = [items[i:i+PW_BATCH_SIZE] for i in range(0, len(items), PW_BATCH_SIZE)]
+
+    result = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(fn, [handler] * len(chunks), chunks):
+            result.extend(chunk)
+
+    return result
+
+
+def fernet_decrypt_chunk(fernet_handler=None, tokens=[]):
+    return [fernet_handler.decrypt(token).decode('utf-8') for token in tokens]
+
+
+def fernet_encrypt_chunk(fernet_handler=None, pw_list=[]):
+    return [fernet_handler.encrypt(bytes(pw, 'utf-8')).decode() for pw in pw_list]
+
+
+def get_trigrams(text=''):
+
+    """
+    Returns: All substrings of length 3 in text (set), 
+                 empty if text is shorter than 3 characters
+    """
+
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+def generation_path(filename='', generation=1):
+
+    """
+    Returns path of a previous generation of database (backup)
+    """
+
+    return '%s.%d' % (filename, generation)
+
+
+def audit_path(filename=''):
+
+    """
+    Returns path of the audit cache that belongs to a database
+    """
+
+    return '%s.audit' % filename
+
+
+def journal_path(filename=''):
+
+    """
+    Returns path of the journal that belongs to a database
+    """
+
+    return '%s.journal' % filename
+
+
+def convert_list_to_record(l=[]):
+
+    """
+    Builds a Record object from a list of 14 str fields
+        (the order is the same as Record.format_list())
+
+    Args:    (list)
+
+    Returns: (Record)
+    """
+
+    if (len(l) != 14):
+        raise UnsupportedFileFormatException('convert_list_to_record(): 14 fields are required')
+
+    record_object = Record(l[0], l[1], l[2])
+    record_object.set_email(l[3])
+    record_object.set_username(l[4])
+    record_object.set_group(l[5])
+    record_object.set_remark(l[6])
+    record_object.set_two_factor(l[7])
+    record_object.set_recovery_email(l[8])
+    record_object.set_phone_number(l[9])
+    record_object.set_pw_age(l[10])
+    record_object.set_pw_reuse(l[11])
+    record_object.set_pw_complexity(l[12])
+    record_object.set_security_rating(l[13])
+
+    return record_object
+
+
+def encode_record(record=None):
+
+    """
+    Encodes fields of a record into the binary payload of a segment
+
+    Payload: version (1) | utf-8 str of fields separated by NUL
+
+        * Fields are in the order of Record.format_list(), NUL / '\\x01' in a 
+          field are escaped as '\\x01' '0' / '\\x01' '1' (See PAYLOAD_ESCAPE)
+
+        * Fields that are added later go after the existing ones, payloads with
+          less fields are padded with empty fields & extra ones are ignored
+
+    * Decoding is a single split, nothing needs to be quoted & parsed char 
+      by char like csv, & only one byte is needed to separate fields
+
+    Args:    (Record)
+
+    Returns: (bytes)
+    """
+
+    return bytes((PAYLOAD_VERSION,)) + bytes(join_fields(record.format_list()), 'utf-8')
+
+
+def decode_record(data=b''):
+
+    """
+    Builds a Record object from the binary payload of a segment (See encode_record())
+
+    Args:    (bytes)
+
+    Returns: (Record)
+
+    Exceptions: 
+
+     1) UnsupportedFileFormatException  Payload version isn't supported
+     2) UnicodeDecodeError              Fields aren't valid utf-8
+    """
+
+    if (len(data) == 0 or data[0] != PAYLOAD_VERSION):
+        raise UnsupportedFileFormatException('decode_record(): Payload version is not supported')
+
+    fields = split_fields(str(memoryview(data)[1:], 'utf-8'))
+
+    if (len(fields) < 14):
+        fields += [''] * (14 - len(fields))
+
+    return convert_list_to_record(fields[:14])
+
+
+def join_fields(fields=[]):
+
+    """
+    Returns: (str) fields separated by NUL, control chars are escaped 
+                 ('\\x01' -> '\\x01' '1', NUL -> '\\x01' '0'), see encode_record()
+    """
+
+    data = '\x00'.join(fields)
+
+    # Control chars are hardly ever part of a field, so they're only escaped when needed
+    if (data.count('\x00') != len(fields) - 1 or '\x01' in data):
+        data = '\x00'.join([field.replace('\x01', '\x01' '1').replace('\x00', '\x01' '0') \
+                                for field in fields])
+
+    return data
+
+
+def split_fields(text=''):
+
+    """
+    Returns: (list) fields that were joined by join_fields()
+    """
+
+    fields = text.split('\x00')
+
+    if ('\x01' in text):
+        fields = [PAYLOAD_ESCAPE.sub(lambda m : '\x00' if (m.group(1) == '0') else '\x01', field) \
+                    for field in fields]
+
+    return fields
+
+
+def encode_summary(entries=[]):
+
+    """
+    Builds the summary section of format '02' (See ManageRecord.write_encrypted_database())
+
+    * Fields of every record that are needed to search / list records, so 
+      that the database can be opened without decrypting every segment
+
+    Args:    [[id, digest of payload, site, username, email, group, last modified], ..]
+
+    Returns: (bytes) payload version (1) | fields separated by NUL
+    """
+
+    return bytes((PAYLOAD_VERSION,)) + \
+           bytes(join_fields([field for entry in entries for field in entry]), 'utf-8')
+
+
+def decode_summary(data=b''):
+
+    """
+    Returns: [[id, digest of payload, site, username, email, group, last modified], ..] (See encode_summary())
+
+    Exceptions: 
+
+     1) UnsupportedFileFormatException  Payload version isn't supported / it's incomplete
+     2) UnicodeDecodeError              Fields aren't valid utf-8
+    """
+
+    if (len(data) == 0 or data[0] != PAYLOAD_VERSION):
+        raise UnsupportedFileFormatException('decode_summary(): Payload version is not supported')
+
+    if (len(data) == 1):
+        return []
+
+    fields = split_fields(str(memoryview(data)[1:], 'utf-8'))
+
+    if (len(fields) % SUMMARY_FIELDS != 0):
+        raise UnsupportedFileFormatException('decode_summary(): Summary is incomplete')
+
+    return [fields[i:i+SUMMARY_FIELDS] for i in range(0, len(fields), SUMMARY_FIELDS)]
+
+
+def encrypt_segment(cipher=None, data=b'', record_id=0):
+
+    """
+    Encrypts the payload of a record as a segment of format '02'
+
+    * Raw bytes, unlike a fernet token there's no base64 / padding / timestamp
+
+    * Id of the record is associated data, so a segment can't be moved to 
+      another record in the footer without failing to decrypt
+
+    Args:    1) AESGCM handle
+             2) Payload (See encode_record())
+             3) Id of the record
+
+    Returns: (bytes) nonce (12) | ciphertext | tag (16)
+    """
+
+    nonce = os.urandom(SEGMENT_NONCE_LENGTH)
+
+    return nonce + cipher.encrypt(nonce, data, b'%d' % record_id)
+
+
+def decrypt_segment(cipher=None, token=b'', record_id=0):
+
+    """
+    Returns: (bytes) payload of a segment (See encrypt_segment())
+
+    Exceptions: InvalidTag if the segment / id doesn't match
+    """
+
+    if (len(token) <= SEGMENT_NONCE_LENGTH):
+        raise InvalidTag()
+
+    return cipher.decrypt(token[:SEGMENT_NONCE_LENGTH], token[SEGMENT_NONCE_LENGTH:], \
+                          b'%d' % record_id)
+
+
 def keyfile_load(fp=''):
 
     if (not os.path.isfile(fp)):
@@ -2314,6 +5029,20 @@ def keyfile_load(fp=''):
         return (True, ''.join([data.strip() for data in data_l]))
 
 
+def generate_recovery_key():
+
+    """
+    Returns: (str) random recovery key for a key slot, 160 bits in groups of 4 
+                 base32 characters (e.g 'ABCD-EFGH-...'), see ManageRecord.add_key_slot()
+
+    * It's entered in place of the master password when the database is unlocked
+    """
+
+    key = base64.b32encode(os.urandom(20)).decode('utf-8')
+
+    return '-'.join([key[i:i+4] for i in range(0, len(key), 4)])
+
+
 '''
 ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
 ┃ Security Related Functions for PWMGR >= 2.3                        ┃
@@ -2600,4 +5329,8 @@ class SecureClipboardCopyFailedException(Exception):
     def __init__(self, msg='Unable to copy data using secure method'):
         super(SecureClipboardCopyFailedException, self).__init__(msg)
 
+class PartiallyLoadedException(Exception):
+    def __init__(self, msg='Database was loaded from summary, records need to be fetched first'):
+        super(PartiallyLoadedException, self).__init__(msg)
+
 
@@ -4,16 +4,25 @@ from        getch import getch
 from        hashlib import sha256
 from        getpass import getpass
 from        database_pwmgr import ManageRecord,\
-                 Record, AllocateSecureMemory
+                 Record, AllocateSecureMemory, convert_list_to_record, journal_path,\
+                 generation_path
+from        database_pwmgr import KDF_PBKDF2, KDF_SCRYPT, KDF_NAMES,\
+                 KDF_DEFAULT_PARAMS, kdf_benchmark, kdf_calibrate, kdf_read_from_file,\
+                 CSV_FIELDS
+from        database_pwmgr import KEY_SLOT_PASSWORD, KEY_SLOT_KEYFILE, KEY_SLOT_RECOVERY,\
+                 KEY_SLOT_NAMES, generate_recovery_key
 import    csv, math, os
+import    itertools
 import    subprocess
+import    socket, struct, json
 import    random
 import    base64  
 import    sys
 from  database_pwmgr import \
      SecureClipboardCopyFailedException,InvalidParameterException,\
    IncorrectPasswordException,IntegrityCheckFailedException,IncorrectKeyException,\
- UnsupportedFileFormatException,NoKeyFoundException,DataCorruptedException
+ UnsupportedFileFormatException,NoKeyFoundException,DataCorruptedException,\
+ KeyFileInvalidException,PartiallyLoadedException
 
 
 global __app, __author, __updated__, __current_revision__
@@ -27,12 +36,14 @@ __current_revision__ = '3.0.1'
 #$$$$━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━$
 global term_len_h,term_len_v,config_file,db_file_path,\
   config,term_bar_color,app_name,file_name,db_handler, \
- theme_number,theme,field_color_fg,password_in_keyring#/
+ theme_number,theme,field_color_fg,password_in_keyring,\
+ key_2_name#/
 #━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━/
 #////////////////////////
 theme='';theme_number=1 
 file_name= 'db.enc'
 app_name = 'pwmgr'
+key_2_name= 'pwmgr_key_2'
 db_handler= True
 config = {}
 config_file=''
@@ -57,6 +68,11 @@ number
 term_len_v = 30;
 term_len_h = 70;
 password_in_keyring = False
+agent_db_mtime = (0, 0)
+db_stream = None
+
+# Seconds the agent waits for a request on a connection (See AgentClient.request())
+AGENT_REQUEST_TIMEOUT = 10
 
 
 '''
@@ -66,35 +82,36 @@ password_in_keyring = False
 
                     Core
 
-      Argument Parsing                137
-      Configuration                   641
-      Essential Functions            1101
+      Argument Parsing                121
+      Configuration                   721
+      Essential Functions            1183
 
 
                   Security
 
-      Clipboard Functions            1771
-      Secure Printing Functions      1871
-      Advanced Printing Functions    2570
-      Keyfile & Keyring Functions    2845
+      Clipboard Functions            1960
+      Secure Printing Functions      2043
+      Advanced Printing Functions    2722
+      Keyfile & Keyring Functions    3019
 
 
                 Uncategorized
 
-      Utility Functions              3385
-      Search Bar                     3605
-      Database RW                    3761
+      Utility Functions              3815
+      Search Bar                     4028
+      Database RW                    4204
+      Agent Functions                4779
 
 
                      IO
 
-      File IO Functions              4047
-      Import / Export Functions      4185
-      Gui Functions                  4414
-      Help Text                      4501
-      Terminal & Printing Functions  4755
-      User Input & Related           5061
-      Password Generator Functions   5591
+      File IO Functions              5397
+      Import / Export Functions      5533
+      Gui Functions                  5771
+      Help Text                      5839
+      Terminal & Printing Functions  6194
+      User Input & Related           6511
+      Password Generator Functions   6832
 
 '''
 
@@ -146,7 +163,7 @@ def parse_args():
 
             if (sys.argv[1] == 'add'):
 
-                check_database()
+                check_database(use_agent=True)
                 add()
                 sys.exit(0)
 
@@ -163,9 +180,8 @@ def parse_args():
 
             elif (sys.argv[1] == 'show'):
 
-                check_database()
-                exit_if_database_is_empty()
-                show_summary()
+                check_database(use_agent=True, stream=True)
+                show_summary_stream()
                 sys.exit(0)
 
             elif (sys.argv[1] == 'show+'):
@@ -174,13 +190,13 @@ def parse_args():
                     print(text_error('Dmenu package was not found. Please install it & try again!'))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True, summary=True)
                 exit_if_database_is_empty()
                 search_bar_show()
 
             elif (sys.argv[1] == 'show-latest'):
 
-                check_database()
+                check_database(use_agent=True, summary=True)
                 exit_if_database_is_empty()
                 show_last_modified()
                 sys.exit(0)
@@ -191,7 +207,7 @@ def parse_args():
                     print(text_error('Dmenu package & xclip needs to be installed.'))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True, summary=True)
                 exit_if_database_is_empty()
                 search_bar_copy()
                 sys.exit(0)
@@ -208,11 +224,21 @@ def parse_args():
                 pw_reset()
                 sys.exit(0)
 
+            elif (sys.argv[1] == 'kdf-bench'):
+
+                kdf_bench()
+                sys.exit(0)
+
             elif (sys.argv[1] == 'keyring-clear'):
 
                 keyring_reset()
                 sys.exit(0)
 
+            elif (sys.argv[1] == 'agent'):
+
+                run_agent()
+                sys.exit(0)
+
             elif (sys.argv[1] == 'generator'):
 
                 menu_generate_password_standalone()
@@ -267,6 +293,12 @@ def parse_args():
                 remove_keyfile()
                 sys.exit(0)
 
+            elif (sys.argv[1] == 'slot-list'):
+
+                check_database()
+                list_key_slots()
+                sys.exit(0)
+
             elif (sys.argv[1] == 'help' or sys.argv[1] == '--help' or sys.argv[1] == '-h'):
 
                 if (sys.argv[1] == '-h' or sys.argv[1] == '--help'):
@@ -299,7 +331,7 @@ def parse_args():
                     index_list = result[1]
                     new_list = [i-1 for i in index_list]
 
-                    check_database()
+                    check_database(use_agent=True)
                     exit_if_database_is_empty()
                     
                     result = db_handler.validate_index(new_list)
@@ -313,7 +345,7 @@ def parse_args():
 
                 elif (type(result[1]) == int):
 
-                    check_database()
+                    check_database(use_agent=True)
                     exit_if_database_is_empty()
 
                     if (db_handler.validate_index((result[1]-1))):
@@ -342,7 +374,7 @@ def parse_args():
                     print(text_error("Requires an integer value"))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True)
                 exit_if_database_is_empty()
 
                 if (db_handler.validate_index((index-1))):
@@ -354,7 +386,7 @@ def parse_args():
 
             elif (sys.argv[1] == 'search'):
 
-                check_database()
+                check_database(use_agent=True, summary=True)
                 exit_if_database_is_empty()
                 keyword = (sys.argv[2]).strip()
                 search(keyword)
@@ -376,7 +408,7 @@ def parse_args():
                     print(text_error('xclip utility was not found. Please install it & try again!'))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True)
                 exit_if_database_is_empty()
 
                 if (db_handler.validate_index((index-1))):
@@ -398,7 +430,7 @@ def parse_args():
                     print(text_error("Requires an integer value"))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True)
                 exit_if_database_is_empty()
 
                 if (type(index) == int):
@@ -452,6 +484,43 @@ def parse_args():
                 print_block(1)
                 sys.exit(0)
 
+            elif (sys.argv[1] == 'slot-add'):
+
+                if (sys.argv[2] == 'password'):
+                    check_database()
+                    add_key_slot(KEY_SLOT_PASSWORD)
+                    sys.exit(0)
+                elif (sys.argv[2] == 'recovery'):
+                    check_database()
+                    add_key_slot(KEY_SLOT_RECOVERY)
+                    sys.exit(0)
+                elif (sys.argv[2] == 'keyfile'):
+
+                    fn = '/home/%s/.config/pwmgr/keyfile' % (os.getlogin())
+
+                    if (not check_files([fn])):
+                        print(text_error("No keyfile found in %s, see 'keyfile-create'" % fn))
+                        sys.exit(1)
+
+                    check_database()
+                    add_key_slot(KEY_SLOT_KEYFILE, fn)
+                    sys.exit(0)
+                else:
+                    print(text_error("Type of key slot can be password, keyfile or recovery"))
+                    sys.exit(1)
+
+            elif (sys.argv[1] == 'slot-remove'):
+
+                result = convert_str_to_int(sys.argv[2])
+
+                if (result[0] == False or type(result[1]) != int):
+                    print(text_error("Requires an integer value"))
+                    sys.exit(1)
+
+                check_database()
+                remove_key_slot(result[1])
+                sys.exit(0)
+
             elif (sys.argv[1] == 'import-csv'):
 
                 fn = sys.argv[2].strip()
@@ -476,6 +545,22 @@ def parse_args():
                     print(text_error("Requires a file name"))
                     sys.exit(1)
 
+            elif (sys.argv[1] == 'kdf-calibrate'):
+
+                set_kdf_calibrated(sys.argv[2].strip())
+                sys.exit(0)
+
+            elif (sys.argv[1] == 'restore-generation'):
+
+                result = convert_str_to_int(sys.argv[2])
+
+                if (result[0] == False or type(result[1]) != int or result[1] < 1):
+                    print(text_error("Requires a generation number (1 is the most recent)"))
+                    sys.exit(1)
+
+                restore_generation(result[1])
+                sys.exit(0)
+
             elif (sys.argv[1] == 'search-font'):
 
                 keyword = sys.argv[2].strip()
@@ -501,7 +586,7 @@ def parse_args():
                     print(text_error("The selected option doesn't exist"))
                     sys.exit(1)
 
-                check_database()
+                check_database(use_agent=True, summary=True)
                 exit_if_database_is_empty()
 
                 keyword = (sys.argv[3]).strip()
@@ -522,6 +607,26 @@ def parse_args():
                     search(keyword)
                     sys.exit(0)
 
+            elif (sys.argv[1] == 'kdf-calibrate'):
+
+                set_kdf_calibrated(sys.argv[2].strip(), sys.argv[3].strip())
+                sys.exit(0)
+
+            elif (sys.argv[1] == 'slot-add' and sys.argv[2] == 'keyfile'):
+
+                fn = sys.argv[3].strip()
+
+                if (fn == ''):
+                    print(text_error('Keyfile name cannot be empty'))
+                    sys.exit(1)
+                elif (not os.path.isfile(fn)):
+                    print(text_error('Specified keyfile not found'))
+                    sys.exit(1)
+
+                check_database()
+                add_key_slot(KEY_SLOT_KEYFILE, fn)
+                sys.exit(0)
+
             else:
                 print(text_error("The selected option doesn't exist"))
                 sys.exit(1)
@@ -529,7 +634,29 @@ def parse_args():
 
         elif (argument_length == 5):
 
-            if (sys.argv[1] == 'select-cols-csv'):
+            if (sys.argv[1] == 'export-csv' and sys.argv[3] == '--fields'):
+
+                fn     = sys.argv[2].strip()
+                fields = [field.strip() for field in sys.argv[4].split(',') if field.strip() != '']
+
+                if (fn == ''):
+                    print(text_error("Requires a file name"))
+                    sys.exit(1)
+
+                if (len(fields) == 0):
+                    print(text_error("Requires at least one field"))
+                    sys.exit(1)
+
+                for field in fields:
+                    if (field not in CSV_FIELDS):
+                        print(text_error("Unknown field '%s', available fields: %s" % (field, ','.join(CSV_FIELDS))))
+                        sys.exit(1)
+
+                check_database()
+                export_to_csv(fn, fields)
+                sys.exit(0)
+
+            elif (sys.argv[1] == 'select-cols-csv'):
 
                 order_of_rows = []
 
@@ -640,9 +767,11 @@ def validate_config():
     kw = config.get('keyring_wipe_interval')
     th = config.get('theme')
     kf = config.get('keyfile_path')
+    bg = config.get('backup_generations')
 
     default_cw = 10
     default_kw = 600
+    default_bg = 3
 
     if (not fn):
         set_default_font()
@@ -685,6 +814,10 @@ def validate_config():
     if (not kf):
         config.update({'keyfile_path':''})
 
+    # Number of previous databases that are kept (db.enc.1 ... db.enc.N), 0 disables it
+    if (type(bg) != int or not (bg >= 0 and bg <= 20)):
+        config.update({'backup_generations':default_bg})
+
 
 def load_config(filename=''):
 
@@ -1115,7 +1248,7 @@ def add():
         print_block(1)
         r.set_two_factor(prompt_yes_no_instant("Two Factor enabled? (y/N):  ", \
                                                 False))
-        db_handler.add(r)
+        db_handler_call('add', r)
         db_handler.write_encrypted_database(db_file_path)
 
         clear_screen()
@@ -1124,7 +1257,7 @@ def add():
         ## We could have removed redundant logic but this way ensures we don't
         ## have menu bars displayed right beneath pw generation menu
 
-        db_handler.add(r)
+        db_handler_call('add', r)
         db_handler.write_encrypted_database(db_file_path)
 
         clear_screen()
@@ -1175,6 +1308,50 @@ def show_summary(input_list=None):
     print_block(1)
 
 
+def show_summary_stream():
+
+    """
+    Same as show_summary(), but records are printed as they're loaded 
+        from database (See check_database(stream=True))
+
+    """
+
+    global db_handler, db_stream
+
+    # Database was loaded by agent / is empty
+    if (db_stream == None):
+        exit_if_database_is_empty()
+        show_summary()
+        return
+
+    new_header = [['Site', 4], ['   Email',4], ['      Username',2], ['       Group', 2]]
+
+    print_block(1)
+    print(color_menu_column_header(new_header))
+    print_block(1)
+
+    i = 0
+
+    try:
+        for r in db_stream:
+            i = i + 1
+            data = [i, r.get_website(), r.get_email(), r.get_username(), r.get_group()]
+            print(format_data_with_spacing(data), flush=True)
+
+    # Segments after the key check are verified as they're loaded
+    except (IntegrityCheckFailedException, DataCorruptedException):
+        print_block(1)
+        print(text_error('Hash mismatch detected. Data could have been corrupted!'))
+        print_block(1)
+        sys.exit(1)
+
+    db_stream = None
+
+    print_block(1)
+    print(plain_menu_bars())
+    print_block(1)
+
+
 def show_last_modified():
 
     """
@@ -1334,7 +1511,7 @@ def delete_index(index=None):
         return
 
     elif (type(index) == int):
-        db_handler.remove_index(index)
+        db_handler_call('remove_index', index)
         db_handler.write_encrypted_database(db_file_path)
         clear_screen()
 
@@ -1347,7 +1524,7 @@ def delete_index(index=None):
         print_block(1)
 
         if (choice):
-            db_handler.remove_index(index) # This function is aware of lists 
+            db_handler_call('remove_index', index) # This function is aware of lists 
             db_handler.write_encrypted_database(db_file_path)
 
         clear_screen()
@@ -1384,11 +1561,19 @@ def process_security_data():
 
     global db_handler, db_file_path
 
-    db_handler.audit_security()
-    db_handler.write_encrypted_database(db_file_path)
+    # Database is only written if audit information has changed
+    if (db_handler.audit_security()):
+        db_handler.write_encrypted_database(db_file_path)
 
     sorted_indexes = db_handler.sort_security_rating()
 
+    # Number of records that share the password of a record
+    reuse_count = {}
+
+    for cluster in db_handler.get_pw_reuse_clusters():
+        for index in cluster:
+            reuse_count[index] = len(cluster)
+
     header = [['Site',4.2] , ['PW Age',3.4], ['PW Reuse',3], ['    PW Strength',2],  ['Security Rating',1.5]]
 
     data = []
@@ -1499,7 +1684,11 @@ def process_security_data():
             pw_reuse_info = ['Not Found', color_info]
         elif (pw_reuse == '1'):
             color_info = '%s' % (color_red)
-            pw_reuse_info = ['Found', color_info]
+
+            if (index in reuse_count):
+                pw_reuse_info = ['Found (%d)' % reuse_count[index], color_info]
+            else:
+                pw_reuse_info = ['Found', color_info]
 
         s_rating = r.get_security_rating()
         s_rating_info = ''
@@ -1660,7 +1849,7 @@ def copy_password(index=None):
 
     try:
 
-        pw = db_handler.get_pw_of_index(index)
+        pw = db_handler_call('get_pw_of_index', index)
 
         ## Almost impossible to escape single quote in bash
         ## therefore current solution is to write the pass to a file (@home dir)
@@ -1713,6 +1902,13 @@ def copy_password(index=None):
 
 def search(keyword=''):
 
+    """
+    Displays records that match keyword in site, username, email or group
+
+    * Only these fields are matched & displayed, so database can be loaded 
+      from its summary (See check_database(summary=True))
+    """
+
     global db_handler
 
     if (keyword == ''):
@@ -1730,6 +1926,11 @@ def search(keyword=''):
 
 def search_extended(keyword='', category=''):
 
+    """
+    Same as search(), but only matches keyword in one category
+        ('group', 'site', 'email' or 'username')
+    """
+
     global db_handler
 
     if (keyword == '' or category == ''):
@@ -1781,7 +1982,7 @@ def secure_copy_password(index=None):
 
     try:
 
-        sec_mem_handler = db_handler.get_pw_of_index_with_sec_mem(index)
+        sec_mem_handler = db_handler_call('get_pw_of_index_with_sec_mem', index)
         sec_mem_handler.copy_to_clipboard() # Auto wipes memory so no further action needed
         print()
         clear_clipboard()
@@ -1873,7 +2074,7 @@ def secure_edit_index(index=None):
     sec_mem_handler_new = None
 
     try:
-        sec_mem_handler = db_handler.get_pw_of_index_with_sec_mem(index)
+        sec_mem_handler = db_handler_call('get_pw_of_index_with_sec_mem', index)
 
     except IncorrectPasswordException:
         if (import_lib_wx()):
@@ -2009,11 +2210,11 @@ def secure_edit_index(index=None):
             r.set_pw_reuse('')
             r.set_security_rating('')
 
-            db_handler.update_index_with_sec_mem(r, index, sec_mem_handler_new)
+            db_handler_call('update_index_with_sec_mem', r, index, sec_mem_handler_new)
 
         else:
 
-            db_handler.update_index_with_sec_mem(r, index, sec_mem_handler)
+            db_handler_call('update_index_with_sec_mem', r, index, sec_mem_handler)
 
         db_handler.write_encrypted_database(db_file_path)
 
@@ -2042,7 +2243,7 @@ def display_row_with_sec_mem(field_list=[], data_list=[], index=None, header_wid
 
     try:
 
-        sec_mem_handler = db_handler.get_pw_of_index_with_sec_mem(index)
+        sec_mem_handler = db_handler_call('get_pw_of_index_with_sec_mem', index)
 
     except IncorrectPasswordException:
 
@@ -2274,7 +2475,7 @@ def display_row_static_with_sec_mem(field_list=[], data_list=[], index=None, hea
     color_rst = color_reset()
 
     try:
-        sec_mem_handler = db_handler.get_pw_of_index_with_sec_mem(index)
+        sec_mem_handler = db_handler_call('get_pw_of_index_with_sec_mem', index)
 
     except IncorrectPasswordException:
         if (import_lib_wx()):
@@ -3063,6 +3264,8 @@ def use_keyfile(keyfile_path=''):
     cursor_show()
     clear_screen()
 
+    keyring_set_key_2()
+
     if (keyring_set_scrambled(db_handler.get_key()) == False):
         print(text_error("use_keyfile(): Unable to store password in keyring"))
         print_block(1)
@@ -3167,20 +3370,155 @@ def remove_keyfile():
     cursor_show()
     clear_screen()
 
+    keyring_set_key_2()
+
     if (keyring_set_scrambled(db_handler.get_key()) == False):
         print(text_error("use_keyfile(): Unable to store password in keyring"))
         sys.exit(1)
 
 
-def keyring_get():
+def list_key_slots():
+
+    """
+    Lists the key slots of the database, any of them can unlock it
+    """
+
+    global db_handler
+
+    color_green = color_b('green')
+    c_rst = color_reset()
+
+    print_block(1)
+
+    in_use = db_handler.get_key_slot()
+
+    for i, (slot_type, kdf_id, params) in enumerate(db_handler.get_key_slots()):
+
+        msg = 'Slot %d: %s%s%s, %s' % (i+1, color_green, KEY_SLOT_NAMES[slot_type], c_rst, \
+                                        format_kdf(kdf_id, params))
+
+        if (i == in_use):
+            msg += ' [unlocked]'
+
+        print(text_debug(msg))
+
+    print_block(1)
+
+
+def add_key_slot(slot_type=KEY_SLOT_PASSWORD, keyfile_path=''):
+
+    """
+    Adds a key slot to the database, so it can also be unlocked with 
+        another password, password & keyfile or a recovery key
+
+    * Recovery key is generated & only shown once
+    """
+
+    global db_handler, db_file_path
+
+    cursor_hide()
+    clear_screen()
+    print_block(1)
+    print(info_bar_dynamic("Encryption management (slot-add) | (Ctrl+c) Quit without saving"))
+    print_block(4)
+
+    pw = ''
+
+    if (slot_type == KEY_SLOT_RECOVERY):
+        pw = generate_recovery_key()
+    else:
+        try:
+            pw = prompt_password_master(8)
+        except KeyboardInterrupt:
+            clear_screen()
+            sys.exit()
+
+    try:
+        index = db_handler.add_key_slot(slot_type, pw, keyfile_path)
+    except (FileNotFoundError, KeyFileInvalidException):
+        print(text_error("Key file not found / not valid"))
+        cursor_show()
+        sys.exit(1)
+    except (InvalidParameterException):
+        print(text_error("Database can not have more key slots, see 'slot-remove'"))
+        cursor_show()
+        sys.exit(1)
+
+    db_handler.write_encrypted_database(db_file_path)
+
+    # Keys are replaced if they were derived from password (See ManageRecord.add_key_slot())
+    keyring_set_key_2()
+
+    cursor_show()
+    clear_screen()
+    print_block(1)
+
+    msg = 'Key slot %d (%s) has been added' % (index+1, KEY_SLOT_NAMES[slot_type])
+    print(text_debug(msg))
+
+    if (slot_type == KEY_SLOT_RECOVERY):
+        print_block(1)
+        print(text_debug('Recovery key: %s%s%s' % (color_b('green'), pw, color_reset())))
+        print_block(1)
+        print(text_debug("It won't be shown again, it can be used in place of master password"))
+
+    print_block(1)
+
+
+def remove_key_slot(slot_number=0):
+
+    """
+    Removes a key slot of the database (slot number as listed by slot-list)
+    """
+
+    global db_handler, db_file_path
+
+    slots = db_handler.get_key_slots()
+
+    print_block(1)
+
+    if (slot_number < 1 or slot_number > len(slots)):
+        print(text_error("Key slot %d does not exist" % slot_number))
+        print_block(1)
+        sys.exit(1)
+    elif (slot_number - 1 == db_handler.get_key_slot()):
+        print(text_error("Key slot %d unlocked the database, it can't be removed" % slot_number))
+        print_block(1)
+        sys.exit(1)
+
+    slot_type, kdf_id, params = slots[slot_number - 1]
+
+    msg = 'Slot %d: %s%s%s, %s' % (slot_number, color_b('green'), KEY_SLOT_NAMES[slot_type], \
+                                    color_reset(), format_kdf(kdf_id, params))
+    print(text_debug(msg))
+    print_block(1)
+
+    if (not prompt_yes_no_instant("Do you want to remove this key slot? (y/N): ", False)):
+        print_block(1)
+        sys.exit(0)
+
+    db_handler.remove_key_slot(slot_number - 1)
+    db_handler.write_encrypted_database(db_file_path)
+
+    print_block(1)
+    print(text_debug('Key slot %d has been removed' % slot_number))
+    print_block(1)
+
+
+def keyring_get(key_name=''):
 
     """
     Returns the encryption key stored in keyring
+
+    Args: Name of the key in keyring, defaults to app_name
     """
 
     global app_name
 
-    key_id, stderr, _ = run_cmd('keyctl request user %s' % (app_name))
+    if (key_name == ''):
+        key_name = app_name
+
+    key_id, stderr, _ = run_cmd('keyctl request user %s' % (key_name))
 
     if (stderr):
         return False
@@ -3193,16 +3531,20 @@ def keyring_get():
     return key
 
 
-def keyring_set(value):
+def keyring_set(value, key_name=''):
 
     """
     Set the encryption key in keyring
 
+    Args: Name of the key in keyring, defaults to app_name
     """
 
     global app_name
 
-    _, stderr, _ = run_cmd('keyctl add user %s %s @u' % (app_name, value))
+    if (key_name == ''):
+        key_name = app_name
+
+    _, stderr, _ = run_cmd('keyctl add user %s %s @u' % (key_name, value))
 
     if (stderr):
         return False
@@ -3210,7 +3552,27 @@ def keyring_set(value):
     return True
 
 
-def keyring_set_scrambled(value):
+def keyring_temp_key_path(key_name=''):
+
+    """
+    Returns path of the file holding the temp key used for scrambling
+        the specified key in keyring (creates tmp directory if needed)
+    """
+
+    global app_name
+
+    fp = '/home/%s/.config/pwmgr/tmp' % os.getlogin()
+
+    if (not os.path.isdir(fp)):
+        os.makedirs(fp)
+
+    if (key_name == '' or key_name == app_name):
+        return '%s/temp_key.txt' % fp
+    else:
+        return '%s/temp_%s.txt' % (fp, key_name)
+
+
+def keyring_set_scrambled(value, key_name=''):
 
     output = key_scramble(value)
 
@@ -3222,12 +3584,7 @@ def keyring_set_scrambled(value):
         scrambled_key = output[1][0]
         temp_key      = output[1][1]
 
-        fp = '/home/%s/.config/pwmgr/tmp' % os.getlogin()
-
-        if (not os.path.isdir(fp)):
-            os.makedirs(fp)
-
-        temp_key_fp = '%s/temp_key.txt' % fp
+        temp_key_fp = keyring_temp_key_path(key_name)
 
         try:
             with open(temp_key_fp, 'w') as fh:
@@ -3235,7 +3592,7 @@ def keyring_set_scrambled(value):
         except IOError:
             return False
 
-        keyring_set(scrambled_key)
+        keyring_set(scrambled_key, key_name)
 
         return True
 
@@ -3282,21 +3639,16 @@ def key_scramble(value_str=''):
     return (True, (scrambled_key_b64, temp_key))
 
 
-def keyring_get_scrambled():
+def keyring_get_scrambled(key_name=''):
 
-    scrambled_key = keyring_get()
+    scrambled_key = keyring_get(key_name)
 
     if (not scrambled_key):
         return (False, '')
 
     temp_key = ''
 
-    fp = '/home/%s/.config/pwmgr/tmp' % os.getlogin()
-
-    if (not os.path.isdir(fp)):
-        os.makedirs(fp) 
-
-    temp_key_fp = '%s/temp_key.txt' % fp
+    temp_key_fp = keyring_temp_key_path(key_name)
 
     try:
         with open(temp_key_fp, 'r') as fh:
@@ -3360,10 +3712,16 @@ def keyring_reset():
 
     """
 
-    global app_name
+    global app_name, key_2_name
 
     stdout, _, _ = run_cmd('keyctl purge -s user %s' % app_name)
 
+    # Cached key 2 is useless without the key, but there's no reason to keep it
+    keyring_remove_key_2()
+
+    # A running agent holds the same key in memory, so it's locked as well
+    agent_request('lock')
+
     output = stdout.strip().split(' ')[1]
 
     if (int(output) == 0):
@@ -3374,13 +3732,16 @@ def keyring_reset():
         print_block(1)
 
 
-def keyring_set_expiration():
+def keyring_set_expiration(key_name=''):
 
     global config, app_name
 
+    if (key_name == ''):
+        key_name = app_name
+
     t = config.get('keyring_wipe_interval')
 
-    stdout,stderr,_ = run_cmd('keyctl request user %s' % (app_name))
+    stdout,stderr,_ = run_cmd('keyctl request user %s' % (key_name))
 
     if (stderr):
         return False
@@ -3395,26 +3756,80 @@ def keyring_set_expiration():
     return True
 
 
-'''
-┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
-┃   Utility Functions                                                ┃
-┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
-'''
+def keyring_set_key_2():
 
-def module_imported(module_name=''):
-    # need to import sys module
+    """
+    Caches key 2 of the loaded database in keyring (with the same expiration
+        as the key), so that loading the database with the key from keyring
+        doesn't have to derive it again
 
-    if (module_name in sys.modules):
-        return True
-    else:
-        return False
+    * Stored as 'salt_id:key_2', the salt id ties it to the salts in the file
 
+    * Only databases with legacy keys (format '00' / '01') derive key 2, 
+      key 2 of format '02' is random & unwrapped with the key, so it isn't
+      stored & an entry that was cached before the database was converted 
+      is removed
+    """
 
-def global_value_initialized(value=''):
+    global db_handler, key_2_name
 
-    try:
+    if (not db_handler.uses_legacy_keys()):
+        keyring_remove_key_2()
+        return True
 
-        if (type(value) == str and value != ''):
+    value = '%s:%s' % (db_handler.get_salt_id(), db_handler.get_key_2())
+
+    if (keyring_set_scrambled(value, key_2_name)):
+        return keyring_set_expiration(key_2_name)
+
+    return False
+
+
+def keyring_remove_key_2():
+
+    global key_2_name
+
+    run_cmd('keyctl purge -s user %s' % key_2_name)
+
+
+def keyring_get_key_2():
+
+    """
+    Returns (salt_id, key_2) cached in keyring, ('', '') if nothing found
+    """
+
+    global key_2_name
+
+    output = keyring_get_scrambled(key_2_name)
+
+    if (not output[0] or output[1].count(':') != 1):
+        return ('', '')
+
+    salt_id, key_2 = output[1].split(':')
+
+    return (salt_id, key_2)
+
+
+'''
+┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
+┃   Utility Functions                                                ┃
+┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+'''
+
+def module_imported(module_name=''):
+    # need to import sys module
+
+    if (module_name in sys.modules):
+        return True
+    else:
+        return False
+
+
+def global_value_initialized(value=''):
+
+    try:
+
+        if (type(value) == str and value != ''):
             return True
         elif (type(value) == int and value != -1):
             return True
@@ -3614,14 +4029,19 @@ def run_cmd(cmd=[], verbose=False):
 ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
 '''
 
-def run_searchbar(input_list=[]):
+def run_searchbar(input_list=[], id_list=[]):
 
     """
     Takes a list of strings as parameter, runs searchbar with
     those choices & returns the index chosen
 
+    * Choices are written to stdin of dmenu (no shell involved), every line 
+      is prefixed by an id, so that the chosen line is mapped back to its 
+      index without searching the list (identical choices are told apart)
+
     Args:       1) Input list of type string
-                2) The background color for searchbar
+                2) Ids of the choices, e.g ids of records (list of int),
+                   position in the list is used if it's not given
 
     Returns:    1) Index of item that was chosen from the list
                 2) Returns None if nothing was chosen / menu
@@ -3663,33 +4083,49 @@ def run_searchbar(input_list=[]):
         _color_background = '#1C51A3'
         _color_foreground = '#FFFFFF'
 
-    msg = ''
-
     if (len(input_list) == 0):
         return None
 
-    msg = input_list[0]
+    if (len(id_list) != len(input_list)):
+        id_list = range(len(input_list))
+
+    # Index of every choice by its id
+    indexes = {}
+    lines   = []
 
-    if (len(input_list) > 1):
-        for i in range(1, len(input_list)):
-            msg = '%s\n%s' % (msg, input_list[i])
+    for i in range(len(input_list)):
+        indexes[id_list[i]] = i
+        lines.append('%d  %s' % (id_list[i], input_list[i].replace('\n', ' ')))
 
-    cmd1 = 'echo -e "%s"' % msg
+    msg = bytes('\n'.join(lines) + '\n', 'utf-8')
 
     fn = config.get('searchbar_font_name')
     fs = config.get('searchbar_font_size')
 
-    cmd2 = "dmenu -fn '%s-%s' -l 7 -i -p 'pwmgr (search)' -sb '%s' -sf '%s'" % (fn, fs, _color_background, _color_foreground)
-    cmd3 = '%s|%s' % (cmd1, cmd2)
+    cmd = ['dmenu', '-fn', '%s-%s' % (fn, fs), '-l', '7', '-i', '-p', 'pwmgr (search)', \
+           '-sb', _color_background, '-sf', _color_foreground]
+
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, \
+                                   stdout=subprocess.PIPE, \
+                                   stderr=subprocess.PIPE)
 
-    stdout, stderr, return_code = run_cmd(cmd3)
+        stdout, stderr = process.communicate(msg)
 
-    if (return_code == 0):
-        index = input_list.index(stdout.strip())
-        return index
-    else:
+    except OSError:
         return None
 
+    if (process.returncode != 0):
+        return None
+
+    # Text that was typed in without choosing a line doesn't have an id
+    try:
+        chosen_id = int(stdout.decode('utf-8').split(' ', 1)[0])
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    return indexes.get(chosen_id)
+
 
 def search_bar_show():
 
@@ -3707,7 +4143,7 @@ def search_bar_show():
 
     try:
 
-        index = run_searchbar(summary_list)
+        index = run_searchbar(summary_list, db_handler.get_ids())
 
         if (index == None):
             sys.exit(1)
@@ -3719,6 +4155,8 @@ def search_bar_show():
 
     global term_len_h
 
+    fetch_record_at_index(index)
+
     header, data = get_record_at_index(index)
     display_row_static_with_sec_mem(header, data, index)
 
@@ -3737,21 +4175,52 @@ def search_bar_copy():
 
     summary_list = db_handler.get_summary()
 
-    index = run_searchbar(summary_list)
+    index = run_searchbar(summary_list, db_handler.get_ids())
 
     if (index == None):
         sys.exit(1)
 
+    fetch_record_at_index(index)
+
     secure_copy_password(index)
 
 
+def fetch_record_at_index(index=None):
+
+    """
+    Decrypts the rest of the record at index, if database was loaded from 
+        the summary (See check_database(summary=True))
+    """
+
+    global db_handler
+
+    record = db_handler.get_record_at_index_with_enc_pw(index)
+
+    db_handler.fetch_record(record.get_id())
+
+
 '''
 ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
 ┃   Database RW                                                      ┃
 ┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
 '''
 
-def check_database():
+def check_database(use_agent=False, stream=False, summary=False):
+
+    """
+    Loads database into db_handler, prompting for the master password
+        if the key is not available in keyring
+
+    Args: 1) Whether a running 'pwmgr agent' can be used instead of
+             loading the database in this process (bool)
+
+          2) Whether records are loaded as they're consumed from db_stream 
+             instead of loading the whole database (bool), see load_database_stream()
+
+          3) Whether only the summary of records is decrypted (bool), records need
+             to be fetched before they're used (See fetch_record_at_index())
+
+    """
 
     global file_name, db_file_path, app_name, db_handler, password_in_keyring, \
             config, config_file
@@ -3770,7 +4239,18 @@ def check_database():
 
     db_file_path = '%s%s' % (config_path, file_name)
 
+    if (use_agent and agent_connect()):
+        return
+
     db_handler = ManageRecord()
+    db_handler.set_backup_generations(config.get('backup_generations'))
+
+    load_database = db_handler.load_database
+
+    if (stream):
+        load_database = load_database_stream
+    elif (summary):
+        load_database = lambda **args : db_handler.load_database(summary_only=True, **args)
 
     keyfile_path = config.get('keyfile_path')
 
@@ -3820,6 +4300,7 @@ def check_database():
 
             if (keyring_set_scrambled(db_handler.get_key())):
                 keyring_set_expiration()
+                keyring_set_key_2()
             else:
 
                 if (lib_gui_available):
@@ -3840,230 +4321,1075 @@ def check_database():
     #       for master password & attempt to decrypt it
     #
 
-    result = False
+    result = False
+
+    key = keyring_get_scrambled()
+
+    if (key[0]):
+        key = key[1]
+    else:
+        key = False
+
+    '''
+     * We use 2 exception handlers, cos IncorrectPasswordException & 
+       IncorrectKeyException() overlap with other exception handlers
+       so we try to minimise code repetition as much as possible
+
+     * Updated old code (commented out) which mainly used commandline
+       for interacting with user. The new one interacts with user
+       with GUI prompts for error, password input, etc. It is done
+       because if pwmgr is used with key bindings, the user might not
+       know if things go wrong as cmd prompt might just close without showing 
+       anything.
+    '''
+
+    try:
+        try:
+
+            if (key == False):
+
+                password_in_keyring = False
+
+                if (lib_gui_available):
+                    pw_master = prompt_password_master_gui()
+
+                    if (type(pw_master) == bool and pw_master == False):
+                        sys.exit(0)
+                else:
+                    pw_master = prompt_password_master_cmdline()
+
+                result = load_database(filename=db_file_path, \
+                                           password=pw_master, \
+                                           load_key_from_keyring=False, \
+                                           path_to_keyfile=keyfile_path)
+            else:
+
+                salt_id, key_2 = keyring_get_key_2()
+
+                if (key_2 != ''):
+                    key_2 = bytes(key_2, 'utf-8')
+
+                result = load_database(filename=db_file_path, \
+                                           load_key_from_keyring=True, \
+                                           enc_key=bytes(key, 'utf-8'), \
+                                           enc_key_2=key_2, \
+                                           enc_key_2_salt_id=salt_id)
+
+                # Cached before the database was converted from legacy keys
+                if (key_2 != '' and not db_handler.uses_legacy_keys()):
+                    keyring_remove_key_2()
+
+                key_2 = generate_pass_single(32)
+
+        except (UnsupportedFileFormatException):
+
+            if (lib_gui_available):
+
+                gui_msg("\n\n  Unfortunately PWMGR no longer supports this file format\n\n" + \
+                        "  Go through the following steps to fix the problem:\n\n" + \
+                        "    1.  Export database using 'export-csv data.csv' on pwmgr 2.6 or earlier\n" + \
+                        "    2.  Remove current installation: 'rm -rf ~/.config/pwmgr/'\n" + \
+                        "    3.  Run 'import data.csv' on latest version of pwmgr >= 3.0\n\n" + \
+                        "  * Releases section of the github page lists downloadable versions\n")
+            else:
+
+                print(text_error("Unfortunately PWMGR no longer supports this file format"))
+
+                msg =  "  Go through the following steps to fix the problem:\n\n" + color_b('yellow') + \
+                       "    1.  Export database using 'export data.csv' on pwmgr 2.6 or earlier\n" + \
+                       "    2.  Remove current installation: 'rm -rf ~/.config/pwmgr/'\n" + \
+                       "    3.  Run 'import data.csv' on latest version of pwmgr >= 3.0\n\n" + color_reset() + \
+                       "  * Releases section of the github page lists downloadable versions\n" 
+
+                print(msg)
+
+            sys.exit(0)
+
+        except (IntegrityCheckFailedException):
+
+            r = False
+
+            if (lib_gui_available):
+                r = gui_confirmation('\nHash mismatch detected. Data could have been corrupted!\n\n' + \
+                                     '\t\t\tPress OK to repair database\n')
+            else:
+                pass
+
+            if (r):
+
+                if (key):
+                    result = db_handler.load_database(filename=db_file_path,            \
+                                                          override_integrity_check=True, \
+                                                          load_key_from_keyring=True,    \
+                                                          enc_key=bytes(key, 'utf-8'))
+                else:
+                    result = db_handler.load_database(filename=db_file_path, password=pw_master, \
+                                                          override_integrity_check=True, \
+                                                          path_to_keyfile=keyfile_path)
+
+                if (result): # Database decryption succeeded
+                    db_handler.write_encrypted_database(db_file_path)
+                    # wiping pw with random values
+                    key       = generate_pass_single(32)
+                    pw_master = generate_pass_single(32)
+                    sys.exit(0)
+            else:
+                sys.exit(0)
+
+
+        if (result):  # Database decryption succeeded
+
+            ## TODO: option in config to disable key scrambling if its buggy
+            if (password_in_keyring == False):
+                if (keyring_set_scrambled(db_handler.get_key())):
+                    keyring_set_expiration()
+                    keyring_set_key_2()
+                else:
+                    if (lib_gui_available):
+                        gui_msg("Unable to store password in keyring, do you have keyctl installed?")
+                    else:
+                        print(text_error("Unable to store password in keyring, do you have keyctl installed?"))
+
+        # wiping pw with random values
+        key       = generate_pass_single(32)
+        pw_master = generate_pass_single(32)
+
+    except IncorrectPasswordException:
+
+        if (lib_gui_available):
+            gui_msg('\nUnable to decrypt data due to incorrect password / keyfile\n')
+        else:
+            print(text_error('Unable to decrypt data due to incorrect password / keyfile'))
+
+        sys.exit(1)
+
+    except DataCorruptedException:
+
+        if (lib_gui_available):
+            gui_msg('\nDatabase is corrupted, try to restore from backup\n')
+        else:
+            print(text_error('Database is corrupted, try to restore from backup'))
+
+        sys.exit(1)
+
+    except IncorrectKeyException:
+
+        if (lib_gui_available):
+            gui_msg("\nUnable to decrypt data as stored key is incorrect." + \
+                    "\n\nPlease use 'keyring-clear' to remove it\n")
+        else:
+            print(text_error("Unable to decrypt data as stored key is incorrect.\n" + \
+                 "Please use 'keyring-clear' to remove it"))
+
+        sys.exit(1)
+
+
+
+def load_database_stream(**args):
+
+    """
+    Starts loading database into db_handler & leaves the rest of records 
+        in db_stream, to be loaded as they're consumed (See show_summary_stream())
+
+    * First record is loaded in here, so that an incorrect password / mac 
+      mismatch is raised before anything is displayed
+
+    Args: Same as ManageRecord.load_database()
+
+    Returns: True
+    """
+
+    global db_handler, db_stream
+
+    records = db_handler.load_database_iter(**args)
+
+    first = next(records, None)
+
+    # Database is empty & already loaded
+    if (first == None):
+        db_stream = None
+    else:
+        db_stream = itertools.chain([first], records)
+
+    return True
+
+
+def exit_if_database_is_empty():
+
+    global db_handler
+
+    n = db_handler.get_number_of_records()
+
+    if (n == 0):
+        print_block(1)
+        print(text_debug('No records found in database'))
+        print_block(1)
+        sys.exit(0)
+
+
+def key_show():
+
+    """
+    Display the current key that is being used for encryption
+
+    Note: Needs to be called after database has been loaded in memory using
+          the check_database() function
+        
+    """
+
+    global db_handler
+
+    c_value = color_b('green')
+    c_rst = color_reset()
+
+    key = db_handler.get_key()
+    print()
+    msg = 'Current Key: %s%s%s' % (c_value, key, c_rst)
+    print(text_debug(msg))
+    print()
+
+
+def pw_reset():
+
+    """
+    Change the current password that is used for database encryption 
+
+    Note: Needs to be called after database has been loaded in memory using
+          the check_database() function
+
+    """
+
+    global app_name, db_handler, db_file_path, config
+
+    cursor_hide()
+    clear_screen()
+    print_block(1)
+    print(info_bar_dynamic("Encryption management (pw-reset) | (Ctrl+c) Quit without saving"))
+    print_block(4)
+
+    kf = config.get('keyfile_path')
+
+    new_pwd = ''
+
+    try:
+        new_pwd = prompt_password_master(8)
+    except KeyboardInterrupt:
+        clear_screen()
+        sys.exit()
+
+    if (kf != ''):
+
+        db_handler.use_keyfile(new_pwd, kf)
+    else:
+        db_handler.change_password(new_pwd)
+
+    db_handler.write_encrypted_database(db_file_path)
+
+    keyring_set_scrambled(db_handler.get_key())
+    keyring_set_key_2()
+
+    cursor_show()
+    clear_screen()
+
+
+def format_kdf(kdf_id='', params=[]):
+
+    """
+    Returns: Description of kdf & its cost parameters (str)
+    """
+
+    if (kdf_id == KDF_PBKDF2):
+        return 'pbkdf2 (iterations=%d)' % params[0]
+    else:
+        return 'scrypt (n=2^%d, r=%d, p=%d, memory=%d MiB)' % \
+                    (int(math.log2(params[0])), params[1], params[2], \
+                     (128 * params[0] * params[1]) // (1024 * 1024))
+
+
+def kdf_bench():
+
+    """
+    Measures the time it takes to unlock the database on this machine
+        with the kdf it currently uses & with the defaults of each kdf
+    """
+
+    global db_file_path, file_name
+
+    db_file_path = '/home/%s/.config/pwmgr/%s' % (os.getlogin(), file_name)
+
+    bench_l = []
+
+    if (os.path.isfile(db_file_path)):
+        try:
+            bench_l.append(('Current', kdf_read_from_file(db_file_path)))
+        except UnsupportedFileFormatException:
+            print(text_error('Unable to read kdf from database header'))
+
+    for kdf_id in [KDF_PBKDF2, KDF_SCRYPT]:
+        bench_l.append(('Default', (kdf_id, KDF_DEFAULT_PARAMS[kdf_id])))
+
+    print_block(1)
+
+    for label, (kdf_id, params) in bench_l:
+
+        t = kdf_benchmark(kdf_id, params)
+
+        print('  %s%-9s%s %-50s %s%.2fs%s' % (color_b('orange'), label, color_reset(), \
+                                              format_kdf(kdf_id, params), \
+                                              color_b('yellow'), t, color_reset()))
+
+    print_block(1)
+    print(text_debug("Use 'kdf-calibrate [seconds] [pbkdf2/scrypt]' to tune unlock time"))
+    print_block(1)
+
+
+def set_kdf_calibrated(target_time='', kdf_name='pbkdf2'):
+
+    """
+    Picks kdf cost parameters so that unlocking the database takes roughly
+        target_time seconds on this machine & re-encrypts the database with it
+
+    * A new master password is required as the keys need to be derived again
+    """
+
+    global db_handler
+
+    kdf_id = ''
+
+    for k, v in KDF_NAMES.items():
+        if (v == kdf_name):
+            kdf_id = k
+
+    if (kdf_id == ''):
+        print(text_error("Supported kdf options are: %s" % ', '.join(KDF_NAMES.values())))
+        sys.exit(1)
+
+    try:
+        target_time = float(target_time)
+    except ValueError:
+        target_time = 0
+
+    if (target_time <= 0):
+        print(text_error("Requires unlock time in seconds (e.g 0.5)"))
+        sys.exit(1)
+
+    print_block(1)
+    print(text_debug('Calibrating %s, this might take a few seconds' % kdf_name))
+
+    params = kdf_calibrate(kdf_id, target_time)
+    t      = kdf_benchmark(kdf_id, params)
+
+    print_block(1)
+    print('  %s%s%s  %s%.2fs%s' % (color_b('orange'), format_kdf(kdf_id, params), color_reset(), \
+                                  color_b('yellow'), t, color_reset()))
+    print_block(1)
+
+    choice = prompt_yes_no_instant("Do you want to re-encrypt database with it? (Y/n): ", True)
+
+    if (not choice):
+        print_block(1)
+        sys.exit(0)
+
+    check_database()
+
+    db_handler.set_kdf(kdf_id, params)
+
+    pw_reset()
+
+
+def restore_generation(generation=1):
+
+    """
+    Restores a previous generation of database (db.enc.N), it is validated 
+        with the current key or the master password it was encrypted with
+        before it replaces the database
+
+    * The current database becomes generation 1, so it can be restored back
+    """
+
+    global db_handler, db_file_path, config
+
+    check_database()
+
+    path = generation_path(db_file_path, generation)
+
+    if (not os.path.isfile(path)):
+        print(text_error("Generation %d of database doesn't exist" % generation))
+        sys.exit(1)
+
+    handler = ManageRecord()
+    handler.set_backup_generations(config.get('backup_generations'))
+
+    try:
+        try:
+            handler.load_database(filename=path, load_key_from_keyring=True, \
+                                  enc_key=bytes(db_handler.get_key(), 'utf-8'), \
+                                  enc_key_2=bytes(db_handler.get_key_2(), 'utf-8'), \
+                                  enc_key_2_salt_id=db_handler.get_salt_id())
+
+        except IncorrectPasswordException:
+
+            print(text_debug("Generation %d was encrypted with a different master password" % generation))
+
+            handler = ManageRecord()
+            handler.set_backup_generations(config.get('backup_generations'))
+
+            handler.load_database(filename=path, password=prompt_password_master_cmdline(), \
+                                  path_to_keyfile=config.get('keyfile_path'))
+
+    except IncorrectPasswordException:
+        print(text_error("Master password is incorrect"))
+        sys.exit(1)
+
+    except (IntegrityCheckFailedException, UnsupportedFileFormatException, DataCorruptedException):
+        print(text_error("Generation %d of database is corrupted" % generation))
+        sys.exit(1)
+
+    except KeyboardInterrupt:
+        print_block(1)
+        sys.exit(0)
+
+    print_block(1)
+    print(text_debug("Generation %d has %d records" % (generation, handler.get_number_of_records())))
+    print_block(1)
+
+    choice = prompt_yes_no_instant("Do you want to restore it? (Y/n): ", True)
+
+    if (not choice):
+        print_block(1)
+        sys.exit(0)
+
+    if (not handler.write_encrypted_database(db_file_path)):
+        print(text_error("Unable to restore generation %d" % generation))
+        sys.exit(1)
+
+    db_handler = handler
+
+    if (keyring_set_scrambled(db_handler.get_key())):
+        keyring_set_expiration()
+        keyring_set_key_2()
+
+    print_block(1)
+    print(text_debug("Generation %d has been restored, previous database is now generation 1" % generation))
+    print_block(1)
+
+
+'''
+┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓
+┃   Agent Functions                                                  ┃
+┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+'''
+
+class AgentClient(ManageRecord):
+
+    """
+    Used by the frontend in place of ManageRecord() when 'pwmgr agent' is running
+
+    Records are mirrored from the agent without their passwords, so read only
+        operations (search, summary, etc.) are done locally. Passwords & changes
+        to the database are requested from the agent, which also writes them to disk.
+
+    * The local copy of records is not refreshed after a change is made,
+      since every command exits right after it
+
+    * Every request is sent over a new connection, so that a client that is 
+      waiting for the user (edit, search bar) doesn't hold the agent
+    """
+
+    def __init__(self):
+
+        super(AgentClient, self).__init__()
+
+        self.convert_csvlist_to_record(self.request('records'), True)
+
+
+    def request(self, cmd='', args={}):
+
+        """
+        Sends a request to the agent & returns the data it responds with,
+            the request is sent once more if the connection was lost
+
+        Exceptions: AgentUnavailableException if the agent can't be reached (e.g it
+                    was locked while idle), exceptions raised by the agent are 
+                    raised again locally
+        """
+
+        response = agent_send_request(cmd, args)
+
+        if (response == None):
+            response = agent_send_request(cmd, args)
+
+        if (response == None):
+            raise AgentUnavailableException('request(): pwmgr agent is no longer running')
+        elif (not response.get('ok')):
+            raise agent_exception(response)
+
+        return response.get('data')
+
+
+    def get_pw_of_index(self, index, enc_key=''):
+
+        return self.request('password', {'index': index})
+
+
+    def get_pw_of_index_with_sec_mem(self, index, enc_key=''):
+
+        return AllocateSecureMemory(self.request('password', {'index': index}))
+
+
+    def add(self, item):
+
+        if (type(item) == Record):
+            item = [item]
+
+        for record in item:
+            self.request('add', {'record': record.format_list()})
+
+
+    def update_index(self, record_object, index):
+
+        self.request('update', {'index': index, 'record': record_object.format_list(), \
+                                'password': record_object.get_password_encrypted()})
+
+
+    def update_index_with_sec_mem(self, record_obj, index, sec_mem_handler):
+
+        self.request('update', {'index': index, 'record': record_obj.format_list(), \
+                                'password': sec_mem_handler.get_str()})
+
+
+    def remove_index(self, index):
+
+        self.request('remove', {'index': index})
+
+
+    def write_encrypted_database(self, filename=''):
+
+        # Agent writes database as soon as a change is made
+        return True
+
+
+class AgentUnavailableException(ConnectionError):
+    def __init__(self, msg='pwmgr agent is no longer running'):
+        super(AgentUnavailableException, self).__init__(msg)
+
+
+class AgentWriteFailedException(IOError):
+    def __init__(self, msg='pwmgr agent was unable to write database'):
+        super(AgentWriteFailedException, self).__init__(msg)
+
+
+def agent_socket_path():
+
+    return '/home/%s/.config/pwmgr/agent.sock' % (os.getlogin())
+
+
+def agent_send_message(fh, message={}):
+
+    """
+    Messages are exchanged as json objects, one per line
+    """
+
+    fh.write(bytes('%s\n' % json.dumps(message), 'utf-8'))
+    fh.flush()
+
+
+def agent_recv_message(fh):
+
+    """
+    Returns: The received message (dict), None if connection was closed
+             or the message could not be decoded
+    """
+
+    line = fh.readline()
+
+    if (not line):
+        return None
+
+    try:
+        message = json.loads(line.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if (type(message) != dict):
+        return None
+
+    return message
+
+
+def agent_exception(response={}):
+
+    exceptions = {'IncorrectPasswordException':    IncorrectPasswordException, \
+                  'IncorrectKeyException':         IncorrectKeyException, \
+                  'IntegrityCheckFailedException': IntegrityCheckFailedException, \
+                  'DataCorruptedException':        DataCorruptedException, \
+                  'InvalidParameterException':     InvalidParameterException, \
+                  'AgentWriteFailedException':     AgentWriteFailedException}
+
+    e = exceptions.get(response.get('error'), InvalidParameterException)
+
+    return e(response.get('msg'))
+
+
+def agent_open_socket():
+
+    """
+    Returns: A socket connected to the running agent, None if there's
+             no agent running for the current user
+    """
+
+    sock_path = agent_socket_path()
+
+    try:
+        if (os.stat(sock_path).st_uid != os.getuid()):
+            return None
+    except FileNotFoundError:
+        return None
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        conn.connect(sock_path)
+    except OSError:
+        # Stale socket left behind by an agent that was killed
+        conn.close()
+        return None
+
+    return conn
+
+
+def agent_connect():
+
+    """
+    Connects to a running agent & sets db_handler to an AgentClient() instance
+
+    Returns: Boolean indicating whether an agent is being used
+    """
+
+    global db_handler
+
+    try:
+        db_handler = AgentClient()
+    except (ConnectionError, InvalidParameterException):
+        return False
+
+    return True
+
+
+def agent_send_request(cmd='', args={}):
+
+    """
+    Sends a single request to the running agent over a new connection
+
+    Returns: Response of the agent (dict), None if it couldn't be reached 
+                 or the connection was lost
+    """
+
+    conn = agent_open_socket()
+
+    if (conn == None):
+        return None
+
+    fh = conn.makefile('rwb')
+
+    try:
+        conn.settimeout(AGENT_REQUEST_TIMEOUT)
+        agent_send_message(fh, {'cmd': cmd, 'args': args})
+        response = agent_recv_message(fh)
+    except OSError:
+        response = None
+    finally:
+        fh.close()
+        conn.close()
+
+    return response
+
+
+def agent_request(cmd='', args={}):
+
+    """
+    Sends a single request to the running agent
+
+    Returns: success / failure (bool), data sent by the agent
+    """
+
+    response = agent_send_request(cmd, args)
+
+    if (response == None or not response.get('ok')):
+        return (False, None)
+
+    return (True, response.get('data'))
+
+
+def db_handler_call(method='', *args):
+
+    """
+    Calls a method of db_handler, if it is an agent that can no longer be 
+        reached (e.g it was locked while the user was editing a record), 
+        database is loaded in this process & the call is made again, so that 
+        changes made by the user aren't lost
+
+    Args:    Name of the method, followed by its arguments
+
+    Returns: Value returned by the method
+    """
+
+    global db_handler
+
+    try:
+        return getattr(db_handler, method)(*args)
+    except AgentUnavailableException:
+        pass
+
+    print_block(1)
+    print(text_debug('Agent is no longer running, loading database'))
+    print_block(1)
+
+    check_database()
+
+    return getattr(db_handler, method)(*args)
+
+
+def agent_peer_is_owner(conn):
+
+    """
+    Verifies that the process on the other end of the socket
+        belongs to the current user
+    """
+
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+
+    _, uid, _ = struct.unpack('3i', creds)
+
+    return (uid == os.getuid())
+
+
+def run_agent():
+
+    """
+    Runs pwmgr as a resident agent. The database is unlocked once & kept 
+        in memory, while requests from thin clients (show, copy, search,
+        add, edit, remove) are served over a unix socket in ~/.config/pwmgr/
+
+    * The socket is only accessible by the current user (0600)
+
+    * The agent is locked (keys are discarded & the process exits) after
+      being idle for 'keyring_wipe_interval' seconds, the same expiration
+      that is used for keys stored in keyring
+    """
+
+    global db_handler, db_file_path, config, agent_db_mtime
+
+    if (agent_request('ping')[0]):
+        print_block(1)
+        print(text_error('An agent is already running'))
+        print_block(1)
+        sys.exit(1)
+
+    check_database()
+
+    sock_path = agent_socket_path()
+
+    if (os.path.exists(sock_path)):
+        os.remove(sock_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # Socket is created with umask set, so that there's
+    #   no window where other users could connect to it
+    umask_prev = os.umask(0o177)
+
+    try:
+        server.bind(sock_path)
+    finally:
+        os.umask(umask_prev)
+
+    server.listen(5)
+
+    idle_timeout = int(config.get('keyring_wipe_interval'))
+
+    server.settimeout(idle_timeout)
+
+    agent_db_mtime = agent_db_modified_time()
+
+    print_block(1)
+    print(text_debug('Agent started, it will be locked after %ss of inactivity' % idle_timeout))
+    print_block(1)
+
+    if (os.fork() != 0):
+        sys.exit(0)
+
+    os.setsid()
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+
+    for fd in [0, 1, 2]:
+        os.dup2(devnull, fd)
+
+    try:
+
+        while (True):
+
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+
+            with conn:
+
+                if (not agent_peer_is_owner(conn)):
+                    continue
+
+                # Clients send their request as soon as they connect
+                conn.settimeout(AGENT_REQUEST_TIMEOUT)
+
+                if (not agent_serve(conn)):
+                    break
+
+    finally:
+
+        server.close()
+
+        try:
+            os.remove(sock_path)
+        except FileNotFoundError:
+            pass
+
+        db_handler = None
+
+
+def agent_serve(conn):
+
+    """
+    Serves requests from a single client connection
+
+    Returns: False if the agent needs to be locked, otherwise True
+    """
+
+    fh = conn.makefile('rwb')
+
+    try:
+
+        while (True):
+
+            request = agent_recv_message(fh)
+
+            if (request == None):
+                return True
+
+            if (request.get('cmd') == 'lock'):
+                agent_send_message(fh, {'ok': True, 'data': True})
+                return False
+
+            try:
+                agent_sync_database()
+
+            except (IncorrectPasswordException, IntegrityCheckFailedException, \
+                    UnsupportedFileFormatException, DataCorruptedException) as e:
+
+                # Database was changed by another instance & can no longer be
+                # loaded with the key in memory (e.g master password changed)
+                agent_send_message(fh, {'ok': False, 'error': type(e).__name__, 'msg': str(e)})
+                return False
+
+            # A malformed request is answered with an error, it must not stop the agent
+            try:
+                data = agent_handle_request(request.get('cmd'), request.get('args', {}))
+                response = {'ok': True, 'data': data}
+
+            except (IncorrectPasswordException, InvalidParameterException, \
+                    UnsupportedFileFormatException, AgentWriteFailedException, \
+                    TypeError, ValueError, AttributeError, IndexError, KeyError) as e:
+
+                response = {'ok': False, 'error': type(e).__name__, 'msg': str(e)}
+
+            agent_send_message(fh, response)
+
+    except OSError:
+        return True
+
+    finally:
+        fh.close()
+
+
+def agent_sync_database():
+
+    """
+    Reloads database if it was modified by a pwmgr instance that
+        was not using the agent (e.g import-csv, audit)
+    """
+
+    global db_handler, db_file_path, agent_db_mtime, config
+
+    mtime = agent_db_modified_time()
+
+    if (mtime == agent_db_mtime):
+        return
+
+    handler = ManageRecord()
+    handler.set_backup_generations(config.get('backup_generations'))
+
+    handler.load_database(filename=db_file_path, load_key_from_keyring=True, \
+                          enc_key=bytes(db_handler.get_key(), 'utf-8'), \
+                          enc_key_2=bytes(db_handler.get_key_2(), 'utf-8'), \
+                          enc_key_2_salt_id=db_handler.get_salt_id())
 
-    key = keyring_get_scrambled()
+    db_handler = handler
+    agent_db_mtime = mtime
 
-    if (key[0]):
-        key = key[1]
-    else:
-        key = False
 
-    '''
-     * We use 2 exception handlers, cos IncorrectPasswordException & 
-       IncorrectKeyException() overlap with other exception handlers
-       so we try to minimise code repetition as much as possible
+def agent_write_database():
 
-     * Updated old code (commented out) which mainly used commandline
-       for interacting with user. The new one interacts with user
-       with GUI prompts for error, password input, etc. It is done
-       because if pwmgr is used with key bindings, the user might not
-       know if things go wrong as cmd prompt might just close without showing 
-       anything.
-    '''
+    """
+    Writes a change made by a request to disk
 
-    try:
-        try:
+    Exceptions: AgentWriteFailedException if database couldn't be written, the change 
+                is discarded & database is loaded again from disk before the next 
+                request is served (See agent_sync_database())
+    """
 
-            if (key == False):
+    global db_handler, db_file_path, agent_db_mtime
 
-                password_in_keyring = False
+    try:
+        written = db_handler.write_encrypted_database(db_file_path)
+    except (IOError, OSError, PartiallyLoadedException):
+        written = False
 
-                if (lib_gui_available):
-                    pw_master = prompt_password_master_gui()
+    if (not written):
 
-                    if (type(pw_master) == bool and pw_master == False):
-                        sys.exit(0)
-                else:
-                    pw_master = prompt_password_master_cmdline()
+        # Change only exists in memory, it must not be served as if it was saved
+        agent_db_mtime = (0, 0)
 
-                result = db_handler.load_database(filename=db_file_path, \
-                                                      password=pw_master, \
-                                                      load_key_from_keyring=False, \
-                                                      path_to_keyfile=keyfile_path)
-            else:
+        raise AgentWriteFailedException('agent_write_database(): unable to write database, ' + \
+                                        'changes were discarded')
 
-                result = db_handler.load_database(filename=db_file_path, \
-                                                      load_key_from_keyring=True, \
-                                                      enc_key=bytes(key, 'utf-8'))
+    agent_db_mtime = agent_db_modified_time()
 
-        except (UnsupportedFileFormatException):
 
-            if (lib_gui_available):
+def agent_db_modified_time():
 
-                gui_msg("\n\n  Unfortunately PWMGR no longer supports this file format\n\n" + \
-                        "  Go through the following steps to fix the problem:\n\n" + \
-                        "    1.  Export database using 'export-csv data.csv' on pwmgr 2.6 or earlier\n" + \
-                        "    2.  Remove current installation: 'rm -rf ~/.config/pwmgr/'\n" + \
-                        "    3.  Run 'import data.csv' on latest version of pwmgr >= 3.0\n\n" + \
-                        "  * Releases section of the github page lists downloadable versions\n")
-            else:
+    """
+    Returns: (database mtime, journal mtime), changes are usually
+                 appended to the journal without modifying the database
+    """
 
-                print(text_error("Unfortunately PWMGR no longer supports this file format"))
+    global db_file_path
 
-                msg =  "  Go through the following steps to fix the problem:\n\n" + color_b('yellow') + \
-                       "    1.  Export database using 'export data.csv' on pwmgr 2.6 or earlier\n" + \
-                       "    2.  Remove current installation: 'rm -rf ~/.config/pwmgr/'\n" + \
-                       "    3.  Run 'import data.csv' on latest version of pwmgr >= 3.0\n\n" + color_reset() + \
-                       "  * Releases section of the github page lists downloadable versions\n" 
+    journal_mtime = 0
 
-                print(msg)
+    if (os.path.isfile(journal_path(db_file_path))):
+        journal_mtime = os.stat(journal_path(db_file_path)).st_mtime_ns
 
-            sys.exit(0)
+    return (os.stat(db_file_path).st_mtime_ns, journal_mtime)
 
-        except (IntegrityCheckFailedException):
 
-            r = False
+def agent_validate_args(args=None):
 
-            if (lib_gui_available):
-                r = gui_confirmation('\nHash mismatch detected. Data could have been corrupted!\n\n' + \
-                                     '\t\t\tPress OK to repair database\n')
-            else:
-                pass
+    if (type(args) != dict):
+        raise InvalidParameterException('Arguments of a request are required to be an object')
 
-            if (r):
 
-                if (key):
-                    result = db_handler.load_database(filename=db_file_path,            \
-                                                          override_integrity_check=True, \
-                                                          load_key_from_keyring=True,    \
-                                                          enc_key=bytes(key, 'utf-8'))
-                else:
-                    result = db_handler.load_database(filename=db_file_path, password=pw_master, \
-                                                          override_integrity_check=True, \
-                                                          path_to_keyfile=keyfile_path)
+def agent_validate_record(fields=None):
 
-                if (result): # Database decryption succeeded
-                    db_handler.write_encrypted_database(db_file_path)
-                    # wiping pw with random values
-                    key       = generate_pass_single(32)
-                    pw_master = generate_pass_single(32)
-                    sys.exit(0)
-            else:
-                sys.exit(0)
+    """
+    Verifies that a record sent by a client has every field (See Record.format_list())
+    """
 
+    if (type(fields) != list or len(fields) != len(CSV_FIELDS)):
+        raise InvalidParameterException('A record requires a list of %d fields' % len(CSV_FIELDS))
 
-        if (result):  # Database decryption succeeded
+    for field in fields:
+        if (type(field) != str):
+            raise InvalidParameterException('Fields of a record are required to be str')
 
-            ## TODO: option in config to disable key scrambling if its buggy
-            if (password_in_keyring == False):
-                if (keyring_set_scrambled(db_handler.get_key())):
-                    keyring_set_expiration()
-                else:
-                    if (lib_gui_available):
-                        gui_msg("Unable to store password in keyring, do you have keyctl installed?")
-                    else:
-                        print(text_error("Unable to store password in keyring, do you have keyctl installed?"))
 
-        # wiping pw with random values
-        key       = generate_pass_single(32)
-        pw_master = generate_pass_single(32)
+def agent_validate_index(index=None):
 
-    except IncorrectPasswordException:
+    if (type(index) == int):
+        index = [index]
+    elif (type(index) != list or len(index) == 0):
+        raise InvalidParameterException('Requires an index or a list of indexes')
 
-        if (lib_gui_available):
-            gui_msg('\nUnable to decrypt data due to incorrect password / keyfile\n')
-        else:
-            print(text_error('Unable to decrypt data due to incorrect password / keyfile'))
+    for i in index:
+        if (type(i) != int or not db_handler.validate_index(i)):
+            raise InvalidParameterException('Selected index is not within range')
 
-        sys.exit(1)
 
-    except DataCorruptedException:
+def agent_handle_request(cmd='', args={}):
 
-        if (lib_gui_available):
-            gui_msg('\nDatabase is corrupted, try to restore from backup\n')
-        else:
-            print(text_error('Database is corrupted, try to restore from backup'))
+    """
+    Executes a request sent by AgentClient()
 
-        sys.exit(1)
+    Returns: Data that is sent back to the client
+    """
 
-    except IncorrectKeyException:
+    global db_handler
 
-        if (lib_gui_available):
-            gui_msg("\nUnable to decrypt data as stored key is incorrect." + \
-                    "\n\nPlease use 'keyring-clear' to remove it\n")
-        else:
-            print(text_error("Unable to decrypt data as stored key is incorrect.\n" + \
-                 "Please use 'keyring-clear' to remove it"))
+    agent_validate_args(args)
 
-        sys.exit(1)
+    if (cmd == 'ping'):
 
+        return True
 
-def exit_if_database_is_empty():
+    elif (cmd == 'records'):
 
-    global db_handler
+        records = []
 
-    n = db_handler.get_number_of_records()
+        for i in range(db_handler.get_number_of_records()):
 
-    if (n == 0):
-        print_block(1)
-        print(text_debug('No records found in database'))
-        print_block(1)
-        sys.exit(0)
+            fields = db_handler.get_record_at_index_with_enc_pw(i).format_list()
 
+            # Passwords are only sent when they're requested
+            fields[1] = ''
 
-def key_show():
+            records.append(fields)
 
-    """
-    Display the current key that is being used for encryption
+        return records
 
-    Note: Needs to be called after database has been loaded in memory using
-          the check_database() function
-        
-    """
+    elif (cmd == 'password'):
 
-    global db_handler
+        agent_validate_index(args.get('index'))
 
-    c_value = color_b('green')
-    c_rst = color_reset()
+        return db_handler.get_pw_of_index(args.get('index'))
 
-    key = db_handler.get_key()
-    print()
-    msg = 'Current Key: %s%s%s' % (c_value, key, c_rst)
-    print(text_debug(msg))
-    print()
+    elif (cmd == 'add'):
 
+        agent_validate_record(args.get('record'))
 
-def pw_reset():
+        db_handler.add(convert_list_to_record(args.get('record')))
+        agent_write_database()
 
-    """
-    Change the current password that is used for database encryption 
+        return True
 
-    Note: Needs to be called after database has been loaded in memory using
-          the check_database() function
+    elif (cmd == 'update'):
 
-    """
+        agent_validate_index(args.get('index'))
+        agent_validate_record(args.get('record'))
 
-    global app_name, db_handler, db_file_path, config
+        if (type(args.get('index')) != int or type(args.get('password')) != str):
+            raise InvalidParameterException('An index & a password are required')
 
-    cursor_hide()
-    clear_screen()
-    print_block(1)
-    print(info_bar_dynamic("Encryption management (pw-reset) | (Ctrl+c) Quit without saving"))
-    print_block(4)
+        sec_mem_handler = AllocateSecureMemory(args.get('password'))
 
-    kf = config.get('keyfile_path')
+        db_handler.update_index_with_sec_mem(convert_list_to_record(args.get('record')), \
+                                             args.get('index'), sec_mem_handler)
+        sec_mem_handler.wipe_memory()
 
-    new_pwd = ''
+        agent_write_database()
 
-    try:
-        new_pwd = prompt_password_master(8)
-    except KeyboardInterrupt:
-        clear_screen()
-        sys.exit()
+        return True
 
-    if (kf != ''):
+    elif (cmd == 'remove'):
 
-        db_handler.use_keyfile(new_pwd, kf)
-    else:
-        db_handler.change_password(new_pwd)
+        agent_validate_index(args.get('index'))
 
-    db_handler.write_encrypted_database(db_file_path)
+        db_handler.remove_index(args.get('index'))
+        agent_write_database()
 
-    keyring_set_scrambled(db_handler.get_key())
+        return True
 
-    cursor_show()
-    clear_screen()
+    else:
+        raise InvalidParameterException("Unknown request '%s'" % cmd)
 
 
 '''
@@ -4211,123 +5537,144 @@ def remove_all_elements_from_list(l=[], element_l=[], \
 def import_from_csv(file_name):
 
     """
-    Imports from csv formatted file into database
+    Imports from csv formatted file into database, file is read incrementally
+        & imported in batches (See ManageRecord.import_csv_rows())
     """
 
     global db_handler, db_file_path
 
-    fh = open(file_name)
-
-    data_list = fh.read().splitlines()
+    fh = open(file_name, newline='')
 
-    processed_data = csv.reader(data_list, quotechar='"', delimiter=',', \
+    processed_data = csv.reader(fh, quotechar='"', delimiter=',', \
             quoting=csv.QUOTE_ALL, skipinitialspace=True)
 
-    csv_list = []
+    # Fault checking (minimal)
 
-    for item in processed_data:
-        csv_list.append(item)
+    r = next(processed_data, [])
 
-    # Fault checking (minimal)
+    header = False
 
-    r = csv_list[0]
+    if (len(r) == 2):
+        # Discarding header
 
-    if (len(r) == 2 or len(r) == 3 or len(r) == 4 or len(r) == 5 or \
-            len(r) == 10 or len(r) == 14):
+        if (r[0].strip() in ['site', 'website', 'address'] and \
+                r[1].strip() in ['password', 'pass', 'pwd']):
 
-        if (len(r) == 2):
-            # Discarding header
+            header = True
 
-            if (r[0].strip() in ['site', 'website', 'address'] and \
-                    r[1].strip() in ['password', 'pass', 'pwd']):
+    elif (len(r) == 3):
 
-                csv_list = csv_list[1:]
+        if (r[0].strip() in ['site', 'website', 'address'] and \
+                r[1].strip() in ['password', 'pass', 'pwd'] and \
+                r[2].strip() in ['username', 'user', 'usr']):
 
-            db_handler.convert_csvlist_to_record(csv_list)
+            header = True
 
-        elif (len(r) == 3):
+    elif (len(r) == 4):
 
-            if (r[0].strip() in ['site', 'website', 'address'] and \
-                    r[1].strip() in ['password', 'pass', 'pwd'] and \
-                    r[2].strip() in ['username', 'user', 'usr']):
+        if (r[0].strip() in ['site', 'website', 'address'] and \
+                r[1].strip() in ['password', 'pass', 'pwd'] and \
+                r[2].strip() in ['username', 'user', 'usr'] and \
+                r[3].strip() in ['email', 'mail']):
 
-                csv_list = csv_list[1:]
+            header = True
 
-            db_handler.convert_csvlist_to_record(csv_list)
+    elif (len(r) == 5):
 
-        elif (len(r) == 4):
+        if (r[0].strip() in ['site', 'website', 'address'] and \
+                r[1].strip() in ['password', 'pass', 'pwd'] and \
+                r[2].strip() in ['username', 'user', 'usr'] and \
+                r[3].strip() in ['email', 'mail'] and \
+                r[4].strip() in ['notes', 'comment', 'remark']):
 
-            if (r[0].strip() in ['site', 'website', 'address'] and \
-                    r[1].strip() in ['password', 'pass', 'pwd'] and \
-                    r[2].strip() in ['username', 'user', 'usr'] and \
-                    r[3].strip() in ['email', 'mail']):
+            header = True
 
-                csv_list = csv_list[1:]
+    elif (len(r) == 10):
 
-            db_handler.convert_csvlist_to_record(csv_list)
+        if (','.join(r) ==
+                'site,pass,last_modified,email,username,group,remark,two_factor,recovery_email,phone_number'):
 
-        elif (len(r) == 5):
+            header = True
 
-            if (r[0].strip() in ['site', 'website', 'address'] and \
-                    r[1].strip() in ['password', 'pass', 'pwd'] and \
-                    r[2].strip() in ['username', 'user', 'usr'] and \
-                    r[3].strip() in ['email', 'mail'] and \
-                    r[4].strip() in ['notes', 'comment', 'remark']):
+    elif (len(r) == 14):
 
-                csv_list = csv_list[1:]
+        header_14 = 'site,pass,last_modified,email,username,group,remark,two_factor,recovery_email,' + \
+                'phone_number,pw_age,pw_reuse,pw_complexity,security_rating'
+        
+        if (','.join(r) == header_14):
 
-            db_handler.convert_csvlist_to_record(csv_list)
+            header = True
 
-        elif (len(r) == 10):
+    else:
+        fh.close()
+        print_block(1)
+        print(text_error('Incorrect csv format detected '))
+        print(text_debug('Two formats are accepted. Read \'import csv\' section'))
+        print_block(1)
+        sys.exit(1)
 
-            if (','.join(r) ==
-                    'site,pass,last_modified,email,username,group,remark,two_factor,recovery_email,phone_number'):
+    rows = processed_data
 
-                csv_list = csv_list[1:]
+    if (not header):
+        rows = itertools.chain([r], processed_data)
 
-            db_handler.convert_csvlist_to_record(csv_list)
+    try:
+        count, skipped = db_handler.import_csv_rows(rows, import_progress)
+    except (csv.Error, UnicodeDecodeError, UnsupportedFileFormatException):
+        fh.close()
+        print_block(1)
+        print(text_error("Unable to import database from csv file due to unsupported format"))
+        print_block(1)
+        sys.exit(1)
 
-        elif (len(r) == 14):
+    fh.close()
 
-            header = 'site,pass,last_modified,email,username,group,remark,two_factor,recovery_email,' + \
-                    'phone_number,pw_age,pw_reuse,pw_complexity,security_rating'
-            
-            if (','.join(r) == header):
+    db_handler.write_encrypted_database(db_file_path)
 
-                csv_list = csv_list[1:]
+    cursor_show()
+    print(text_debug('%s entries have been imported to database' % count))
 
-            db_handler.convert_csvlist_to_record(csv_list)
+    if (skipped > 0):
+        print(text_error('%s rows were skipped, as their number of columns ' % skipped + \
+                         "doesn't match the first row"))
 
-        else:
+    print_block(1)
 
-            text_error("Unable to import database from csv file due to unsupported format")
-            print_block(1)
-            sys.exit(1)
 
-        db_handler.write_encrypted_database(db_file_path)
+def import_progress(count=0, elapsed=0):
 
-        cursor_show()
-        print(text_debug('%s entries have been imported to database' % len(csv_list)))
-        print_block(1)
-    else:
-        print_block(1)
-        print(text_error('Incorrect csv format detected '))
-        print(text_debug('Two formats are accepted. Read \'import csv\' section'))
-        print_block(1)
-        sys.exit(1)
+    """
+    Shows number of rows imported so far & the rate (See import_from_csv())
+    """
+
+    rate = 0
+
+    if (elapsed > 0):
+        rate = int(count / elapsed)
 
+    print('\r' + text_debug('%d rows imported (%d rows/s)' % (count, rate)), end='', flush=True)
 
-def export_to_csv(file_name):
+
+def export_to_csv(file_name, fields=None):
 
     """
-    Exports csv formatted database to the specified file
+    Exports csv formatted database to the specified file, only 
+        the specified fields if any (See CSV_FIELDS)
     """
 
     global db_handler
 
     exit_if_database_is_empty()
 
-    db_handler.export_csv(file_name)
+    try:
+        result = db_handler.export_csv(file_name, fields)
+    except (IncorrectPasswordException):
+        print(text_error('Unable to decrypt passwords, database possibly corrupted'))
+        sys.exit(1)
+
+    if (not result):
+        print(text_error('Unable to write to file: %s' % file_name))
+        sys.exit(1)
 
     cursor_show()
     print(text_debug('Exported database to: %s%s%s' % (color_b('green'), file_name, color_reset())))
@@ -4708,6 +6055,78 @@ def print_help():
                 txt_color, color_reset()))
 
 
+    print(
+    '''
+    %sslot-list%s
+
+        %sLists the key slots of the database, each of them can unlock it
+
+
+    %sslot-add %spassword | keyfile [file path] | recovery%s
+
+        %sAdds a key slot, so the database can also be unlocked with another
+        %spassword, password & keyfile or a generated recovery key
+
+        %s* Recovery key is only shown once & is entered in place of 
+        %s  master password, records are not encrypted again%s
+
+
+    %sslot-remove %s[slot number]%s
+
+        %sRemoves a key slot, the one that unlocked the database can't be removed%s
+    '''  % (color_b('orange'), color_reset(), txt_color, \
+
+            color_b('orange'), color_b('green'), color_reset(), \
+                txt_color,txt_color,txt_color,txt_color, color_reset(), \
+
+            color_b('orange'), color_b('green'), color_reset(), \
+                txt_color, color_reset()))
+
+
+    print(
+    '''
+    %sagent%s
+
+        %sStarts an agent in background that keeps the database unlocked,
+        %sso that show, copy, search, add & edit don't reload it every time
+
+        %s* The agent is locked after it has been idle for
+        %s  'keyring_wipe_interval' seconds or when 'keyring-clear' is used%s
+    ''' % (color_b('orange'), color_reset(), \
+             txt_color,txt_color,txt_color,txt_color,color_reset()))
+
+    print(
+    '''
+    %skdf-bench%s
+
+        %sMeasures the time it takes to unlock the database on this
+        %smachine with its current key derivation function & the defaults%s
+    ''' % (color_b('orange'), color_reset(), \
+             txt_color,txt_color,color_reset()))
+
+    print(
+    '''
+    %skdf-calibrate %s[seconds] %s[pbkdf2/scrypt]%s
+
+        %sPicks the cost of key derivation function (default: pbkdf2)
+        %sso that unlocking takes the specified time on this machine
+
+        %s* Keys of the database are wrapped again, which needs a new master password%s
+    ''' % (color_b('orange'), color_b('yellow'), \
+             color_b('green'), color_reset(),\
+             txt_color,txt_color,txt_color,color_reset()))
+
+    print(
+    '''
+    %srestore-generation %s[number]%s
+
+        %sRestores a previous database that was kept as a backup
+        %s(1 is the most recent, see 'backup_generations' in config)
+
+        %s* The current database is kept as generation 1%s
+    ''' % (color_b('orange'), color_b('yellow'), color_reset(), \
+             txt_color,txt_color,txt_color,color_reset()))
+
     print(
     '''
     %sselect-cols-csv %s[order of rows] %s[input file] [output file]%s
@@ -4752,12 +6171,20 @@ def print_help():
         %sExports all fields in the database to csv format%s
 
 
+    %sexport-csv %s[output file] --fields [field,...]%s
+
+        %sExports only the specified fields, in the specified order
+        Fields: %s%s
+
+
     %ssearch-font %s[keyword]%s
 
         %sShows you exact font names that you need to specify to customize search bar%s
 
     ''' % ( color_b('orange'), color_b('green'), color_reset(), \
             txt_color, color_reset(), \
+            color_b('orange'), color_b('green'), color_reset(), \
+            txt_color, ','.join(CSV_FIELDS), color_reset(), \
             color_b('orange'), color_b('yellow'), color_reset(), \
             txt_color, color_reset()))
 
@@ -5912,6 +7339,14 @@ def main():
         cursor_show()
         clear_screen()
         sys.exit(1)
+    except AgentUnavailableException:
+        cursor_show()
+        print(text_error('pwmgr agent is no longer running, please try again'))
+        sys.exit(1)
+    except AgentWriteFailedException:
+        cursor_show()
+        print(text_error('pwmgr agent was unable to write database, changes were discarded'))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+"""
+File formats that can be loaded: legacy '00' / '01' & the segmented format '02'
+    (See ManageRecord.write_encrypted_database() / load_database())
+
+* Legacy files are built the way they were written before format '02',
+  their keys are derived with PBKDF2 (1M iterations), so these tests take
+  a few seconds
+
+Usage: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os, sys, tempfile, shutil, unittest, base64
+from hashlib import sha256
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from database_pwmgr import Record, ManageRecord, kdf_derive, kdf_read_from_file, \
+                           KDF_PBKDF2, KDF_DEFAULT_PARAMS, UnsupportedFileFormatException
+
+PASSWORD = 'password'
+
+
+def derive_legacy_key(salt=b'', data=b''):
+
+    return base64.urlsafe_b64encode(kdf_derive(KDF_PBKDF2, KDF_DEFAULT_PARAMS[KDF_PBKDF2], salt, data))
+
+
+def write_legacy_database(path='', records=[]):
+
+    """
+    Writes records in format '01' ('00' if there are none):
+
+        PWMGR | 01 | hash | salt-1 | salt-2 | data
+
+    * Key 1 is derived from the password & key 2 from key 1, data is the csv of records
+      encrypted with key 1, passwords are encrypted with key 2
+    """
+
+    salt_1 = os.urandom(32)
+    salt_2 = os.urandom(32)
+
+    key_1  = derive_legacy_key(salt_1, bytes(PASSWORD, 'utf-8'))
+    key_2  = derive_legacy_key(salt_2, key_1)
+
+    data   = b''
+
+    if (len(records) > 0):
+
+        lines = []
+
+        for r in records:
+            r.set_password(Fernet(key_2).encrypt(bytes(r.get_password_encrypted(), 'utf-8')).decode('utf-8'))
+            lines.append(r.format_csv() + '\n')
+
+        data = Fernet(key_1).encrypt(bytes(''.join(lines), 'utf-8'))
+
+    version = b'01' if (len(records) > 0) else b'00'
+
+    file_hash = sha256(b'PWMGR' + version + salt_1 + salt_2 + data).hexdigest()
+
+    with open(path, 'wb') as fh:
+        fh.write(b'PWMGR' + version + bytes(file_hash, 'utf-8') + salt_1 + salt_2 + data)
+
+
+def get_format(path=''):
+
+    with open(path, 'rb') as fh:
+        return fh.read(7)
+
+
+class TestLegacyFormat(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path    = os.path.join(self.tmp_dir, 'db.enc')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def test_01_is_converted_on_write(self):
+
+        records = []
+
+        for i in range(5):
+            r = Record('site%d.com' % i, 'pw, "%d"' % i, '01-01-2020 10:00')
+            r.set_email('user%d@mail.com' % i)
+            r.set_group('group')
+            records.append(r)
+
+        write_legacy_database(self.path, records)
+
+        handler = ManageRecord()
+        handler.load_database(self.path, PASSWORD)
+
+        self.assertTrue(handler.uses_legacy_keys())
+        self.assertEqual(handler.get_number_of_records(), 5)
+        self.assertEqual(handler.decrypt_passwords(), ['pw, "%d"' % i for i in range(5)])
+        self.assertEqual(kdf_read_from_file(self.path), (KDF_PBKDF2, KDF_DEFAULT_PARAMS[KDF_PBKDF2]))
+
+        expected = [handler.get_record_at_index_with_enc_pw(i).format_list()[2:] for i in range(5)]
+
+        self.assertTrue(handler.write_encrypted_database(self.path))
+        self.assertEqual(get_format(self.path), b'PWMGR02')
+        self.assertFalse(handler.uses_legacy_keys())
+
+        loaded = ManageRecord()
+        loaded.load_database(self.path, PASSWORD)
+
+        # Passwords are encrypted again with the new key 2
+        self.assertEqual(loaded.decrypt_passwords(), ['pw, "%d"' % i for i in range(5)])
+        self.assertEqual([loaded.get_record_at_index_with_enc_pw(i).format_list()[2:] for i in range(5)], \
+                         expected)
+
+    def test_00_is_empty(self):
+
+        write_legacy_database(self.path, [])
+
+        handler = ManageRecord()
+        handler.load_database(self.path, PASSWORD)
+
+        self.assertEqual(handler.get_number_of_records(), 0)
+        self.assertTrue(handler.uses_legacy_keys())
+
+
+class TestUnsupportedFormat(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path    = os.path.join(self.tmp_dir, 'db.enc')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def test_unknown_versions(self):
+
+        for version in [b'03', b'07', b'99', b'\xff\xff']:
+
+            with open(self.path, 'wb') as fh:
+                fh.write(b'PWMGR' + version + b'0' * 200)
+
+            with self.subTest(version=version):
+                self.assertRaises(UnsupportedFileFormatException, \
+                                  ManageRecord().load_database, self.path, PASSWORD)
+
+
+if __name__ == '__main__':
+    unittest.main()
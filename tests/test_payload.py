@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+"""
+Round trip of records through the binary payload of segments
+    (See encode_record() / decode_record() & Record.serialize())
+
+Usage: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os, sys, tempfile, shutil, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_pwmgr import Record, ManageRecord, encode_record, decode_record, \
+                           join_fields, split_fields, journal_path, PAYLOAD_VERSION, \
+                           KDF_PBKDF2, UnsupportedFileFormatException
+
+# Values that need to survive every field, separators & escape chars included
+FIELD_VALUES = ['', 'plain', 'comma, separated', 'new\nline', 'cr\r\nlf', 'tab\tchar', \
+                'nul\x00inside', '\x00', '\x00\x00', 'escape\x01char', '\x01', '\x01' '0', \
+                '\x01' '1', 'quote "double" \'single\'', '"', 'ünïcödé ✓ 密码 🔑', \
+                '\\ backslash \\n', ' leading & trailing ']
+
+LAST_MODIFIED = '01-01-2020 10:00'
+
+
+def make_record(values=[]):
+
+    """
+    Returns: Record with every field set to a value of the list (in the
+                 order of Record.format_list()), except last_modified &
+                 two_factor, which are validated
+    """
+
+    r = Record(values[0], values[1], LAST_MODIFIED)
+    r.set_email(values[2])
+    r.set_username(values[3])
+    r.set_group(values[4])
+    r.set_remark(values[5])
+    r.set_two_factor('1')
+    r.set_recovery_email(values[6])
+    r.set_phone_number(values[7])
+    r.set_pw_age(values[8])
+    r.set_pw_reuse(values[9])
+    r.set_pw_complexity(values[10])
+    r.set_security_rating(values[11])
+
+    return r
+
+
+class TestRecordPayload(unittest.TestCase):
+
+    def assert_round_trip(self, record=None):
+
+        data = encode_record(record)
+
+        self.assertEqual(data[0], PAYLOAD_VERSION)
+        self.assertEqual(decode_record(data).format_list(), record.format_list())
+
+    def test_every_field_with_same_value(self):
+
+        # Website is stored in lowercase
+        for value in FIELD_VALUES:
+            with self.subTest(value=value):
+                self.assert_round_trip(make_record([value.lower()] + [value] * 11))
+
+    def test_every_field_with_different_values(self):
+
+        # Rotated, so that each field gets each value & fields can't be swapped
+        n = len(FIELD_VALUES)
+
+        for i in range(n):
+            values = [FIELD_VALUES[(i + j) % n] for j in range(12)]
+            values[0] = values[0].lower()
+
+            with self.subTest(i=i):
+                self.assert_round_trip(make_record(values))
+
+    def test_two_factor_values(self):
+
+        for value in ['', '0', '1']:
+
+            r = make_record(['site'] + ['x'] * 11)
+            r.set_two_factor(value)
+
+            self.assertEqual(decode_record(encode_record(r)).format_list()[7], value)
+
+    def test_empty_record(self):
+
+        r = Record('', '', LAST_MODIFIED)
+
+        self.assert_round_trip(r)
+
+    def test_serialize_is_kept_until_modified(self):
+
+        r = make_record(['site'] + ['a,b'] * 11)
+
+        data = r.serialize()
+
+        self.assertIs(r.serialize(), data)
+        self.assertEqual(data, encode_record(r))
+
+        r.set_remark('changed\x00remark')
+
+        self.assertNotEqual(r.serialize(), data)
+        self.assertEqual(decode_record(r.serialize()).get_remark(), 'changed\x00remark')
+
+    def test_fields_are_padded_or_ignored(self):
+
+        # Payload of an older version with fewer fields, or a newer one with more
+        short = bytes((PAYLOAD_VERSION,)) + bytes(join_fields(['site', 'pw', LAST_MODIFIED]), 'utf-8')
+        r     = decode_record(short)
+
+        self.assertEqual(r.format_list(), ['site', 'pw', LAST_MODIFIED] + [''] * 11)
+
+        fields = make_record(['site'] + ['v'] * 11).format_list()
+        extra  = bytes((PAYLOAD_VERSION,)) + bytes(join_fields(fields + ['new field']), 'utf-8')
+
+        self.assertEqual(decode_record(extra).format_list(), fields)
+
+    def test_unsupported_payload(self):
+
+        for data in [b'', bytes((PAYLOAD_VERSION + 1,)) + b'site', b'"site","pw"']:
+            with self.subTest(data=data):
+                self.assertRaises(UnsupportedFileFormatException, decode_record, data)
+
+    def test_invalid_utf8(self):
+
+        self.assertRaises(UnicodeDecodeError, decode_record, bytes((PAYLOAD_VERSION,)) + b'\xff\xfe')
+
+
+class TestJoinFields(unittest.TestCase):
+
+    def test_round_trip(self):
+
+        lists = [[''], ['', ''], ['a'], FIELD_VALUES, FIELD_VALUES[::-1], \
+                 ['\x00', '', '\x01'], ['trailing', ''], ['', 'leading']]
+
+        for fields in lists:
+            with self.subTest(fields=fields):
+                self.assertEqual(split_fields(join_fields(fields)), fields)
+
+    def test_separator_is_escaped(self):
+
+        data = join_fields(['a\x00b', 'c'])
+
+        self.assertEqual(data.count('\x00'), 1)
+
+
+class TestDatabaseRoundTrip(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path    = os.path.join(self.tmp_dir, 'db.enc')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def new_handler(self):
+
+        handler = ManageRecord()
+        handler.set_kdf(KDF_PBKDF2, [100000, 0, 0])
+        handler.generate_new_key('password', True, True)
+
+        return handler
+
+    def load(self):
+
+        loaded = ManageRecord()
+        loaded.load_database(self.path, 'password')
+
+        return loaded
+
+    def test_write_and_load(self):
+
+        n = len(FIELD_VALUES)
+
+        handler = self.new_handler()
+
+        passwords = []
+
+        for i in range(n):
+
+            values = [FIELD_VALUES[(i + j) % n] for j in range(12)]
+            values[0] = '%02d %s' % (i, values[0].lower())
+
+            passwords.append(values[1])
+
+            handler.add(make_record(values))
+
+        expected = [handler.get_record_at_index_with_enc_pw(i).format_list() for i in range(n)]
+
+        self.assertTrue(handler.write_encrypted_database(self.path))
+
+        loaded = self.load()
+
+        self.assertEqual([loaded.get_record_at_index_with_enc_pw(i).format_list() for i in range(n)], \
+                         expected)
+        self.assertEqual(sorted(loaded.decrypt_passwords()), sorted(passwords))
+
+    def test_journal(self):
+
+        # Changes made after the database is written are appended to the journal
+        n = len(FIELD_VALUES)
+
+        handler = self.new_handler()
+        handler.add(make_record(['site'] + ['v'] * 11))
+
+        self.assertTrue(handler.write_encrypted_database(self.path))
+
+        for i in range(n):
+
+            values = [FIELD_VALUES[(i + j) % n] for j in range(12)]
+            values[0] = '%02d %s' % (i, values[0].lower())
+
+            handler.add(make_record(values))
+
+        record = handler.get_record_at_index_with_enc_pw(0)
+        record.set_remark(FIELD_VALUES[-1] + FIELD_VALUES[6])
+
+        handler.update_index(record, 0)
+
+        expected = [handler.get_record_at_index_with_enc_pw(i).format_list() for i in range(n + 1)]
+
+        self.assertTrue(handler.write_encrypted_database(self.path))
+        self.assertTrue(os.path.isfile(journal_path(self.path)))
+
+        loaded = self.load()
+
+        self.assertEqual([loaded.get_record_at_index_with_enc_pw(i).format_list() for i in range(n + 1)], \
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()